@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Service Redemption Consumer - asyncio engine
+Same pipeline as service_redemption_consumer.py, but AMQP, DB and partner
+HTTP calls are awaited so many redemptions can be in flight on one core.
+"""
+import asyncio
+import json
+
+import aio_pika
+
+from config import ASYNC_MAX_IN_FLIGHT, METRICS_PORT, METRICS_QUEUE_DEPTH_INTERVAL
+from service_redemption_consumer import (
+    ServiceRedemptionProcessor,
+    logger,
+    processed_file,
+    transaction_log_file,
+)
+from utils.action.async_api_call import close_session, request_AUTTO, request_SOAP
+from utils.action.async_db_query_call import dispose_engine, get_redemption_context
+from utils.action.fanout import run_fanout_async
+from utils.consumer_utils import save_message
+from utils.export_queue import submit_export
+from utils.idempotency import IdempotencyStore
+from utils.logging_setup import log_payload, sample_payloads
+from utils import metrics, retry_queue, tracing
+
+
+class AsyncServiceRedemptionProcessor(ServiceRedemptionProcessor):
+    def __init__(self):
+        super().__init__()
+        self.max_in_flight = max(1, ASYNC_MAX_IN_FLIGHT)
+        self.loop = None
+        self.stop_event = None
+        self.tasks = set()
+
+    def signal_handler(self, signum, frame):
+        logger.info(f"Received signal {signum}, shutting down gracefully...")
+        self.should_stop = True
+        if self.loop and self.stop_event:
+            self.loop.call_soon_threadsafe(self.stop_event.set)
+
+    async def connect_rabbitmq_async(self):
+        """Establish a robust (auto-reconnecting) connection to RabbitMQ"""
+        self.connection = await aio_pika.connect_robust(
+            host=self.rabbitmq_config["host"],
+            port=self.rabbitmq_config["port"],
+            login=self.rabbitmq_config["username"],
+            password=self.rabbitmq_config["password"],
+            virtualhost=self.rabbitmq_config["virtual_host"] or "/",
+            heartbeat=600,
+        )
+        self.channel = await self.connection.channel()
+
+        # Prefetch is the in-flight limit for this engine
+        await self.channel.set_qos(prefetch_count=self.max_in_flight)
+
+        exchange = await self.channel.declare_exchange(
+            "dealership_exchange", aio_pika.ExchangeType.DIRECT, durable=True
+        )
+        queue = await self.channel.declare_queue(self.queue_name, durable=True)
+        await queue.bind(exchange, routing_key=self.routing_key)
+
+        for name, arguments in retry_queue.retry_queues(
+            self.queue_name, self.routing_key
+        ):
+            await self.channel.declare_queue(name, durable=True, arguments=arguments)
+
+        logger.info("Successfully connected to RabbitMQ (asyncio)")
+        return queue
+
+    # =============================
+    # 📥 RabbitMQ Callback
+    # =============================
+    async def on_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        self._count("consumed")
+        # Hand each delivery to its own task so the consumer never waits on one
+        task = asyncio.create_task(self.process_message(message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def ack(self, message: aio_pika.abc.AbstractIncomingMessage):
+        self._count("acked")
+        with metrics.stage("ack"):
+            await message.ack()
+
+    async def nack(self, message: aio_pika.abc.AbstractIncomingMessage):
+        self._count("nacked")
+        await message.nack(requeue=False)
+
+    async def poll_queue_depth(self):
+        while True:
+            for name in self.depth_queues():
+                try:
+                    # Straight to the AMQP channel: RobustChannel.declare_queue
+                    # returns the cached queue (and its startup count) for a
+                    # name it already declared
+                    channel = await self.channel.get_underlay_channel()
+                    result = await channel.queue_declare(name, passive=True)
+                    metrics.QUEUE_DEPTH.set(result.message_count, queue=name)
+                except Exception as e:
+                    logger.warning(f"⚠️ Queue depth poll failed for {name}: {e}")
+            await asyncio.sleep(METRICS_QUEUE_DEPTH_INTERVAL)
+
+    async def redeem(self, message_data: dict, done=()) -> bool:
+        """Load the context and submit the claim; True if every call succeeded.
+
+        Calls named in done already succeeded on an earlier attempt and are
+        skipped.
+        """
+        ContractID = message_data.get("ContractID")
+        coupon_ids = message_data.get("CouponID")
+        ID = message_data.get("ID")
+
+        context = await get_redemption_context(ContractID, coupon_ids, ID)
+        contractDetails = context.contract
+        coupansDetails = context.coupons
+        apiCredentials = context.credentials
+        tracing.annotate(
+            DealerID=(contractDetails or {}).get("DealerID"),
+            coupons=len(coupansDetails or []),
+        )
+
+        if context.complete:
+            calls = {
+                "autto": lambda: request_AUTTO(
+                    contractDetails, coupansDetails, apiCredentials
+                ),
+                # The export builds files and sends SMTP, keep it off the loop
+                "export": lambda: asyncio.to_thread(
+                    submit_export,
+                    contractDetails,
+                    ID,
+                    export_format=message_data.get("ExportFormat"),
+                    priority=message_data.get("ExportPriority"),
+                ),
+                "soap": lambda: request_SOAP(
+                    apiCredentials, contractDetails, coupansDetails
+                ),
+            }
+            outcome = await run_fanout_async(
+                {name: call for name, call in calls.items() if name not in done}
+            )
+            log_payload("OUTCOME", outcome.to_dict())
+            message_data["outcome"] = {
+                **{name: "skipped" for name in done},
+                **outcome.statuses(),
+            }
+            tracing.annotate(
+                **{f"outcome.{name}": v for name, v in message_data["outcome"].items()}
+            )
+            return outcome.ok
+        return False
+
+    async def retry(
+        self,
+        message: aio_pika.abc.AbstractIncomingMessage,
+        done,
+        reason,
+        counted=True,
+    ):
+        """Move a delivery to its delay queue (or the parking lot), then ack"""
+        attempt = retry_queue.attempt_of(message.headers)
+        target, delay = retry_queue.retry_target(
+            self.queue_name, attempt if counted else 0
+        )
+        await self.channel.default_exchange.publish(
+            aio_pika.Message(
+                message.body,
+                content_type=message.content_type,
+                content_encoding=message.content_encoding,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                headers=retry_queue.retry_headers(
+                    message.headers, attempt, done, reason, counted
+                ),
+                expiration=delay,
+                priority=message.priority,
+                correlation_id=message.correlation_id,
+                reply_to=message.reply_to,
+                message_id=message.message_id,
+                timestamp=message.timestamp,
+                type=message.type,
+                app_id=message.app_id,
+            ),
+            routing_key=target,
+        )
+        await message.ack()
+        self._count("retried" if delay is not None else "parked")
+        if delay is None:
+            logger.error(f"🅿️ Parked after {attempt + 1} attempts: {reason}")
+        else:
+            logger.warning(f"🔁 Retry {attempt + 1} in {delay:g}s: {reason}")
+
+    @metrics.timed("message")
+    async def process_message(self, message: aio_pika.abc.AbstractIncomingMessage):
+        done = retry_queue.done_of(message.headers)
+        message_data = None
+        sample_payloads()
+        try:
+            with metrics.stage("decode"):
+                payload = json.loads(message.body)
+            event_type = payload.get("request_type")
+
+            with metrics.stage("jwt"):
+                message_data = self._decrypt_and_validate(payload)
+            if not message_data:
+                logger.warning("⚠️ Rejecting message due to failed JWT validation")
+                tracing.annotate(rejected="jwt")
+                await self.ack(message)
+                return
+            tracing.annotate(
+                ContractID=message_data.get("ContractID"),
+                ID=message_data.get("ID"),
+                attempt=retry_queue.attempt_of(message.headers),
+            )
+
+            idempotency_key = IdempotencyStore.key_for(
+                message_data.get("ContractID"),
+                message_data.get("CouponID"),
+                message_data.get("ID"),
+            )
+            # SQLite calls block, keep them off the event loop
+            if not await asyncio.to_thread(self.idempotency.begin, idempotency_key):
+                logger.info(f"⏭️ Duplicate redemption {idempotency_key}, skipping")
+                tracing.annotate(duplicate=True)
+                await self.ack(message)
+                return
+
+            succeeded = False
+            try:
+                # Calls an earlier delivery already made, even if its retry
+                # copy (and x-redemption-done) is still in a delay queue
+                recorded = await asyncio.to_thread(
+                    self.idempotency.done_calls, idempotency_key
+                )
+                done = list(dict.fromkeys(done + recorded))
+                succeeded = await self.redeem(message_data, done)
+            finally:
+                await asyncio.to_thread(
+                    self.idempotency.finish,
+                    idempotency_key,
+                    succeeded,
+                    retry_queue.completed_calls(message_data),
+                )
+
+            await asyncio.to_thread(
+                save_message,
+                message_data,
+                event_type,
+                processed_file,
+                transaction_log_file,
+            )
+
+            if not succeeded and retry_queue.is_retryable(message_data):
+                await self.retry(
+                    message,
+                    done + retry_queue.completed_calls(message_data),
+                    retry_queue.retry_reason(message_data),
+                    retry_queue.counts_as_attempt(message_data),
+                )
+                return
+            await self.ack(message)
+            logger.info("✅ Message processed & acknowledged")
+
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Invalid JSON in message: {e}")
+            await self.ack(message)
+        except Exception as e:
+            logger.error(f"❌ Error processing message: {e}")
+            try:
+                await self.retry(
+                    message, done + retry_queue.completed_calls(message_data), e
+                )
+            except Exception as retry_error:
+                logger.error(f"❌ Could not schedule retry: {retry_error}")
+                await self.nack(message)
+
+    # =============================
+    # ▶️ Start Consuming
+    # =============================
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+
+        logger.info("🚀 Starting service redemption consumer (asyncio)...")
+        metrics.start_server()
+        while not self.should_stop:
+            try:
+                queue = await self.connect_rabbitmq_async()
+                break
+            except Exception as e:
+                logger.error(
+                    f"❌ Failed to connect to RabbitMQ: {e}, retrying in 5 seconds..."
+                )
+                await asyncio.sleep(5)
+        else:
+            return
+
+        consumer_tag = await queue.consume(self.on_message)
+        depth_task = None
+        if METRICS_PORT:
+            depth_task = asyncio.create_task(self.poll_queue_depth())
+        logger.info(
+            f"👂 Consumer started ({self.max_in_flight} in flight). Press CTRL+C to stop."
+        )
+
+        try:
+            await self.stop_event.wait()
+        finally:
+            logger.info("🛑 Stopping consumer...")
+            if depth_task is not None:
+                depth_task.cancel()
+            await queue.cancel(consumer_tag)
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            await self.connection.close()
+            await close_session()
+            await dispose_engine()
+
+        logger.info("🏁 Consumer stopped")
+
+    def start_consuming(self):
+        asyncio.run(self.run())
+
+
+def main():
+    """Main function to start the asyncio processor"""
+    AsyncServiceRedemptionProcessor().start_consuming()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,3 +15,168 @@ SENDGRID_USER = os.getenv("SENDGRID_USER")
 SENDGRID_PASS = os.getenv("SENDGRID_PASS")
 BASE_URL = os.getenv("BASE_URL")
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
+
+# Consumer concurrency: CONSUMER_WORKERS=1 keeps the original one-at-a-time
+# behaviour, anything higher dispatches deliveries to a bounded thread pool.
+CONSUMER_WORKERS = int(os.getenv("CONSUMER_WORKERS", "1"))
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", str(CONSUMER_WORKERS)))
+
+# Redemption micro-batching: collect deliveries for this many ms (0 = off) or
+# until REDEMPTION_BATCH_MAX are buffered, then redeem them per contract/dealer
+REDEMPTION_BATCH_WINDOW_MS = int(os.getenv("REDEMPTION_BATCH_WINDOW_MS", "0"))
+REDEMPTION_BATCH_MAX = int(os.getenv("REDEMPTION_BATCH_MAX", "50"))
+# Partners that accept one combined claim for a batch group (comma-separated,
+# e.g. "autto,soap"). Unless every partner is listed, each delivery gets its
+# own claims and batching only shares the IN (...) context query.
+BATCH_COMBINE_PARTNERS = tuple(
+    name.strip().lower()
+    for name in os.getenv("BATCH_COMBINE_PARTNERS", "").split(",")
+    if name.strip()
+)
+
+# Consumer engine: "blocking" (pika, default) or "asyncio" (aio-pika/aiohttp)
+CONSUMER_ENGINE = os.getenv("CONSUMER_ENGINE", "blocking").lower()
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200"))
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+# Fan-out of partner submissions (AUTTO, export, SOAP) per message
+PARTNER_CALL_TIMEOUT = float(os.getenv("PARTNER_CALL_TIMEOUT", "60"))
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", str(3 * max(1, CONSUMER_WORKERS))))
+
+# Partner HTTP clients: keep-alive pool per host, connect/read timeouts.
+# connect + read must stay below PARTNER_CALL_TIMEOUT (checked at startup).
+PARTNER_CONNECT_TIMEOUT = float(os.getenv("PARTNER_CONNECT_TIMEOUT", "5"))
+PARTNER_READ_TIMEOUT = float(os.getenv("PARTNER_READ_TIMEOUT", "30"))
+PARTNER_POOL_MAXSIZE = int(
+    os.getenv("PARTNER_POOL_MAXSIZE", str(max(10, FANOUT_WORKERS)))
+)
+if PARTNER_CONNECT_TIMEOUT + PARTNER_READ_TIMEOUT >= PARTNER_CALL_TIMEOUT:
+    raise ValueError(
+        "PARTNER_CONNECT_TIMEOUT + PARTNER_READ_TIMEOUT must be below "
+        f"PARTNER_CALL_TIMEOUT ({PARTNER_CONNECT_TIMEOUT:g} + "
+        f"{PARTNER_READ_TIMEOUT:g} >= {PARTNER_CALL_TIMEOUT:g})"
+    )
+
+# Per-partner circuit breaker: opens when, over the last WINDOW calls (at
+# least MIN_CALLS), the failure rate or the rate of calls slower than
+# SLOW_SECONDS reaches its threshold; after OPEN_SECONDS one probe is let
+# through (half-open) and its result closes or re-opens the circuit.
+PARTNER_BREAKER_WINDOW = int(os.getenv("PARTNER_BREAKER_WINDOW", "20"))
+PARTNER_BREAKER_MIN_CALLS = int(os.getenv("PARTNER_BREAKER_MIN_CALLS", "10"))
+PARTNER_BREAKER_FAILURE_RATE = float(os.getenv("PARTNER_BREAKER_FAILURE_RATE", "0.5"))
+PARTNER_BREAKER_SLOW_SECONDS = float(os.getenv("PARTNER_BREAKER_SLOW_SECONDS", "10"))
+PARTNER_BREAKER_SLOW_RATE = float(os.getenv("PARTNER_BREAKER_SLOW_RATE", "0.8"))
+PARTNER_BREAKER_OPEN_SECONDS = float(os.getenv("PARTNER_BREAKER_OPEN_SECONDS", "30"))
+
+# Per-partner adaptive concurrency (AIMD): +1 per limit's worth of fast
+# successes, times PARTNER_LIMIT_BACKOFF on a failure or slow call
+PARTNER_LIMIT_MAX = int(
+    os.getenv(
+        "PARTNER_LIMIT_MAX",
+        str(ASYNC_MAX_IN_FLIGHT if CONSUMER_ENGINE == "asyncio" else FANOUT_WORKERS),
+    )
+)
+PARTNER_LIMIT_MIN = int(os.getenv("PARTNER_LIMIT_MIN", "1"))
+PARTNER_LIMIT_INITIAL = int(
+    os.getenv("PARTNER_LIMIT_INITIAL", str(max(1, PARTNER_LIMIT_MAX // 2)))
+)
+PARTNER_LIMIT_BACKOFF = float(os.getenv("PARTNER_LIMIT_BACKOFF", "0.5"))
+
+# In-process cache for API credentials and dealer reference data
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+
+# processed_messages journal: rotate the active segment past this size
+JOURNAL_SEGMENT_MAX_BYTES = int(
+    os.getenv("JOURNAL_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+# Duplicate redemption protection: keys are kept this long (default 7 days)
+IDEMPOTENCY_RETENTION_SECONDS = float(
+    os.getenv("IDEMPOTENCY_RETENTION_SECONDS", str(7 * 24 * 3600))
+)
+
+# Failed redemptions wait in delay queues (seconds per retry, the last tier
+# repeats) and go to the parking lot after REDEMPTION_MAX_RETRIES
+REDEMPTION_RETRY_DELAYS = [
+    float(delay)
+    for delay in os.getenv("REDEMPTION_RETRY_DELAYS", "10,60,300,1800").split(",")
+    if delay.strip()
+]
+REDEMPTION_MAX_RETRIES = int(
+    os.getenv("REDEMPTION_MAX_RETRIES", str(len(REDEMPTION_RETRY_DELAYS)))
+)
+
+# Rows fetched per round trip when streaming coverage exports
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# Multi-provider coverage search: one query per provider table, run in
+# parallel; each provider gets COVERAGE_SEARCH_TIMEOUT seconds
+COVERAGE_SEARCH_WORKERS = int(os.getenv("COVERAGE_SEARCH_WORKERS", "8"))
+COVERAGE_SEARCH_TIMEOUT = float(os.getenv("COVERAGE_SEARCH_TIMEOUT", "30"))
+
+# Last-name filters on the normalized <column>_norm columns (utils/name_search.py):
+# auto = use them where their index exists, on = always, off = never
+NORMALIZED_NAME_SEARCH = os.getenv("NORMALIZED_NAME_SEARCH", "auto").lower()
+NAME_BACKFILL_BATCH = int(os.getenv("NAME_BACKFILL_BATCH", "5000"))
+
+# Coverage export result cache (per process). COVERAGE_CACHE_TTL=0 disables it.
+# Table reload jobs touch <COVERAGE_STAMP_DIR>/<table> to invalidate entries
+COVERAGE_CACHE_TTL = float(os.getenv("COVERAGE_CACHE_TTL", "600"))
+COVERAGE_CACHE_MAX_ENTRIES = int(os.getenv("COVERAGE_CACHE_MAX_ENTRIES", "512"))
+COVERAGE_CACHE_MAX_BYTES = int(
+    os.getenv("COVERAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+COVERAGE_STAMP_DIR = os.getenv("COVERAGE_STAMP_DIR", "/var/tmp/coverage_stamps")
+
+# Unfiltered provider totals (*_count without VIN/LastName):
+# exact = COUNT(*) every time, approximate = InnoDB table statistics,
+# cached = COUNT(*) at most every COVERAGE_COUNT_REFRESH seconds per table
+COVERAGE_COUNT_MODE = os.getenv("COVERAGE_COUNT_MODE", "exact").lower()
+COVERAGE_COUNT_REFRESH = float(os.getenv("COVERAGE_COUNT_REFRESH", "300"))
+
+# Export file format: xlsx (default), csv, csv.gz or parquet (needs pyarrow).
+# EXPORT_FORMAT_BY_DEALER overrides per dealer, e.g. "2975:csv.gz,3012:parquet"
+EXPORT_FORMAT = os.getenv("EXPORT_FORMAT", "xlsx").lower()
+EXPORT_FORMAT_BY_DEALER = os.getenv("EXPORT_FORMAT_BY_DEALER", "")
+
+# Coverage export offloading: EXPORT_MODE=inline runs export_to_email inside
+# the redemption, EXPORT_MODE=queue publishes a job for export_worker.py
+EXPORT_MODE = os.getenv("EXPORT_MODE", "inline").lower()
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+EXPORT_PREFETCH = int(os.getenv("EXPORT_PREFETCH", str(EXPORT_WORKERS)))
+EXPORT_MAX_ATTEMPTS = int(os.getenv("EXPORT_MAX_ATTEMPTS", "3"))
+EXPORT_RETRY_DELAY = float(os.getenv("EXPORT_RETRY_DELAY", "5"))
+EXPORT_DEFAULT_PRIORITY = int(os.getenv("EXPORT_DEFAULT_PRIORITY", "5"))
+
+# Shared SQLAlchemy engine settings (utils/db.py)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL")  # optional read replica
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# Prometheus-style metrics endpoint (0 = off); queue depths are polled every
+# METRICS_QUEUE_DEPTH_INTERVAL seconds
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_QUEUE_DEPTH_INTERVAL = float(os.getenv("METRICS_QUEUE_DEPTH_INTERVAL", "15"))
+
+# Per-message tracing spans: TRACE_EXPORTER=off (default), file (JSON lines
+# in TRACE_FILE) or otlp (OTLP/HTTP JSON to TRACE_OTLP_ENDPOINT)
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "off").lower()
+TRACE_FILE = os.getenv("TRACE_FILE", "spans.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv(
+    "TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"
+)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "service-redemption-consumer")
+
+# Consumer logging: LOG_FORMAT=text (default) or json; LOG_ASYNC hands records
+# to a background writer thread. Payload dumps (message body, JWT claims, DB
+# context, partner requests) are logged for this fraction of messages.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
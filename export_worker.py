@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Coverage Export Worker
+Consumes export jobs published by the redemption consumer (EXPORT_MODE=queue)
+and runs export_to_email for each, with its own concurrency and retries.
+"""
+
+import functools
+import json
+import sys
+
+from config import (
+    EXPORT_MAX_ATTEMPTS,
+    EXPORT_PREFETCH,
+    EXPORT_WORKERS,
+)
+from service_redemption_consumer import RabbitMQConsumer, logger
+from utils.action.db_query_call import export_to_email
+from utils.export_queue import (
+    ATTEMPT_HEADER,
+    EXPORT_QUEUE,
+    EXPORT_ROUTING_KEY,
+    declare_export_queue,
+    declare_export_retry_queues,
+    export_retry_delay,
+    export_retry_queues,
+)
+from utils.retry_queue import retry_properties, retry_queue_name
+
+
+class ExportWorker(RabbitMQConsumer):
+    queue_name = EXPORT_QUEUE
+    routing_key = EXPORT_ROUTING_KEY
+    description = "coverage export worker"
+    thread_name_prefix = "export"
+
+    def __init__(self):
+        super().__init__(EXPORT_WORKERS, EXPORT_PREFETCH)
+
+    def declare_topology(self):
+        declare_export_queue(self.channel)
+        declare_export_retry_queues(self.channel)
+
+    def depth_queues(self):
+        return [self.queue_name] + [name for name, _ in export_retry_queues()]
+
+    def _republish(self, channel, delivery_tag, properties, body, attempt, delay):
+        """Park the job in its delay queue; it expires back onto the queue"""
+        channel.basic_publish(
+            exchange="",
+            routing_key=retry_queue_name(EXPORT_QUEUE, delay),
+            body=body,
+            properties=retry_properties(
+                properties,
+                {**(properties.headers or {}), ATTEMPT_HEADER: attempt},
+                delay,
+            ),
+        )
+        channel.basic_ack(delivery_tag=delivery_tag)
+
+    def process_message(self, channel, method, properties, body):
+        headers = properties.headers or {}
+        attempt = int(headers.get(ATTEMPT_HEADER, 0))
+        try:
+            job = json.loads(body)
+            logger.info(
+                f"📤 Export job for dealer {job['contract'].get('DealerID')} "
+                f"(attempt {attempt + 1})"
+            )
+            sent = export_to_email(
+                job["contract"],
+                job.get("ID"),
+                job.get("CoverageName", 1),
+                export_format=job.get("ExportFormat"),
+            )
+            if sent is False:
+                # Goes through the retry delay queues like any other failure
+                raise RuntimeError("export email not sent")
+            self._ack(channel, method.delivery_tag)
+            logger.info("✅ Export job done & acknowledged")
+
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Invalid JSON in export job: {e}")
+            self._ack(channel, method.delivery_tag)
+        except Exception as e:
+            if attempt + 1 >= EXPORT_MAX_ATTEMPTS:
+                logger.error(f"❌ Export job failed after {attempt + 1} attempts: {e}")
+                self._nack(channel, method.delivery_tag, requeue=False)
+                return
+
+            # Back off in a delay queue instead of holding a worker (or, with
+            # one worker, the connection thread)
+            delay = export_retry_delay(attempt)
+            logger.warning(f"⚠️ Export job failed ({e}), retrying in {delay:g}s")
+            self._on_connection_thread(
+                channel,
+                functools.partial(
+                    self._republish,
+                    channel,
+                    method.delivery_tag,
+                    properties,
+                    body,
+                    attempt + 1,
+                    delay,
+                ),
+            )
+
+
+def main():
+    """Main function to start the export worker"""
+    try:
+        worker = ExportWorker()
+        worker.start_consuming()
+    except Exception as e:
+        logger.error(f"💥 Fatal error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,23 @@ Simple file-based logging only
 """
 from utils.action.api_call import request_AUTTO, request_SOAP
 from utils.action.db_query_call import (
-    export_to_email,
-    get_api_credentials,
-    get_contract_details,
-    get_coupons_details,
+    cache_stats,
+    get_redemption_context,
+    get_redemption_contexts,
+    invalidate_api_credentials,
+    invalidate_reference_data,
 )
+from utils.action.fanout import run_fanout
+from utils.action.ftp_coverages import count_cache, invalidate_coverage_cache
 from utils.consumer_utils import save_message
+from utils.db import pool_stats
+from utils.partner_http import close_sessions, http_stats
+from utils.partner_guard import GUARDED_CALLS, guard_stats
+from utils.export_queue import submit_export
+from utils.idempotency import IdempotencyStore
+from utils.logging_setup import configure_logging, log_payload, sample_payloads
+from utils import metrics, retry_queue, tracing
+from utils import name_search
 import jwt
 import pika
 import json
@@ -18,7 +29,9 @@ import logging
 import sys
 import os
 
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, NamedTuple
+import functools
 import signal
 import time
 
@@ -29,13 +42,22 @@ from config import (
     RABBITMQ_USERNAME,
     RABBITMQ_PASSWORD,
     RABBITMQ_VHOST,
+    CONSUMER_WORKERS,
+    CONSUMER_PREFETCH,
+    CONSUMER_ENGINE,
+    REDEMPTION_BATCH_WINDOW_MS,
+    REDEMPTION_BATCH_MAX,
+    BATCH_COMBINE_PARTNERS,
+    METRICS_PORT,
+    METRICS_QUEUE_DEPTH_INTERVAL,
 )
 
 
 # Dynamically resolve log path
 DEFAULT_LOG_FILENAME = "consumer.log"
-DEFAULT_PROCESSED_FILE = "processed_messages.json"
+DEFAULT_PROCESSED_FILE = "processed_messages.jsonl"
 DEFAULT_LOG_TRANSACTIONS = "transactions.log"
+DEFAULT_IDEMPOTENCY_FILE = "idempotency.sqlite3"
 
 # Preferred: current script directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -43,27 +65,53 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(current_dir, DEFAULT_LOG_FILENAME)
 processed_file = os.path.join(current_dir, DEFAULT_PROCESSED_FILE)
 transaction_log_file = os.path.join(current_dir, DEFAULT_LOG_TRANSACTIONS)
+idempotency_file = os.path.join(current_dir, DEFAULT_IDEMPOTENCY_FILE)
 
 # Fallback if not writable
 if not os.access(current_dir, os.W_OK):
     fallback_dir = "/tmp"  # Safe default for most Linux systems
     log_file = os.path.join(fallback_dir, DEFAULT_LOG_FILENAME)
 
-# Now configure logging
-import logging
-
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.FileHandler(log_file), logging.StreamHandler(sys.stdout)],
-)
+# Now configure logging (LOG_LEVEL, LOG_FORMAT, LOG_ASYNC)
+configure_logging(log_file)
 logger = logging.getLogger(__name__)
 
 REQUIRED_FIELDS = ["apikey", "request_type"]
 
 
-class ServiceRedemptionProcessor:
-    def __init__(self):
+class BatchedRedemption(NamedTuple):
+    """A validated delivery waiting in a micro-batch"""
+
+    channel: Any
+    delivery_tag: int
+    properties: Any
+    body: bytes
+    event_type: Any
+    message_data: dict
+    idempotency_key: str
+    done: List[str]
+
+
+def coupon_list(coupon_ids) -> list:
+    if coupon_ids is None:
+        return []
+    if isinstance(coupon_ids, (str, int)):
+        return [coupon_ids]
+    return list(coupon_ids)
+
+
+class RabbitMQConsumer:
+    """Blocking pika consumer: connection, worker pool and thread-safe acks.
+
+    Subclasses set queue_name / routing_key and implement process_message.
+    """
+
+    queue_name: str
+    routing_key: str
+    description = "consumer"
+    thread_name_prefix = "worker"
+
+    def __init__(self, worker_count: int = 1, prefetch_count: int = 1):
 
         # RabbitMQ configuration
         self.rabbitmq_config = {
@@ -74,6 +122,12 @@ class ServiceRedemptionProcessor:
             "virtual_host": os.getenv("RABBITMQ_VHOST", RABBITMQ_VHOST),
         }
 
+        # Worker pool: with more than one worker, deliveries are handed to a
+        # thread pool and acked back on the connection thread.
+        self.worker_count = max(1, worker_count)
+        self.prefetch_count = max(1, prefetch_count)
+        self.executor = None
+
         self.connection = None
         self.channel = None
         self.should_stop = False
@@ -82,14 +136,26 @@ class ServiceRedemptionProcessor:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
 
-        logger.info("Service Redemption Processor initialized (No Database)")
-
     def signal_handler(self, signum, frame):
         logger.info(f"Received signal {signum}, shutting down gracefully...")
         self.should_stop = True
         if self.connection and not self.connection.is_closed:
             self.connection.close()
 
+    def declare_topology(self):
+        """Declare exchange and queue (idempotent operations)"""
+        self.channel.exchange_declare(
+            exchange="dealership_exchange", exchange_type="direct", durable=True
+        )
+
+        self.channel.queue_declare(queue=self.queue_name, durable=True)
+
+        self.channel.queue_bind(
+            exchange="dealership_exchange",
+            queue=self.queue_name,
+            routing_key=self.routing_key,
+        )
+
     def connect_rabbitmq(self):
         """Establish connection to RabbitMQ"""
         try:
@@ -109,21 +175,11 @@ class ServiceRedemptionProcessor:
             self.connection = pika.BlockingConnection(parameters)
             self.channel = self.connection.channel()
 
-            # Declare exchange and queue (idempotent operations)
-            self.channel.exchange_declare(
-                exchange="dealership_exchange", exchange_type="direct", durable=True
-            )
+            self.declare_topology()
 
-            self.channel.queue_declare(queue="service_redemption_queue", durable=True)
-
-            self.channel.queue_bind(
-                exchange="dealership_exchange",
-                queue="service_redemption_queue",
-                routing_key="service.redemption",
-            )
-
-            # Set QoS to process one message at a time
-            self.channel.basic_qos(prefetch_count=1)
+            # Prefetch bounds how many deliveries can be in flight (and queued
+            # for the worker pool) at once
+            self.channel.basic_qos(prefetch_count=self.prefetch_count)
 
             logger.info("Successfully connected to RabbitMQ")
             return True
@@ -132,156 +188,737 @@ class ServiceRedemptionProcessor:
             logger.error(f"Failed to connect to RabbitMQ: {str(e)}")
             return False
 
+    def _count(self, event: str):
+        metrics.MESSAGES.inc(queue=self.queue_name, event=event)
+
+    # =============================
+    # 📨 Ack / Nack (thread-safe)
+    # =============================
+    def _on_connection_thread(self, channel, callback):
+        """Run a channel operation on pika's I/O thread.
+
+        pika channels are not thread-safe, so worker threads schedule acks
+        through ``add_callback_threadsafe`` instead of calling them directly.
+        """
+        if self.executor is None:
+            callback()
+            return
+
+        def guarded():
+            if channel.is_open:
+                callback()
+            else:
+                logger.warning(
+                    "⚠️ Channel closed before ack, message will be redelivered"
+                )
+
+        try:
+            channel.connection.add_callback_threadsafe(guarded)
+        except Exception as e:
+            logger.error(f"❌ Could not schedule ack on connection thread: {e}")
+
+    def _ack(self, channel, delivery_tag):
+        self._count("acked")
+        # With workers this times the hand-off to the connection thread
+        with metrics.stage("ack"):
+            self._on_connection_thread(
+                channel, functools.partial(channel.basic_ack, delivery_tag=delivery_tag)
+            )
+
+    def _nack(self, channel, delivery_tag, requeue=False):
+        self._count("nacked")
+        self._on_connection_thread(
+            channel,
+            functools.partial(
+                channel.basic_nack, delivery_tag=delivery_tag, requeue=requeue
+            ),
+        )
+
+    # =============================
+    # 📥 RabbitMQ Callback
+    # =============================
+    def message_callback(self, channel, method, properties, body):
+        self._count("consumed")
+        if self.executor is None:
+            self.process_message(channel, method, properties, body)
+            return
+
+        # Prefetch caps how many deliveries we hold, so the pool's queue is bounded
+        self.executor.submit(self.process_message, channel, method, properties, body)
+
+    def process_message(self, channel, method, properties, body):
+        raise NotImplementedError
+
+    # =============================
+    # 📈 Queue depth
+    # =============================
+    def depth_queues(self) -> List[str]:
+        """Queues whose ready-message count is exported as a metric"""
+        return [self.queue_name]
+
+    def _poll_queue_depth(self):
+        """Runs on the connection thread every METRICS_QUEUE_DEPTH_INTERVAL"""
+        if self.channel is None or not self.channel.is_open:
+            return
+        self.connection.call_later(METRICS_QUEUE_DEPTH_INTERVAL, self._poll_queue_depth)
+        try:
+            for name in self.depth_queues():
+                declared = self.channel.queue_declare(queue=name, passive=True)
+                metrics.QUEUE_DEPTH.set(declared.method.message_count, queue=name)
+        except Exception as e:
+            logger.warning(f"⚠️ Queue depth poll failed: {e}")
+
+    # =============================
+    # ▶️ Start Consuming
+    # =============================
+    def on_connected(self):
+        """Hook run after every (re)connect, before consuming starts"""
+
+    def start_consuming(self):
+        """Start consuming messages from RabbitMQ"""
+        logger.info(f"🚀 Starting {self.description}...")
+
+        if self.worker_count > 1:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.worker_count,
+                thread_name_prefix=self.thread_name_prefix,
+            )
+            logger.info(
+                f"🧵 Worker pool enabled: {self.worker_count} workers, "
+                f"prefetch {self.prefetch_count}"
+            )
+        metrics.start_server()
+
+        while not self.should_stop:
+            try:
+                # Connect to RabbitMQ
+                if not self.connect_rabbitmq():
+                    logger.error(
+                        "❌ Failed to connect to RabbitMQ, retrying in 5 seconds..."
+                    )
+                    time.sleep(5)
+                    continue
+
+                self.on_connected()
+                if METRICS_PORT:
+                    self._poll_queue_depth()
+
+                # Start consuming messages
+                self.channel.basic_consume(
+                    queue=self.queue_name,
+                    on_message_callback=self.message_callback,
+                )
+
+                logger.info(
+                    "👂 Consumer started. Waiting for messages. Press CTRL+C to stop."
+                )
+                self.channel.start_consuming()
+
+            except KeyboardInterrupt:
+                logger.info("🛑 Stopping consumer...")
+                self.should_stop = True
+                if self.channel:
+                    self.channel.stop_consuming()
+                break
+            except Exception as e:
+                logger.error(f"❌ Error in consumer loop: {str(e)}")
+                # Clean up connection
+                if self.connection and not self.connection.is_closed:
+                    try:
+                        self.connection.close()
+                    except:
+                        pass
+                # Wait before retrying
+                time.sleep(5)
+
+        if self.executor is not None:
+            # Unacked deliveries are redelivered by the broker once the
+            # connection is gone, so there is nothing left to flush here.
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        logger.info("🏁 Consumer stopped")
+
+
+class ServiceRedemptionProcessor(RabbitMQConsumer):
+    queue_name = "service_redemption_queue"
+    routing_key = "service.redemption"
+    description = "service redemption consumer (No Database)"
+    thread_name_prefix = "redemption"
+
+    def __init__(self):
+        super().__init__(CONSUMER_WORKERS, CONSUMER_PREFETCH)
+
+        # Micro-batching (REDEMPTION_BATCH_WINDOW_MS > 0): deliveries are
+        # buffered on the connection thread and redeemed per contract/dealer.
+        # The broker only hands out prefetch_count deliveries, so keep it at
+        # least as large as a batch.
+        self.batch_window = max(0, REDEMPTION_BATCH_WINDOW_MS) / 1000.0
+        self.batch_max = max(1, REDEMPTION_BATCH_MAX)
+        if self.batch_window:
+            self.prefetch_count = max(self.prefetch_count, self.batch_max)
+        self._batch: List[tuple] = []
+        self._batch_timer = None
+        # One combined claim per group only if every partner accepts it
+        self.combine_claims = all(
+            name in BATCH_COMBINE_PARTNERS for name in GUARDED_CALLS
+        )
+
+        # Redemptions already submitted to the partners (skip on redelivery)
+        self.idempotency = IdempotencyStore(idempotency_file)
+
+        # SIGHUP drops cached credentials / dealer reference data
+        signal.signal(signal.SIGHUP, self.invalidate_caches)
+        # SIGUSR1 logs DB pool and cache statistics
+        signal.signal(signal.SIGUSR1, self.report_stats)
+
+        logger.info("Service Redemption Processor initialized (No Database)")
+
+    def invalidate_caches(self, signum=None, frame=None):
+        logger.info(f"♻️ Invalidating caches, stats before reset: {cache_stats()}")
+        invalidate_api_credentials()
+        invalidate_reference_data()
+        name_search.refresh()
+        invalidate_coverage_cache()
+        count_cache.invalidate()
+
+    def report_stats(self, signum=None, frame=None):
+        logger.info(f"📊 DB pools: {pool_stats()}")
+        logger.info(f"📊 Caches: {cache_stats()}")
+        logger.info(f"📊 Partner HTTP: {http_stats()}")
+        logger.info(f"📊 Partner guards: {guard_stats()}")
+
+    def declare_topology(self):
+        super().declare_topology()
+        # Delay queues dead-letter back into dealership_exchange, plus the
+        # parking lot for redemptions that ran out of retries
+        retry_queue.declare_retry_queues(
+            self.channel, self.queue_name, self.routing_key
+        )
+
     # =============================
     # 🔑 JWT Decode & Validate
     # =============================
     def _decrypt_and_validate(self, payload: bytes) -> dict | None:
         try:
-            logger.info(f"📩 Incoming body: {payload}")
+            log_payload("📩 Incoming body", payload)
 
             token = payload.get("apikey")  # now expecting JWT instead of apikey
             if not token:
                 logger.warning("⚠️ Missing required 'token' field.")
+                metrics.JWT_FAILURES.inc(reason="missing")
                 return None
 
             decoded = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
 
-            logger.info(f"🔑 Decoded JWT payload: {decoded}")
+            log_payload("🔑 Decoded JWT payload", decoded)
             # ✅ If verification succeeds, return decoded data
             return decoded
 
         except jwt.ExpiredSignatureError:
             logger.error("❌ Token has expired.")
+            metrics.JWT_FAILURES.inc(reason="expired")
             return None
         except jwt.InvalidTokenError as e:
             logger.error(f"❌ Invalid token: {e}")
+            metrics.JWT_FAILURES.inc(reason="invalid")
             return None
         except Exception as e:
             logger.error(f"❌ Error decrypting and validating message: {e}")
+            metrics.JWT_FAILURES.inc(reason="error")
             return None
 
+    def _republish_retry(
+        self, channel, delivery_tag, properties, body, done, reason, counted
+    ):
+        headers = getattr(properties, "headers", None)
+        attempt = retry_queue.attempt_of(headers)
+        # Uncounted retries (throttled by our own limit) wait in the first tier
+        target, delay = retry_queue.retry_target(
+            self.queue_name, attempt if counted else 0
+        )
+        channel.basic_publish(
+            exchange="",
+            routing_key=target,
+            body=body,
+            properties=retry_queue.retry_properties(
+                properties,
+                retry_queue.retry_headers(headers, attempt, done, reason, counted),
+                delay,
+            ),
+        )
+        channel.basic_ack(delivery_tag=delivery_tag)
+        self._count("retried" if delay is not None else "parked")
+        if delay is None:
+            logger.error(f"🅿️ Parked after {attempt + 1} attempts: {reason}")
+        else:
+            logger.warning(f"🔁 Retry {attempt + 1} in {delay:g}s: {reason}")
+
+    def _retry(
+        self, channel, delivery_tag, properties, body, done, reason, counted=True
+    ):
+        """Move a delivery to its delay queue (or the parking lot), then ack.
+
+        counted=False keeps the attempt number (see counts_as_attempt).
+        """
+        self._on_connection_thread(
+            channel,
+            functools.partial(
+                self._republish_retry,
+                channel,
+                delivery_tag,
+                properties,
+                body,
+                list(done),
+                reason,
+                counted,
+            ),
+        )
+
+    # =============================
+    # 🧾 Redemption pipeline
+    # =============================
+    def redeem(self, message_data: dict, done=()) -> bool:
+        """Load the context and submit the claim; True if every call succeeded"""
+        ContractID = message_data.get("ContractID")
+        coupon_ids = message_data.get("CouponID")
+        ID = message_data.get("ID")
+        # ========
+        # DB OPERATION
+        # ========
+        context = get_redemption_context(ContractID, coupon_ids, ID)
+        return self.submit_redemption(message_data, context, done)
+
+    def submit_redemption(self, message_data: dict, context, done=()) -> bool:
+        """Submit the claim for a loaded context; True if every call succeeded.
+
+        Calls named in done already succeeded on an earlier attempt and are
+        skipped.
+        """
+        ID = message_data.get("ID")
+        contractDetails = context.contract
+        coupansDetails = context.coupons
+        apiCredentials = context.credentials
+        log_payload("contractDetails", contractDetails)
+        log_payload("coupansDetails", coupansDetails)
+        log_payload("apiCredentials", apiCredentials)
+        tracing.annotate(
+            DealerID=(contractDetails or {}).get("DealerID"),
+            coupons=len(coupansDetails or []),
+        )
+        # ========
+        # requests
+        # ========
+        if context.complete:
+            # AUTTO, export and SOAP don't depend on each other: fan out
+            calls = {
+                "autto": lambda: request_AUTTO(
+                    contractDetails, coupansDetails, apiCredentials
+                ),
+                "export": lambda: submit_export(
+                    contractDetails,
+                    ID,
+                    export_format=message_data.get("ExportFormat"),
+                    priority=message_data.get("ExportPriority"),
+                ),
+                "soap": lambda: request_SOAP(
+                    apiCredentials, contractDetails, coupansDetails
+                ),
+            }
+            outcome = run_fanout(
+                {name: call for name, call in calls.items() if name not in done}
+            )
+            log_payload("OUTCOME", outcome.to_dict())
+            message_data["outcome"] = {
+                **{name: "skipped" for name in done},
+                **outcome.statuses(),
+            }
+            tracing.annotate(
+                **{f"outcome.{name}": v for name, v in message_data["outcome"].items()}
+            )
+            return outcome.ok
+        return False
+
     # =============================
     # 📥 RabbitMQ Callback
     # =============================
     def message_callback(self, channel, method, properties, body):
+        if not self.batch_window:
+            super().message_callback(channel, method, properties, body)
+            return
+        self._count("consumed")
+        self._buffer(channel, method, properties, body)
+
+    @metrics.timed("message")
+    def process_message(self, channel, method, properties, body):
+        done = retry_queue.done_of(getattr(properties, "headers", None))
+        message_data = None
+        sample_payloads()
         try:
-            payload = json.loads(body)
+            with metrics.stage("decode"):
+                payload = json.loads(body)
             event_type = payload.get("request_type")
             # =========
             # Decrypt & Validate
             # =========
-            message_data = self._decrypt_and_validate(payload)
+            with metrics.stage("jwt"):
+                message_data = self._decrypt_and_validate(payload)
             if not message_data:
                 logger.warning("⚠️ Rejecting message due to failed JWT validation")
-                channel.basic_ack(delivery_tag=method.delivery_tag)
+                tracing.annotate(rejected="jwt")
+                self._ack(channel, method.delivery_tag)
                 return
+            tracing.annotate(
+                ContractID=message_data.get("ContractID"),
+                ID=message_data.get("ID"),
+                attempt=retry_queue.attempt_of(getattr(properties, "headers", None)),
+            )
 
-            ContractID = message_data.get("ContractID")
-            coupon_ids = message_data.get("CouponID")
-            ID = message_data.get("ID")
             # ========
-            # DB OPERATION
+            # DUPLICATE CHECK
             # ========
-            contractDetails = get_contract_details(ContractID)
-            coupansDetails = get_coupons_details(
-                contract_id=ContractID, coupon_ids=coupon_ids
-            )
-            apiCredentials = get_api_credentials(ID)
-            print(
-                "contractDetails \n", json.dumps(contractDetails, indent=2, default=str)
-            )
-            print(
-                "coupansDetails \n", json.dumps(coupansDetails, indent=2, default=str)
+            idempotency_key = IdempotencyStore.key_for(
+                message_data.get("ContractID"),
+                message_data.get("CouponID"),
+                message_data.get("ID"),
             )
-            print(
-                "apiCredentials \n", json.dumps(apiCredentials, indent=2, default=str)
-            )
-            # ========
-            # requests
-            # ========
-            if contractDetails and coupansDetails and apiCredentials:
-                result_autto = request_AUTTO(
-                    contractDetails, coupansDetails, apiCredentials
-                )
-                print("AUTTO \n", json.dumps(result_autto, indent=2, default=str))
+            if not self.idempotency.begin(idempotency_key):
+                logger.info(f"⏭️ Duplicate redemption {idempotency_key}, skipping")
+                tracing.annotate(duplicate=True)
+                self._ack(channel, method.delivery_tag)
+                return
 
-                export_to_email(contractDetails, ID)
-                result_soap = request_SOAP(
-                    apiCredentials, contractDetails, coupansDetails
+            succeeded = False
+            try:
+                # Calls an earlier delivery already made, even if its retry
+                # copy (and x-redemption-done) is still in a delay queue
+                done = list(
+                    dict.fromkeys(done + self.idempotency.done_calls(idempotency_key))
+                )
+                succeeded = self.redeem(message_data, done)
+            finally:
+                self.idempotency.finish(
+                    idempotency_key,
+                    succeeded,
+                    retry_queue.completed_calls(message_data),
                 )
-                print("SOAP \n", json.dumps(result_soap, indent=2, default=str))
             # ========
             # LOGGING
             # ========
             save_message(message_data, event_type, processed_file, transaction_log_file)
 
-            # Always acknowledge for now
-            channel.basic_ack(delivery_tag=method.delivery_tag)
+            # Transient partner failures go to the delay queues, the rest
+            # (e.g. unknown contract) is acknowledged as before
+            if not succeeded and retry_queue.is_retryable(message_data):
+                self._retry(
+                    channel,
+                    method.delivery_tag,
+                    properties,
+                    body,
+                    done + retry_queue.completed_calls(message_data),
+                    retry_queue.retry_reason(message_data),
+                    retry_queue.counts_as_attempt(message_data),
+                )
+                return
+            self._ack(channel, method.delivery_tag)
             logger.info("✅ Message processed & acknowledged")
 
+        except json.JSONDecodeError as e:
+            logger.error(f"❌ Invalid JSON in message: {e}")
+            self._ack(channel, method.delivery_tag)
         except Exception as e:
             logger.error(f"❌ Error processing message: {e}")
-            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            self._retry(
+                channel,
+                method.delivery_tag,
+                properties,
+                body,
+                done + retry_queue.completed_calls(message_data),
+                e,
+            )
+
+    # =============================
+    # 📦 Micro-batching
+    # =============================
+    def _buffer(self, channel, method, properties, body):
+        """Collect a delivery; runs on the connection thread"""
+        self._batch.append((channel, method, properties, body))
+        if len(self._batch) >= self.batch_max:
+            self._flush_batch()
+        elif self._batch_timer is None:
+            self._batch_timer = self.connection.call_later(
+                self.batch_window, self._on_batch_timer
+            )
 
+    def _on_batch_timer(self):
+        self._batch_timer = None
+        self._flush_batch()
+
+    def _flush_batch(self):
+        if self._batch_timer is not None:
+            self.connection.remove_timeout(self._batch_timer)
+            self._batch_timer = None
+        deliveries, self._batch = self._batch, []
+        if not deliveries:
+            return
+
+        if self.executor is None:
+            self.process_batch(deliveries)
+        else:
+            self.executor.submit(self.process_batch, deliveries)
+
+    def _accept(self, channel, method, properties, body):
+        """Validate one delivery; None if it was already acked"""
+        try:
+            with metrics.stage("decode"):
+                payload = json.loads(body)
         except json.JSONDecodeError as e:
             logger.error(f"❌ Invalid JSON in message: {e}")
-            channel.basic_ack(delivery_tag=method.delivery_tag)
+            self._ack(channel, method.delivery_tag)
+            return None
+
+        with metrics.stage("jwt"):
+            message_data = self._decrypt_and_validate(payload)
+        if not message_data:
+            logger.warning("⚠️ Rejecting message due to failed JWT validation")
+            self._ack(channel, method.delivery_tag)
+            return None
+
+        idempotency_key = IdempotencyStore.key_for(
+            message_data.get("ContractID"),
+            message_data.get("CouponID"),
+            message_data.get("ID"),
+        )
+        if not self.idempotency.begin(idempotency_key):
+            logger.info(f"⏭️ Duplicate redemption {idempotency_key}, skipping")
+            self._ack(channel, method.delivery_tag)
+            return None
+
+        return BatchedRedemption(
+            channel,
+            method.delivery_tag,
+            properties,
+            body,
+            payload.get("request_type"),
+            message_data,
+            idempotency_key,
+            retry_queue.done_of(getattr(properties, "headers", None)),
+        )
+
+    def _retry_group(self, group: List[BatchedRedemption], done, reason):
+        for entry in group:
+            self._retry(
+                entry.channel,
+                entry.delivery_tag,
+                entry.properties,
+                entry.body,
+                entry.done + done,
+                reason,
+            )
+
+    def _fail_group(self, group: List[BatchedRedemption], error: Exception):
+        logger.error(f"❌ Error processing batched redemption: {error}")
+        for entry in group:
+            self.idempotency.finish(entry.idempotency_key, False)
+        self._retry_group(group, [], error)
+
+    def _redeem_group(
+        self, key, group: List[BatchedRedemption], message_data: dict, contexts
+    ):
+        """Submit one merged (ContractID, ID) group and ack/retry its deliveries"""
+        try:
+            if key[0] in contexts:
+                context = contexts[key[0]]
+            else:
+                context = get_redemption_context(
+                    message_data["ContractID"],
+                    message_data["CouponID"],
+                    message_data.get("ID"),
+                )
+            # A call is skipped only if it already succeeded for every entry
+            done = set.intersection(
+                *(
+                    set(entry.done + self.idempotency.done_calls(entry.idempotency_key))
+                    for entry in group
+                )
+            )
+            succeeded = self.submit_redemption(message_data, context, sorted(done))
         except Exception as e:
-            logger.error(f"❌ Error in message callback: {str(e)}")
-            channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            self._fail_group(group, e)
+            return
 
-    # =============================
-    # ▶️ Start Consuming
-    # =============================
-    def start_consuming(self):
-        """Start consuming messages from RabbitMQ"""
-        logger.info("🚀 Starting service redemption consumer (No Database)...")
+        settled = set()
+        try:
+            completed = retry_queue.completed_calls(message_data)
+            for entry in group:
+                self.idempotency.finish(entry.idempotency_key, succeeded, completed)
+                entry.message_data["outcome"] = message_data.get("outcome")
+                if len(group) > 1:
+                    entry.message_data["batched_coupons"] = message_data["CouponID"]
+                save_message(
+                    entry.message_data,
+                    entry.event_type,
+                    processed_file,
+                    transaction_log_file,
+                )
+            if not succeeded and retry_queue.is_retryable(message_data):
+                reason = retry_queue.retry_reason(message_data)
+                counted = retry_queue.counts_as_attempt(message_data)
+                for entry in group:
+                    self._retry(
+                        entry.channel,
+                        entry.delivery_tag,
+                        entry.properties,
+                        entry.body,
+                        entry.done + completed,
+                        reason,
+                        counted,
+                    )
+                    settled.add(entry.delivery_tag)
+                return
+            for entry in group:
+                self._ack(entry.channel, entry.delivery_tag)
+                settled.add(entry.delivery_tag)
+            logger.info(f"✅ {len(group)} message(s) processed & acknowledged")
+        except Exception as e:
+            self._fail_group(
+                [entry for entry in group if entry.delivery_tag not in settled], e
+            )
 
-        while not self.should_stop:
+    def _group_key(self, entry: BatchedRedemption) -> tuple:
+        # Retried deliveries skip the calls they already made, so they are
+        # redeemed on their own, as is everything when a partner does not
+        # accept combined claims (BATCH_COMBINE_PARTNERS)
+        retried = retry_queue.attempt_of(getattr(entry.properties, "headers", None))
+        return (
+            str(entry.message_data.get("ContractID")),
+            str(entry.message_data.get("ID")),
+            entry.delivery_tag if retried or not self.combine_claims else None,
+        )
+
+    def _group_batch(self, pending: List[tuple], groups: Dict[tuple, list]):
+        """Move deliveries from pending into groups (or settle them)"""
+        while pending:
+            channel, method, properties, body = pending.pop(0)
+            entry = None
             try:
-                # Connect to RabbitMQ
-                if not self.connect_rabbitmq():
-                    logger.error(
-                        "❌ Failed to connect to RabbitMQ, retrying in 5 seconds..."
-                    )
-                    time.sleep(5)
+                entry = self._accept(channel, method, properties, body)
+                if entry is not None:
+                    groups.setdefault(self._group_key(entry), []).append(entry)
+            except Exception as e:
+                if entry is not None:
+                    self._fail_group([entry], e)
                     continue
+                logger.error(f"❌ Error processing message: {e}")
+                self._retry(channel, method.delivery_tag, properties, body, [], e)
+
+    def _redeem_batch(self, groups: Dict[tuple, List[BatchedRedemption]]):
+        """Redeem the groups, removing each one once it is handed off"""
+        # One combined redemption per group: the union of its coupons
+        merged = {}
+        for key, group in groups.items():
+            message_data = dict(group[0].message_data)
+            coupons = []
+            for entry in group:
+                coupons.extend(coupon_list(entry.message_data.get("CouponID")))
+            message_data["CouponID"] = list(dict.fromkeys(coupons))
+            merged[key] = message_data
+
+        # Contexts in one IN (...) query; a contract batched under several
+        # IDs can't share it (coupons are matched per contract)
+        contract_counts: Dict[str, int] = {}
+        for contract_id, *_ in groups:
+            contract_counts[contract_id] = contract_counts.get(contract_id, 0) + 1
+        batched = [key for key in groups if contract_counts[key[0]] == 1]
+        try:
+            contexts = get_redemption_contexts(
+                [
+                    (
+                        merged[key]["ContractID"],
+                        merged[key]["CouponID"],
+                        merged[key].get("ID"),
+                    )
+                    for key in batched
+                ]
+            )
+        except Exception as e:
+            for key in batched:
+                self._fail_group(groups.pop(key), e)
+            contexts = {}
 
-                # Start consuming messages
-                self.channel.basic_consume(
-                    queue="service_redemption_queue",
-                    on_message_callback=self.message_callback,
-                )
-
+        for key in list(groups):
+            group = groups.pop(key)
+            try:
+                with tracing.span(
+                    "redemption", ContractID=key[0], ID=key[1], messages=len(group)
+                ):
+                    self._redeem_group(key, group, merged[key], contexts)
+            except Exception as e:
+                self._fail_group(group, e)
+
+    @metrics.timed("batch")
+    def process_batch(self, deliveries: List[tuple]):
+        """Redeem a micro-batch with one claim per (ContractID, ID) group"""
+        sample_payloads()
+        # Deliveries leave pending/groups once they are settled or handed to
+        # a guarded step, so an unexpected error can still retry the rest
+        # (this runs on the executor, where an exception would be lost)
+        pending = list(deliveries)
+        groups: Dict[tuple, List[BatchedRedemption]] = {}
+        try:
+            self._group_batch(pending, groups)
+            if groups:
                 logger.info(
-                    "👂 Consumer started. Waiting for messages. Press CTRL+C to stop."
+                    f"📦 Batch of {len(deliveries)} deliveries -> "
+                    f"{len(groups)} redemptions"
                 )
-                self.channel.start_consuming()
+                self._redeem_batch(groups)
+        except Exception as e:
+            logger.error(f"❌ Error processing batch: {e}")
+            for channel, method, properties, body in pending:
+                self._retry(channel, method.delivery_tag, properties, body, [], e)
+            for group in groups.values():
+                self._fail_group(group, e)
 
-            except KeyboardInterrupt:
-                logger.info("🛑 Stopping consumer...")
-                self.should_stop = True
-                if self.channel:
-                    self.channel.stop_consuming()
-                break
-            except Exception as e:
-                logger.error(f"❌ Error in consumer loop: {str(e)}")
-                # Clean up connection
-                if self.connection and not self.connection.is_closed:
-                    try:
-                        self.connection.close()
-                    except:
-                        pass
-                # Wait before retrying
-                time.sleep(5)
+    # =============================
+    # 📈 Queue depth
+    # =============================
+    def depth_queues(self) -> List[str]:
+        return super().depth_queues() + [
+            name
+            for name, _ in retry_queue.retry_queues(self.queue_name, self.routing_key)
+        ]
 
-        logger.info("🏁 Consumer stopped")
+    # =============================
+    # ▶️ Start Consuming
+    # =============================
+    def on_connected(self):
+        # Deliveries buffered on a dropped channel will be redelivered
+        self._batch = []
+        self._batch_timer = None
+
+    def start_consuming(self):
+        if self.batch_window:
+            logger.info(
+                f"📦 Micro-batching enabled: {self.batch_window * 1000:.0f} ms window, "
+                f"up to {self.batch_max} messages, "
+                f"{'combined' if self.combine_claims else 'one claim per message'}"
+            )
+        super().start_consuming()
+        close_sessions()
 
 
 def main():
     """Main function to start the processor"""
     try:
-        processor = ServiceRedemptionProcessor()
+        if CONSUMER_ENGINE == "asyncio":
+            from async_service_redemption_consumer import (
+                AsyncServiceRedemptionProcessor,
+            )
+
+            processor = AsyncServiceRedemptionProcessor()
+        else:
+            processor = ServiceRedemptionProcessor()
         processor.start_consuming()
     except Exception as e:
         logger.error(f"💥 Fatal error: {e}")
@@ -0,0 +1,54 @@
+import os
+import sys
+
+import pytest
+
+# config.py reads the environment at import time; the unit tests never touch
+# RabbitMQ or MySQL, but the modules building engines at import need a URL
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("RABBITMQ_PORT", "5672")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeChannel:
+    """Records what a consumer does with its deliveries"""
+
+    is_open = True
+
+    def __init__(self):
+        self.acked = []
+        self.nacked = []
+        self.published = []
+
+    def basic_ack(self, delivery_tag):
+        self.acked.append(delivery_tag)
+
+    def basic_nack(self, delivery_tag, requeue=False):
+        self.nacked.append(delivery_tag)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published.append((routing_key, body, properties))
+
+
+@pytest.fixture
+def channel():
+    return FakeChannel()
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    """ServiceRedemptionProcessor without a broker, signal handlers or journal"""
+    import service_redemption_consumer as consumer
+    from utils.idempotency import IdempotencyStore
+
+    monkeypatch.setattr(consumer, "save_message", lambda *args: None)
+    processor = consumer.ServiceRedemptionProcessor.__new__(
+        consumer.ServiceRedemptionProcessor
+    )
+    processor.executor = None
+    processor.connection = None
+    processor.combine_claims = False
+    processor.idempotency = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+    yield processor
+    processor.idempotency.close()
@@ -0,0 +1,57 @@
+import asyncio
+import types
+
+import pytest
+
+import async_service_redemption_consumer as async_consumer
+from utils import metrics
+
+
+class FakeAMQPChannel:
+    """Answers passive declares with a count that changes on every call"""
+
+    def __init__(self):
+        self.declares = []
+
+    async def queue_declare(self, name, passive=False):
+        assert passive
+        self.declares.append(name)
+        if name.endswith(".parking"):
+            raise RuntimeError("NOT_FOUND")
+        return types.SimpleNamespace(message_count=len(self.declares))
+
+
+def _depth(name):
+    label = f'queue="{name}"'
+    for line in metrics.QUEUE_DEPTH.lines():
+        if label in line:
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_queue_depth_is_polled_from_the_broker(monkeypatch):
+    processor = async_consumer.AsyncServiceRedemptionProcessor.__new__(
+        async_consumer.AsyncServiceRedemptionProcessor
+    )
+    amqp_channel = FakeAMQPChannel()
+
+    async def get_underlay_channel():
+        return amqp_channel
+
+    processor.channel = types.SimpleNamespace(get_underlay_channel=get_underlay_channel)
+    sweeps = []
+
+    async def sleep(seconds):
+        sweeps.append(_depth(processor.queue_name))
+        if len(sweeps) == 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(async_consumer.asyncio, "sleep", sleep)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(processor.poll_queue_depth())
+
+    names = processor.depth_queues()
+    assert amqp_channel.declares == names + names
+    # A fresh count every sweep, and one failing queue doesn't stop the rest
+    assert sweeps == [1, 1 + len(names)]
+    assert _depth(names[-2]) == 2 * len(names) - 1
@@ -0,0 +1,88 @@
+import json
+import types
+
+import pytest
+
+import service_redemption_consumer as consumer
+from utils import retry_queue
+
+
+@pytest.fixture
+def batching(processor, monkeypatch):
+    processor._decrypt_and_validate = lambda payload: payload
+    monkeypatch.setattr(consumer, "get_redemption_contexts", lambda items: {})
+    monkeypatch.setattr(consumer, "get_redemption_context", lambda *args: None)
+    submitted = []
+
+    def submit_redemption(message_data, context, done=()):
+        submitted.append(list(message_data["CouponID"]))
+        message_data["outcome"] = {"autto": "ok", "export": "ok", "soap": "ok"}
+        return True
+
+    processor.submit_redemption = submit_redemption
+    processor.submitted = submitted
+    return processor
+
+
+def _deliveries(channel, *coupons, headers=None):
+    return [
+        (
+            channel,
+            types.SimpleNamespace(delivery_tag=tag),
+            types.SimpleNamespace(headers=headers),
+            json.dumps({"ContractID": 7, "ID": 3, "CouponID": [coupon]}).encode(),
+        )
+        for tag, coupon in enumerate(coupons)
+    ]
+
+
+def test_one_claim_per_delivery_by_default(batching, channel):
+    batching.process_batch(_deliveries(channel, 1, 2))
+    assert batching.submitted == [[1], [2]]
+    assert channel.acked == [0, 1]
+
+
+def test_combined_claim_when_every_partner_opted_in(batching, channel):
+    batching.combine_claims = True
+    batching.process_batch(_deliveries(channel, 1, 2, 2))
+    # The second coupon-2 delivery is a duplicate of one in flight
+    assert batching.submitted == [[1, 2]]
+    assert sorted(channel.acked) == [0, 1, 2]
+
+
+def test_retried_deliveries_are_never_combined(batching, channel):
+    batching.combine_claims = True
+    headers = {retry_queue.ATTEMPT_HEADER: 1}
+    batching.process_batch(_deliveries(channel, 1, 2, headers=headers))
+    assert batching.submitted == [[1], [2]]
+
+
+def test_combine_claims_needs_every_partner(monkeypatch):
+    def combine(partners):
+        monkeypatch.setattr(consumer, "BATCH_COMBINE_PARTNERS", partners)
+        monkeypatch.setattr(consumer.signal, "signal", lambda *args: None)
+        monkeypatch.setattr(consumer, "IdempotencyStore", lambda path: None)
+        return consumer.ServiceRedemptionProcessor().combine_claims
+
+    assert not combine(())
+    assert not combine(("autto",))
+    assert combine(("autto", "soap"))
+
+
+def test_failed_save_retries_only_its_delivery(batching, channel, monkeypatch):
+    saved = []
+
+    def save_message(message_data, *args):
+        saved.append(message_data["CouponID"])
+        if len(saved) == 2:
+            raise OSError("disk full")
+
+    monkeypatch.setattr(consumer, "save_message", save_message)
+    batching.process_batch(_deliveries(channel, 1, 2, 3))
+
+    assert channel.acked[0] == 0
+    assert channel.acked[-1] == 2
+    routing_key, _, properties = channel.published[0]
+    assert routing_key.startswith("service_redemption_queue.retry.")
+    assert properties.headers[retry_queue.REASON_HEADER] == "disk full"
+    assert not batching.idempotency._in_flight
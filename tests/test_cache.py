@@ -0,0 +1,83 @@
+from utils import cache as cache_module
+from utils.cache import TTLCache
+
+
+def test_hit_and_miss():
+    cache = TTLCache("t")
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_none_is_not_cached():
+    cache = TTLCache("t")
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None
+
+    assert cache.get_or_load("a", loader) is None
+    assert cache.get_or_load("a", loader) is None
+    assert len(calls) == 2
+
+
+def test_lru_eviction():
+    cache = TTLCache("t", max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # b is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = TTLCache("t", ttl=10)
+    cache.set("a", 1)
+    now[0] += 9
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_byte_bound():
+    cache = TTLCache("t", max_bytes=10, sizeof=len)
+    cache.set("a", "xxxx")
+    cache.set("b", "xxxx")
+    cache.set("c", "xxxx")  # 12 bytes: evicts a
+    assert cache.get("a") is None
+    assert cache.bytes == 8
+    cache.set("big", "x" * 11)  # larger than the whole cache
+    assert cache.get("big") is None
+    assert cache.get("b") == "xxxx"
+    assert cache.stats()["bytes_saved"] == 4
+
+
+def test_replacing_a_key_keeps_bytes_right():
+    cache = TTLCache("t", sizeof=len)
+    cache.set("a", "xx")
+    cache.set("a", "xxxxx")
+    assert cache.bytes == 5
+
+
+def test_invalidate():
+    cache = TTLCache("t", sizeof=len)
+    cache.set(("dealer", 1), "x")
+    cache.set(("dealer", 2), "y")
+    cache.set(("token", 1), "z")
+    assert cache.invalidate_where(lambda key: key[0] == "dealer") == 2
+    assert cache.get(("token", 1)) == "z"
+    cache.invalidate(("token", 1))
+    assert cache.get(("token", 1)) is None
+    cache.set("a", "1")
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+    assert cache.bytes == 0
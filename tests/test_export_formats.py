@@ -0,0 +1,86 @@
+import csv
+import gzip
+from decimal import Decimal
+
+import pytest
+
+from utils.action import export_formats
+from utils.action.export_formats import RowBatch, write_batches, write_export
+
+
+def test_no_rows_writes_nothing(tmp_path):
+    stem = str(tmp_path / "export")
+    assert write_batches([RowBatch(["a"], [])], stem, "csv") is None
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize(
+    "fmt,opener", [("csv", open), ("csv.gz", gzip.open)], ids=["csv", "csv.gz"]
+)
+def test_csv_round_trip(tmp_path, fmt, opener):
+    rows = [{"VIN": "1HGCM", "Price": 10}, {"VIN": "2HGCM", "Price": None}]
+    path = write_export(iter(rows), str(tmp_path / "export"), fmt)
+    assert path.endswith("." + fmt)
+    with opener(path, "rt", newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [
+            ["VIN", "Price"],
+            ["1HGCM", "10"],
+            ["2HGCM", ""],
+        ]
+
+
+def test_xlsx_is_written(tmp_path):
+    path = write_export(iter([{"VIN": "1HGCM"}]), str(tmp_path / "export"))
+    assert path.endswith(".xlsx")
+
+
+def test_parquet_casts_later_chunks_to_the_file_schema(tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(export_formats, "EXPORT_CHUNK_SIZE", 1)
+    batches = [
+        RowBatch(["ID", "Price", "Note"], [[1, Decimal("1.50"), None]]),
+        # int where the first chunk had Decimal, another Decimal scale, and
+        # a value in a column that was all NULL so far
+        RowBatch(["ID", "Price", "Note"], [[2, 3, "x"], [3, Decimal("2.125"), 5]]),
+    ]
+    path = write_batches(batches, str(tmp_path / "export"), "parquet")
+
+    table = pq.read_table(path)
+    assert table.column("ID").to_pylist() == [1, 2, 3]
+    assert table.column("Price").to_pylist() == [
+        Decimal("1.50"),
+        Decimal("3.00"),
+        Decimal("2.12"),
+    ]
+    assert table.column("Note").to_pylist() == [None, "x", "5"]
+
+
+def test_failed_export_leaves_no_partial_file(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(export_formats, "EXPORT_CHUNK_SIZE", 1)
+    batches = [
+        RowBatch(["ID"], [[1]]),
+        RowBatch(["ID"], [["not a number"]]),
+    ]
+    with pytest.raises(Exception):
+        write_batches(batches, str(tmp_path / "export"), "parquet")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_interrupted_batches_leave_no_partial_file(tmp_path):
+    def batches():
+        yield RowBatch(["ID"], [[1]])
+        raise ConnectionError("lost connection to MySQL")
+
+    with pytest.raises(ConnectionError):
+        write_batches(batches(), str(tmp_path / "export"), "csv")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_resolve_format(monkeypatch):
+    monkeypatch.setattr(export_formats, "DEALER_FORMATS", {"2975": "parquet"})
+    monkeypatch.setattr(export_formats, "EXPORT_FORMAT", "csv.gz")
+    assert export_formats.resolve_format(2975) == "parquet"
+    assert export_formats.resolve_format(1) == "csv.gz"
+    assert export_formats.resolve_format(2975, "CSV") == "csv"
+    assert export_formats.resolve_format(1, "pdf") == "csv.gz"
@@ -0,0 +1,53 @@
+import json
+import types
+
+import pika
+import pytest
+
+import export_worker
+from utils.export_queue import ATTEMPT_HEADER, EXPORT_QUEUE
+
+
+@pytest.fixture
+def worker():
+    worker = export_worker.ExportWorker.__new__(export_worker.ExportWorker)
+    worker.executor = None
+    return worker
+
+
+def _deliver(worker, channel, attempt=0):
+    properties = pika.BasicProperties(
+        headers={ATTEMPT_HEADER: attempt} if attempt else None,
+        message_id="job-1",
+    )
+    body = json.dumps({"contract": {"DealerID": 2975}, "ID": 3}).encode()
+    worker.process_message(
+        channel, types.SimpleNamespace(delivery_tag=1), properties, body
+    )
+
+
+@pytest.mark.parametrize("sent", [True, None], ids=["sent", "nothing-to-send"])
+def test_done_job_is_acked(worker, channel, monkeypatch, sent):
+    monkeypatch.setattr(export_worker, "export_to_email", lambda *a, **kw: sent)
+    _deliver(worker, channel)
+    assert channel.acked == [1]
+    assert channel.published == []
+
+
+def test_unsent_email_is_retried(worker, channel, monkeypatch):
+    monkeypatch.setattr(export_worker, "export_to_email", lambda *a, **kw: False)
+    _deliver(worker, channel)
+
+    routing_key, _, properties = channel.published[0]
+    assert routing_key.startswith(EXPORT_QUEUE + ".retry.")
+    assert properties.headers[ATTEMPT_HEADER] == 1
+    assert properties.message_id == "job-1"
+    assert channel.acked == [1]
+
+
+def test_unsent_email_on_the_last_attempt_is_nacked(worker, channel, monkeypatch):
+    monkeypatch.setattr(export_worker, "export_to_email", lambda *a, **kw: False)
+    monkeypatch.setattr(export_worker, "EXPORT_MAX_ATTEMPTS", 2)
+    _deliver(worker, channel, attempt=1)
+    assert channel.nacked == [1]
+    assert channel.published == []
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.action import fanout
+from utils.partner_guard import PartnerGuard
+
+
+@pytest.fixture
+def guards(monkeypatch):
+    guards = {"autto": PartnerGuard("autto"), "soap": PartnerGuard("soap")}
+    monkeypatch.setattr(fanout, "guard_for", guards.get)
+    return guards
+
+
+def test_all_ok(guards):
+    outcome = fanout.run_fanout(
+        {"autto": lambda: "claim", "export": lambda: None, "soap": lambda: 1}
+    )
+    assert outcome.ok
+    assert list(outcome.calls) == ["autto", "export", "soap"]
+    assert outcome.calls["autto"].result == "claim"
+
+
+def test_none_fails_a_partner_call(guards):
+    outcome = fanout.run_fanout({"autto": lambda: None, "export": lambda: None})
+    assert outcome.statuses() == {"autto": "failed", "export": "ok"}
+    assert not outcome.ok
+
+
+def test_exception_is_reported_as_error(guards):
+    def boom():
+        raise RuntimeError("disk full")
+
+    outcome = fanout.run_fanout({"export": boom})
+    assert outcome.calls["export"].status == "error"
+    assert outcome.calls["export"].error == "disk full"
+
+
+def test_unguarded_call_times_out_at_the_deadline(guards):
+    release = threading.Event()
+    started = time.monotonic()
+    outcome = fanout.run_fanout(
+        {"export": lambda: release.wait(5), "autto": lambda: "claim"}, timeout=0.1
+    )
+    release.set()
+    assert time.monotonic() - started < 2
+    assert outcome.statuses() == {"export": "timeout", "autto": "ok"}
+
+
+def test_started_partner_call_is_waited_for(guards):
+    def slow_claim():
+        time.sleep(0.3)
+        return "claim"
+
+    outcome = fanout.run_fanout({"autto": slow_claim}, timeout=0.05)
+    # A claim in progress must not come back as "timeout" and be retried
+    assert outcome.calls["autto"].status == "ok"
+    assert guards["autto"].limiter.in_flight == 0
+
+
+def test_rejected_partner_call_is_not_run(guards):
+    guards["soap"].breaker._trip()
+    guards["autto"].limiter.in_flight = int(guards["autto"].limiter.limit)
+    ran = []
+
+    outcome = fanout.run_fanout(
+        {"autto": lambda: ran.append("autto"), "soap": lambda: ran.append("soap")}
+    )
+    assert outcome.statuses() == {"autto": "throttled", "soap": "shed"}
+    assert ran == []
+
+
+def test_async_partner_call_is_not_cancelled(guards):
+    async def slow_claim():
+        await asyncio.sleep(0.2)
+        return "claim"
+
+    async def slow_export():
+        await asyncio.sleep(5)
+
+    outcome = asyncio.run(
+        fanout.run_fanout_async(
+            {"autto": slow_claim, "export": slow_export}, timeout=0.05
+        )
+    )
+    assert outcome.statuses() == {"autto": "ok", "export": "timeout"}
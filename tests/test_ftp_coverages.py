@@ -0,0 +1,117 @@
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import StaticPool
+
+from utils.action import ftp_coverages
+from utils.action.ftp_coverages import (
+    NATIONGUARD,
+    QueryVariant,
+    decode_cursor,
+    encode_cursor,
+)
+
+NATIONGUARD_ID = next(
+    c for c, provider in ftp_coverages.PROVIDERS.items() if provider is NATIONGUARD
+)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2024-01-31 00:00:00", "NG-1", 42)
+    assert decode_cursor(cursor) == ("2024-01-31 00:00:00", "NG-1", 42)
+    assert decode_cursor(cursor, 3) == ("2024-01-31 00:00:00", "NG-1", 42)
+
+
+@pytest.mark.parametrize(
+    "cursor,size",
+    [("not base64!", None), (encode_cursor(1, 2), 3), ("eyJhIjogMX0=", None)],
+    ids=["garbage", "wrong-size", "not-a-list"],
+)
+def test_invalid_cursor(cursor, size):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, size)
+
+
+def test_seek_predicate():
+    assert ftp_coverages._seek_predicate(("a", "b", "c")) == (
+        "((a < :after_0) OR (a = :after_0 AND b < :after_1)"
+        " OR (a = :after_0 AND b = :after_1 AND c < :after_2))"
+    )
+
+
+def test_keyset_is_limited_to_the_raw_table():
+    with pytest.raises(ValueError):
+        ftp_coverages._coverage_statement(
+            NATIONGUARD, QueryVariant(True, vin=True), keyset=True
+        )
+
+
+def test_filtered_page_matches_export(monkeypatch):
+    calls = []
+
+    def fetch(session, sql, params):
+        calls.append((sql, dict(params)))
+        return [{"ContractNo": n} for n in range(params["limit"])]
+
+    monkeypatch.setattr(ftp_coverages, "_fetch_all_dicts", fetch)
+    rows, cursor = ftp_coverages.coverage_page(NATIONGUARD_ID, 2975, "1HGCM", "", 2)
+    assert len(rows) == 2
+    ftp_coverages.coverage_page(NATIONGUARD_ID, 2975, "1HGCM", "", 2, cursor)
+
+    # Same statement and bind values as export(limit=2, offset=2)
+    sql, params = ftp_coverages._route_query(NATIONGUARD_ID, 2975, "1HGCM", "", 2, 2)
+    assert calls[1] == (sql, params)
+
+
+@pytest.fixture
+def raw_table(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def attach(dbapi_connection, _):
+        dbapi_connection.execute("ATTACH DATABASE ':memory:' AS mypcp_roadvant")
+
+    with engine.begin() as connection:
+        connection.execute(
+            text(
+                "CREATE TABLE mypcp_roadvant.tbl_nationgard ("
+                " id INTEGER PRIMARY KEY, SaleDate TEXT, ContractNumber TEXT)"
+            )
+        )
+    monkeypatch.setattr(ftp_coverages, "engine", engine)
+    monkeypatch.setattr(ftp_coverages, "_primary_key", lambda table: ("id",))
+    return engine
+
+
+def test_keyset_walk_returns_every_row_once(raw_table):
+    # Several provider rows share one (SaleDate, ContractNumber)
+    rows = [
+        (1, "2024-01-01", "A"),
+        (2, "2024-01-02", "B"),
+        (3, "2024-01-02", "B"),
+        (4, "2024-01-02", "B"),
+        (5, "2024-01-03", "A"),
+        (6, "2024-01-02", "C"),
+        (7, "2024-01-01", "A"),
+    ]
+    with raw_table.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO mypcp_roadvant.tbl_nationgard"
+                " VALUES (:id, :SaleDate, :ContractNumber)"
+            ),
+            [dict(zip(("id", "SaleDate", "ContractNumber"), row)) for row in rows],
+        )
+
+    pages = list(ftp_coverages.iter_coverage_pages(NATIONGUARD_ID, page_size=2))
+    walked = [row["id"] for page in pages for row in page]
+    expected = [
+        r[0] for r in sorted(rows, key=lambda r: (r[1], r[2], r[0]), reverse=True)
+    ]
+    assert walked == expected
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    # Rows are the raw table's columns, without the keyset aliases
+    assert set(pages[0][0]) == {"id", "SaleDate", "ContractNumber"}
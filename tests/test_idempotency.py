@@ -0,0 +1,119 @@
+import json
+import types
+
+import pytest
+
+from utils import idempotency as idempotency_module
+from utils import retry_queue
+from utils.idempotency import IdempotencyStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "idempotency.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_key_is_independent_of_coupon_order():
+    assert IdempotencyStore.key_for(7, [2, 1], 3) == IdempotencyStore.key_for(
+        7, ["1", "2"], 3
+    )
+    assert IdempotencyStore.key_for(7, 1, 3) == "7|1|3"
+    assert IdempotencyStore.key_for(7, None, 3) == "7||3"
+
+
+def test_begin_claims_a_key_once(store):
+    assert store.begin("k")
+    assert not store.begin("k")  # in flight on another worker
+    store.finish("k", success=False)
+    assert store.begin("k")  # failed: free to retry
+    store.finish("k", success=True)
+    assert store.seen("k")
+    assert not store.begin("k")
+
+
+def test_processed_keys_survive_a_restart(tmp_path):
+    path = str(tmp_path / "idempotency.sqlite3")
+    store = IdempotencyStore(path)
+    store.mark("k")
+    store.close()
+
+    store = IdempotencyStore(path)
+    assert not store.begin("k")
+    store.close()
+
+
+def test_partial_success_records_the_calls(store):
+    assert store.begin("k")
+    store.finish("k", success=False, calls=["export", "autto"])
+    assert store.done_calls("k") == ["autto", "export"]
+    assert store.done_calls("other") == []
+    assert store.begin("k")
+    store.finish("k", success=False, calls=["autto"])
+    assert store.done_calls("k") == ["autto", "export"]
+
+
+def test_failed_insert_releases_the_claim(store, monkeypatch):
+    def broken(key, now):
+        raise RuntimeError("database is locked")
+
+    assert store.begin("k")
+    monkeypatch.setattr(store, "_insert", broken)
+    with pytest.raises(RuntimeError):
+        store.finish("k", success=True)
+    monkeypatch.undo()
+    assert store.begin("k")
+
+
+def test_purge_drops_expired_keys_and_calls(store, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(idempotency_module.time, "time", lambda: now[0])
+    store.retention_seconds = 100
+    store.mark("old")
+    store.begin("partial")
+    store.finish("partial", success=False, calls=["autto"])
+
+    now[0] += 50
+    assert store.seen("old")
+    now[0] += 51
+    assert not store.seen("old")  # expired even before the purge
+    assert store.done_calls("partial") == []
+    assert store.purge() == 1
+    count = store._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+    assert count == 0
+
+
+def _delivery(headers=None):
+    return types.SimpleNamespace(delivery_tag=1), types.SimpleNamespace(headers=headers)
+
+
+def test_redelivery_skips_calls_that_already_succeeded(processor, channel):
+    processor._decrypt_and_validate = lambda payload: {
+        "ContractID": 7,
+        "CouponID": [1],
+        "ID": 3,
+    }
+    seen = []
+
+    def redeem(message_data, done=()):
+        seen.append(sorted(done))
+        message_data["outcome"] = {
+            "autto": "skipped" if "autto" in done else "ok",
+            "export": "skipped" if "export" in done else "ok",
+            "soap": "failed",
+        }
+        return False
+
+    processor.redeem = redeem
+    body = json.dumps({"apikey": "token"}).encode()
+
+    processor.process_message(channel, *_delivery(), body)
+    # The broker redelivers the original (no x-redemption-done header), e.g.
+    # after a crash before the ack, while the retry copy is still delayed
+    processor.process_message(channel, *_delivery(), body)
+
+    assert seen == [[], ["autto", "export"]]
+    routing_key, _, properties = channel.published[-1]
+    assert routing_key.startswith("service_redemption_queue.retry.")
+    assert retry_queue.done_of(properties.headers) == ["autto", "export"]
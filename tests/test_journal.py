@@ -0,0 +1,102 @@
+import json
+import os
+
+import pytest
+
+from utils import journal
+
+
+def _records(path):
+    return [record["n"] for record in journal.iter_records(path)]
+
+
+def test_append_and_rotate(tmp_path):
+    path = str(tmp_path / "processed.jsonl")
+    for n in range(5):
+        journal.append_record(path, {"n": n}, max_bytes=20)
+    assert len(journal.segments(path)) >= 2
+    assert _records(path) == list(range(5))
+
+
+def test_segments_oldest_first_then_active(tmp_path):
+    path = str(tmp_path / "processed.jsonl")
+    for stamp in ("20240102T000000000000", "20240101T000000000000"):
+        (tmp_path / f"processed.jsonl.{stamp}").write_text("")
+    journal.append_record(path, {"n": 0}, max_bytes=0)
+    assert [os.path.basename(p) for p in journal.segments(path)] == [
+        "processed.jsonl.20240101T000000000000",
+        "processed.jsonl.20240102T000000000000",
+        "processed.jsonl",
+    ]
+
+
+def test_torn_line_is_skipped(tmp_path):
+    path = tmp_path / "processed.jsonl"
+    path.write_text('{"n": 0}\n{"n": 1}\n{"n":')
+    assert _records(str(path)) == [0, 1]
+
+
+def test_export_json_array(tmp_path):
+    path = str(tmp_path / "processed.jsonl")
+    legacy = tmp_path / "processed.json"
+    legacy.write_text(json.dumps([{"n": -1}]))
+    for n in range(3):
+        journal.append_record(path, {"n": n}, max_bytes=0)
+    output = str(tmp_path / "out.json")
+    assert journal.export_json_array(path, output, str(legacy)) == 4
+    with open(output) as f:
+        assert [record["n"] for record in json.load(f)] == [-1, 0, 1, 2]
+
+
+def test_compact_merges_rotated_segments(tmp_path):
+    path = str(tmp_path / "processed.jsonl")
+    for n in range(6):
+        journal.append_record(path, {"n": n}, max_bytes=20)
+    journal.append_record(path, {"n": 6}, max_bytes=0)  # stays active
+    rotated = [p for p in journal.segments(path) if p != path]
+    assert len(rotated) >= 2
+
+    target = journal.compact(path)
+    assert target == rotated[-1]
+    assert journal.segments(path) == [target, path]
+    assert _records(path) == list(range(7))
+
+
+def test_compact_crash_repeats_but_never_loses(tmp_path, monkeypatch):
+    path = str(tmp_path / "processed.jsonl")
+    for n in range(6):
+        journal.append_record(path, {"n": n}, max_bytes=20)
+
+    def crash(_path):
+        raise OSError("killed")
+
+    monkeypatch.setattr(journal.os, "remove", crash)
+    with pytest.raises(OSError):
+        journal.compact(path)
+    monkeypatch.undo()
+
+    records = _records(path)
+    assert set(records) == set(range(6))
+    assert not any(p.endswith(journal.COMPACT_SUFFIX) for p in os.listdir(tmp_path))
+
+
+def test_leftover_compact_file_is_not_a_segment(tmp_path):
+    path = str(tmp_path / "processed.jsonl")
+    for n in range(4):
+        journal.append_record(path, {"n": n}, max_bytes=20)
+    rotated = journal.segments(path)
+    # An interrupted compact left a partial merge behind
+    with open(rotated[-1] + journal.COMPACT_SUFFIX, "w") as f:
+        f.write('{"n": 0}\n')
+
+    assert journal.segments(path) == rotated
+    assert _records(path) == list(range(4))
+    journal.compact(path)
+    assert _records(path) == list(range(4))
+
+
+def test_compact_nothing_to_do(tmp_path):
+    path = str(tmp_path / "processed.jsonl")
+    assert journal.compact(path) is None
+    journal.append_record(path, {"n": 0}, max_bytes=0)
+    assert journal.compact(path) is None
@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+from utils import logging_setup
+from utils.logging_setup import REDACTED, redact
+
+
+@pytest.mark.parametrize(
+    "key",
+    ["password", "Password", "api_key", "API-Key", "apiKey", "apikey", "x_token"],
+)
+def test_credential_keys_are_masked(key):
+    assert redact({key: "s3cr3t", "VIN": "1HGCM"}) == {key: REDACTED, "VIN": "1HGCM"}
+
+
+def test_nested_payloads():
+    payload = {
+        "contract": {"DealerID": 2975, "credentials": [{"client_secret": "x"}]},
+        "ids": (1, 2),
+    }
+    assert redact(payload) == {
+        "contract": {"DealerID": 2975, "credentials": [{"client_secret": REDACTED}]},
+        "ids": [1, 2],
+    }
+    assert payload["contract"]["credentials"][0]["client_secret"] == "x"
+
+
+def test_empty_values_are_left_alone():
+    assert redact({"password": "", "token": None}) == {"password": "", "token": None}
+
+
+def test_xml_elements_are_masked():
+    body = (
+        b"<Login><UserName>dealer</UserName><Pass_Word>hunter2</Pass_Word>"
+        b"<api-key>abc</api-key><ns:Token>t\n1</ns:Token></Login>"
+    )
+    assert redact(body) == (
+        "<Login><UserName>dealer</UserName><Pass_Word>***</Pass_Word>"
+        "<api-key>***</api-key><ns:Token>***</ns:Token></Login>"
+    )
+
+
+def test_logged_payload_is_redacted(caplog):
+    with caplog.at_level(logging.INFO):
+        logging_setup.log_payload("📩 Incoming body", {"apikey": "jwt", "ID": 3})
+    assert caplog.records[-1].payload == {"apikey": REDACTED, "ID": 3}
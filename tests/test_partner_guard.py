@@ -0,0 +1,143 @@
+import pytest
+
+from utils import partner_guard
+from utils.partner_guard import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    AIMDLimiter,
+    CircuitBreaker,
+    PartnerGuard,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(partner_guard.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _breaker(clock):
+    breaker = CircuitBreaker(
+        window=4,
+        min_calls=4,
+        failure_rate=0.5,
+        slow_seconds=5,
+        slow_rate=0.75,
+        open_seconds=30,
+    )
+    # Results of calls started before the breaker existed would be stale
+    clock[0] += 60
+    return breaker
+
+
+def test_breaker_trips_on_failures(clock):
+    breaker = _breaker(clock)
+    for ok in (True, False, True):
+        breaker.record(ok, 0.1)
+    assert breaker.state == CLOSED  # below min_calls
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.trips == 1
+    assert not breaker.allow()
+
+
+def test_breaker_trips_on_slow_calls(clock):
+    breaker = _breaker(clock)
+    for seconds in (6, 6, 6, 0.1):
+        breaker.record(True, seconds)
+    assert breaker.state == OPEN
+
+
+def test_half_open_allows_one_probe(clock):
+    breaker = _breaker(clock)
+    breaker._trip()
+    clock[0] += 30
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()  # the probe is still out
+
+    clock[0] += 0.5
+    breaker.record(True, 0.5)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = _breaker(clock)
+    breaker._trip()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(False, 0)
+    assert breaker.state == OPEN
+    assert breaker.trips == 2
+
+
+def test_stale_result_does_not_settle_half_open(clock):
+    breaker = _breaker(clock)
+    breaker._trip()
+    clock[0] += 30
+    assert breaker.allow()  # probe
+    # A call that started before the circuit opened finishes now
+    breaker.record(True, 31)
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_stale_cancel_does_not_free_the_probe(clock):
+    breaker = _breaker(clock)
+    acquired_before_trip = clock[0]
+    clock[0] += 1
+    breaker._trip()
+    clock[0] += 30
+    assert breaker.allow()  # probe
+    breaker.cancel(acquired_before_trip)
+    assert not breaker.allow()
+    breaker.cancel(clock[0])  # the probe itself never ran
+    assert breaker.allow()
+
+
+def test_aimd_limit():
+    limiter = AIMDLimiter(initial=4, minimum=1, maximum=5, backoff=0.5)
+    assert all(limiter.try_acquire() for _ in range(4))
+    assert not limiter.try_acquire()
+
+    limiter.release(False)
+    assert limiter.limit == 2
+    limiter.release(None)  # never ran: limit unchanged
+    assert limiter.limit == 2
+    assert limiter.in_flight == 2
+    assert not limiter.try_acquire()
+
+    limiter.release(True)
+    assert limiter.limit == 2.5
+    for _ in range(20):
+        limiter.release(True)
+    assert limiter.limit == 5
+    assert limiter.in_flight == 0
+    for _ in range(10):
+        limiter.release(False)
+    assert limiter.limit == 1
+
+
+def test_guard_rejections(clock):
+    guard = PartnerGuard("autto")
+    guard.limiter = AIMDLimiter(initial=1, minimum=1, maximum=2)
+    assert guard.acquire() is None
+    assert guard.acquire() == ("throttled", "autto concurrency limit reached")
+    guard.release(True, 0.1)
+
+    guard.breaker._trip()
+    assert guard.acquire() == ("shed", "autto circuit open")
+    assert guard.limiter.in_flight == 0
+    assert guard.stats()["shed_open"] == 1
+    assert guard.stats()["shed_limit"] == 1
+
+
+def test_slow_success_shrinks_the_limit(clock):
+    guard = PartnerGuard("soap")
+    guard.limiter = AIMDLimiter(initial=4, minimum=1, maximum=8, backoff=0.5)
+    assert guard.acquire() is None
+    guard.release(True, guard.breaker.slow_seconds)
+    assert guard.limiter.limit == 2
@@ -0,0 +1,109 @@
+import pika
+import pytest
+
+from utils import retry_queue
+from utils.retry_queue import ATTEMPT_HEADER, DONE_HEADER, REASON_HEADER
+
+
+@pytest.fixture
+def tiers(monkeypatch):
+    monkeypatch.setattr(retry_queue, "REDEMPTION_RETRY_DELAYS", [10, 60])
+    monkeypatch.setattr(retry_queue, "REDEMPTION_MAX_RETRIES", 3)
+
+
+def test_headers_of_a_first_delivery():
+    assert retry_queue.attempt_of(None) == 0
+    assert retry_queue.done_of(None) == []
+    assert retry_queue.done_of({DONE_HEADER: ""}) == []
+
+
+def test_headers_as_the_broker_returns_them():
+    headers = {ATTEMPT_HEADER: 2, DONE_HEADER: b"autto,export"}
+    assert retry_queue.attempt_of(headers) == 2
+    assert retry_queue.done_of(headers) == ["autto", "export"]
+
+
+def test_retry_headers():
+    original = {"x-custom": "kept", ATTEMPT_HEADER: 1}
+    headers = retry_queue.retry_headers(
+        original, 1, ["export", "autto", "export"], "x" * 300
+    )
+    assert headers["x-custom"] == "kept"
+    assert headers[ATTEMPT_HEADER] == 2
+    assert headers[DONE_HEADER] == "autto,export"
+    assert len(headers[REASON_HEADER]) == 255
+    assert original[ATTEMPT_HEADER] == 1
+
+
+def test_uncounted_retry_keeps_the_attempt():
+    headers = retry_queue.retry_headers(None, 1, [], "throttled", counted=False)
+    assert headers[ATTEMPT_HEADER] == 1
+
+
+def test_retry_target(tiers):
+    assert retry_queue.retry_target("q", 0) == ("q.retry.10s", 10)
+    assert retry_queue.retry_target("q", 1) == ("q.retry.60s", 60)
+    # More retries than tiers: stay on the last one
+    assert retry_queue.retry_target("q", 2) == ("q.retry.60s", 60)
+    assert retry_queue.retry_target("q", 3) == ("q.parking", None)
+
+
+def test_retry_queues_dead_letter_back(tiers):
+    queues = dict(retry_queue.retry_queues("q", "service.redemption"))
+    assert list(queues) == ["q.retry.10s", "q.retry.60s", "q.parking"]
+    assert queues["q.retry.10s"] == {
+        "x-dead-letter-exchange": "dealership_exchange",
+        "x-dead-letter-routing-key": "service.redemption",
+    }
+    assert queues["q.parking"] is None
+
+
+@pytest.mark.parametrize(
+    "outcome,retryable,counted",
+    [
+        (None, False, True),
+        ({"autto": "ok", "soap": "ok"}, False, True),
+        ({"autto": "ok", "soap": "timeout"}, True, True),
+        ({"autto": "throttled", "soap": "ok"}, True, False),
+        ({"autto": "throttled", "soap": "shed"}, True, True),
+        ({"autto": "throttled", "soap": "failed"}, True, True),
+    ],
+)
+def test_outcome_classification(outcome, retryable, counted):
+    message_data = {"outcome": outcome}
+    assert retry_queue.is_retryable(message_data) is retryable
+    assert retry_queue.counts_as_attempt(message_data) is counted
+
+
+def test_completed_calls_and_reason():
+    message_data = {"outcome": {"autto": "skipped", "export": "ok", "soap": "timeout"}}
+    assert retry_queue.completed_calls(message_data) == ["autto", "export"]
+    assert retry_queue.retry_reason(message_data) == "soap=timeout"
+    assert retry_queue.completed_calls(None) == []
+
+
+def test_retry_properties_keep_the_delivery_properties():
+    properties = pika.BasicProperties(
+        message_id="m-1",
+        correlation_id="c-1",
+        timestamp=1700000000,
+        priority=5,
+        user_id="guest",
+        headers={"old": True},
+    )
+    retried = retry_queue.retry_properties(properties, {ATTEMPT_HEADER: 1}, 10)
+    assert (retried.message_id, retried.correlation_id) == ("m-1", "c-1")
+    assert (retried.timestamp, retried.priority) == (1700000000, 5)
+    assert retried.delivery_mode == 2
+    assert retried.expiration == "10000"
+    assert retried.headers == {ATTEMPT_HEADER: 1}
+    assert retried.user_id is None
+    # The delivery's own properties are left alone
+    assert properties.headers == {"old": True}
+    assert properties.user_id == "guest"
+
+
+def test_parked_message_does_not_expire():
+    retried = retry_queue.retry_properties(None, {}, None)
+    assert retried.expiration is None
+    assert retried.delivery_mode == 2
@@ -1,10 +1,19 @@
 import datetime
+import logging
+
 import requests
 
-from utils.helpers import Print
+from utils import partner_http
+from utils.logging_setup import log_payload
+from utils.metrics import timed
 
+logger = logging.getLogger(__name__)
 
-def request_AUTTO(contractDetails: dict, coupansDetails: dict, apiCredentials: dict):
+
+def build_autto_request(
+    contractDetails: dict, coupansDetails: dict, apiCredentials: dict
+):
+    """Build (url, json body, basic-auth pair) for the AUTTO claim call"""
     username = apiCredentials.get("SandboxUserName")
     password = apiCredentials.get("SandboxPassword")
     ContractNo = contractDetails.get("ContractNo")
@@ -53,11 +62,18 @@ def request_AUTTO(contractDetails: dict, coupansDetails: dict, apiCredentials: d
         "repaired_at": datetime.date.today().strftime("%m/%d/%Y"),
         "claim_components_attributes": mapped,
     }
-    Print(data, "data")
+    log_payload("AUTTO payload", data)
+    return url, data, (username, password)
+
+
+@timed("autto")
+def request_AUTTO(contractDetails: dict, coupansDetails: dict, apiCredentials: dict):
+    url, data, auth = build_autto_request(
+        contractDetails, coupansDetails, apiCredentials
+    )
     try:
-        print("🔗 URL:", url)
-        print("👤 Username:", username, "password:", password)
-        response = requests.post(url, json=data, auth=(username, password))
+        logger.info(f"🔗 URL: {url} (user {auth[0]})")
+        response = partner_http.post(url, json=data, auth=auth)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -65,7 +81,10 @@ def request_AUTTO(contractDetails: dict, coupansDetails: dict, apiCredentials: d
         return None
 
 
-def request_SOAP(apiCredentials: dict, contractDetails: dict, coupansDetails: dict):
+def build_soap_request(
+    apiCredentials: dict, contractDetails: dict, coupansDetails: dict
+):
+    """Build (url, encoded envelope, headers) for the SOAP InsertClaim call"""
     url = "https://services.ase-profittrack.com/ClaimService.asmx"
     username = apiCredentials.get("SandboxUserName")
     password = apiCredentials.get("SandboxPassword")
@@ -130,12 +149,19 @@ def request_SOAP(apiCredentials: dict, contractDetails: dict, coupansDetails: di
             </soap:Body>
             </soap:Envelope>"""
 
-    print("📦 SOAP Body:\n", data)
+    log_payload("📦 SOAP Body", data)
+    return url, data.encode("utf-8"), headers
 
+
+@timed("soap")
+def request_SOAP(apiCredentials: dict, contractDetails: dict, coupansDetails: dict):
+    url, data, headers = build_soap_request(
+        apiCredentials, contractDetails, coupansDetails
+    )
     try:
-        response = requests.post(
+        response = partner_http.post(
             url,
-            data=data.encode("utf-8"),
+            data=data,
             headers=headers,
         )
         response.raise_for_status()
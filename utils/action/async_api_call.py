@@ -0,0 +1,108 @@
+# Async counterparts of request_AUTTO / request_SOAP on a shared aiohttp session.
+
+import logging
+import time
+
+import aiohttp
+
+from config import PARTNER_CONNECT_TIMEOUT, PARTNER_POOL_MAXSIZE, PARTNER_READ_TIMEOUT
+from utils import partner_http
+from utils.action.api_call import build_autto_request, build_soap_request
+from utils.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+_session: aiohttp.ClientSession | None = None
+
+
+async def _on_request_start(session, context, params):
+    context.host = params.url.host or ""
+    context.started = time.perf_counter()
+
+
+async def _on_request_end(session, context, params):
+    status = params.response.status
+    partner_http.record_request(
+        context.host, time.perf_counter() - context.started, status >= 500, status
+    )
+
+
+async def _on_request_exception(session, context, params):
+    partner_http.record_request(
+        context.host, time.perf_counter() - context.started, True
+    )
+
+
+async def _on_connection_create_end(session, context, params):
+    # No URL in these params; the request's trace context carries the host
+    partner_http.record_connection(context.host)
+
+
+def _trace_config() -> aiohttp.TraceConfig:
+    """Feed the same per-host counters as partner_http.http_stats()"""
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(_on_request_start)
+    trace.on_request_end.append(_on_request_end)
+    trace.on_request_exception.append(_on_request_exception)
+    trace.on_connection_create_end.append(_on_connection_create_end)
+    return trace
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Lazily create one ClientSession per event loop run"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=max(1, PARTNER_POOL_MAXSIZE), ttl_dns_cache=300
+            ),
+            timeout=aiohttp.ClientTimeout(
+                sock_connect=PARTNER_CONNECT_TIMEOUT, sock_read=PARTNER_READ_TIMEOUT
+            ),
+            trace_configs=[_trace_config()],
+        )
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+@timed("autto")
+async def request_AUTTO(
+    contractDetails: dict, coupansDetails: dict, apiCredentials: dict
+):
+    url, data, (username, password) = build_autto_request(
+        contractDetails, coupansDetails, apiCredentials
+    )
+    try:
+        logger.info(f"🔗 URL: {url} (user {username})")
+        async with get_session().post(
+            url,
+            json=data,
+            auth=aiohttp.BasicAuth(username or "", password or ""),
+        ) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+    except aiohttp.ClientError as e:
+        print(f"API request failed: {e}")
+        return None
+
+
+@timed("soap")
+async def request_SOAP(
+    apiCredentials: dict, contractDetails: dict, coupansDetails: dict
+):
+    url, data, headers = build_soap_request(
+        apiCredentials, contractDetails, coupansDetails
+    )
+    try:
+        async with get_session().post(url, data=data, headers=headers) as response:
+            response.raise_for_status()
+            return await response.text()  # SOAP returns XML string
+    except aiohttp.ClientError as e:
+        print(f"SOAP request failed: {e}")
+        return None
@@ -0,0 +1,85 @@
+# Async counterparts of the redemption lookups in db_query_call.py.
+# Same SQL, executed through SQLAlchemy's asyncio engine (aiomysql driver).
+
+from typing import List
+from sqlmodel import text
+from utils.action.db_query_call import (
+    API_CREDENTIALS_SQL,
+    CONTRACT_DETAILS_SQL,
+    COUPONS_DETAILS_SQL,
+    REFERENCE_DATA_SQL,
+    REFERENCE_KEY,
+    RedemptionContext,
+    apply_reference_data,
+    credentials_cache,
+    finish_context,
+    redemption_context_query,
+    reference_cache,
+    reference_from_rows,
+    rows_to_result,
+)
+from utils.db import get_async_engine
+from utils.metrics import timed
+
+# ✅ Shared async engine (see utils/db.py)
+async_engine = get_async_engine()
+
+
+async def get_reference_data() -> dict:
+    reference = reference_cache.get(REFERENCE_KEY)
+    if reference is None:
+        async with async_engine.connect() as conn:
+            result = await conn.execute(text(REFERENCE_DATA_SQL))
+            reference = reference_from_rows(result.mappings().all())
+        reference_cache.set(REFERENCE_KEY, reference)
+    return reference
+
+
+async def get_contract_details(contract_id: int):
+    async with async_engine.connect() as conn:
+        result = await conn.execute(
+            text(CONTRACT_DETAILS_SQL), {"contract_id": contract_id}
+        )
+        contract = rows_to_result(result.mappings().all())
+
+    reference = await get_reference_data()
+    if isinstance(contract, list):
+        return [apply_reference_data(c, reference) for c in contract]
+    return apply_reference_data(contract, reference)
+
+
+async def get_coupons_details(contract_id: int, coupon_ids: List[int]):
+    async with async_engine.connect() as conn:
+        result = await conn.execute(
+            text(COUPONS_DETAILS_SQL),
+            {"contract_id": contract_id, "coupon_ids": tuple(coupon_ids)},
+        )
+        return [dict(row._mapping) for row in result.fetchall()]
+
+
+async def get_api_credentials(ID: int = 1):
+    credentials = credentials_cache.get(str(ID))
+    if credentials is None:
+        async with async_engine.connect() as conn:
+            result = await conn.execute(text(API_CREDENTIALS_SQL), {"ID": ID})
+            credentials = rows_to_result(result.mappings().all())
+        credentials_cache.set(str(ID), credentials)
+    return credentials
+
+
+@timed("context")
+async def get_redemption_context(
+    contract_id: int, coupon_ids: List[int], ID: int = 1
+) -> RedemptionContext:
+    sql, cached_credentials = redemption_context_query(ID)
+    async with async_engine.connect() as conn:
+        result = await conn.execute(
+            text(sql),
+            {"contract_id": contract_id, "coupon_ids": tuple(coupon_ids), "ID": ID},
+        )
+        row = result.mappings().first()
+    return finish_context(row, ID, cached_credentials, await get_reference_data())
+
+
+async def dispose_engine():
+    await async_engine.dispose()
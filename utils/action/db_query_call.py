@@ -1,33 +1,42 @@
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from decimal import Decimal
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+import json
 import os
-from openpyxl import Workbook
-from typing import List
-from sqlmodel import create_engine, Session, text
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlmodel import Session, text
 from config import (
-    DATABASE_URL,
     BASE_URL,
+    CACHE_MAX_ENTRIES,
+    CACHE_TTL_SECONDS,
 )
-from utils.action.ftp_coverages import export
+from utils.action.export_formats import resolve_format, write_batches, write_export
+from utils.action.ftp_coverages import count_cache, coverage_cache, export_batches
+from utils.cache import TTLCache
+from utils.db import get_engine
 from utils.helpers import formatDate, Print
+from utils.metrics import timed
 from utils.consumer_utils import send_email
 
-# ✅ Setup engine
-DATABASE_URL = DATABASE_URL
-engine = create_engine(DATABASE_URL, echo=True)
+# ✅ Shared engine (see utils/db.py)
+engine = get_engine()
 
+# ✅ Caches: credentials per tbl_api_dealerid.ID, and the (tiny, static)
+# state/country lookup tables used to resolve dealer addresses
+credentials_cache = TTLCache("api_credentials", CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+reference_cache = TTLCache("dealer_reference", 1, CACHE_TTL_SECONDS)
+REFERENCE_KEY = "states_countries"
 
-# ✅ Function to run raw query
-def get_contract_details(contract_id: int):
-    print("===================get_contract_details contract_id: ", contract_id)
-    query = text(
-        """
+
+# Raw SQL shared by the blocking and asyncio engines
+CONTRACT_DETAILS_SQL = """
         SELECT DATE_FORMAT(FROM_UNIXTIME(tbl_contract.SaleDate),'%m/%d/%Y') AS SaleDate, IF(tbl_contract.UnlimitedTerm=1,'N/A',DATE_FORMAT(FROM_UNIXTIME(tbl_contract.ValidityDate),'%m/%d/%Y')) AS ValidityDate,tbl_contract.VIN,tbl_contract.ContractID,tbl_contract.ContractNo,
 tbl_customer.CustomerFName,tbl_customer.CustomerLName,tbl_customer.PrimaryEmail,tbl_customer.PhoneHome,
 tbl_planmaster.PlanDescription,tbl_planmaster.PlanID,tbl_planmaster.PlanCode,tbl_planmaster.ValidityDays,tbl_planmaster.ValidityMileage,tbl_dealer.DealerID,tbl_dealer.DealerTitle,
-tbl_dealer.ContPersonPhone,tbl_dealer.CityName,(SELECT StateTitle FROM tbl_states WHERE tbl_dealer.StateID=tbl_states.StateID) AS State,
-(SELECT country.iso3 FROM country WHERE country.id=tbl_dealer.DealerCountry) AS Country,tbl_dealer.DealerAddress1,tbl_dealer.DealerAddress2,
+tbl_dealer.ContPersonPhone,tbl_dealer.CityName,tbl_dealer.StateID,
+tbl_dealer.DealerCountry,tbl_dealer.DealerAddress1,tbl_dealer.DealerAddress2,
 tbl_dealer.DealerZIP,tbl_dealer.ContPersonEmail,tbl_dealer.ContPerson,
 (SELECT SUM(tbl_contractcoupon.CouponValue) FROM tbl_contractcoupon WHERE tbl_contractcoupon.ContractID=tbl_contract.ContractID AND tbl_contractcoupon.CouponID IN('10880279', '10880287', '10880294')) AS CouponValue
 FROM tbl_contract
@@ -35,27 +44,9 @@ JOIN tbl_customer ON(tbl_customer.CustomerID=tbl_contract.CustomerID)
 JOIN tbl_planmaster ON(tbl_contract.PlanID=tbl_planmaster.PlanID)
 JOIN tbl_dealer ON(tbl_dealer.DealerID=tbl_contract.DealerID)
 WHERE tbl_contract.ContractID=:contract_id
-    """
-    )
-
-    with Session(engine) as session:
-        result = session.execute(query, {"contract_id": contract_id})
-        rows = result.mappings().all()  # returns list of dict-like rows
-        if not rows:
-            return None  # no record
-
-        if len(rows) == 1:
-            return dict(rows[0])  # single row → dict
-
-        return [dict(r) for r in rows]  # multiple rows → list of dicts
-
-
-def get_coupons_details(contract_id: int, coupon_ids: List[int]):
-    # Convert list into tuple for SQL IN clause
-    coupon_ids_tuple = tuple(coupon_ids)
+"""
 
-    query = text(
-        f"""
+COUPONS_DETAILS_SQL = """
         SELECT COUNT(CouponID) AS totalCoupon,
                CouponTitle,
                IF(VariablePrice>0,VariablePrice,CouponValue) AS CouponValue,
@@ -73,21 +64,151 @@ def get_coupons_details(contract_id: int, coupon_ids: List[int]):
         WHERE ContractID = :contract_id
           AND CouponID IN :coupon_ids
         GROUP BY CouponTitle, ServiceType, ServiceID
-    """
-    )
+"""
 
-    with Session(engine) as session:
-        result = session.execute(
-            query, {"contract_id": contract_id, "coupon_ids": coupon_ids_tuple}
-        )
-        rows = result.fetchall()
-        return [dict(row._mapping) for row in rows]
+API_CREDENTIALS_SQL = """
+        SELECT 
+            Notes,
+            SandBoxUrl,
+            LiveUrl,
+            IsLive,
+            UserName,
+            tbl_api_dealerid.Password,
+            SandboxUserName,
+            SandboxPassword,
+            RequestType
+        FROM tbl_api_dealerid 
+        WHERE ID = :ID
+"""
+
+# State/country titles, resolved from reference_cache instead of per-row
+# subqueries
+REFERENCE_DATA_SQL = """
+        SELECT 'state' AS kind, StateID AS id, StateTitle AS value FROM tbl_states
+        UNION ALL
+        SELECT 'country' AS kind, id, iso3 AS value FROM country
+"""
+
+# Contract, coupons and credentials in one round trip. Coupons and
+# credentials come back as JSON columns (MySQL 5.7.22+ / MariaDB 10.5+).
+# When the credentials are already cached the tbl_api_dealerid join is left
+# out ({credentials_column} / {credentials_join}).
+_CONTEXT_CONTRACT_COLUMNS = """
+SELECT DATE_FORMAT(FROM_UNIXTIME(tbl_contract.SaleDate),'%m/%d/%Y') AS SaleDate, IF(tbl_contract.UnlimitedTerm=1,'N/A',DATE_FORMAT(FROM_UNIXTIME(tbl_contract.ValidityDate),'%m/%d/%Y')) AS ValidityDate,tbl_contract.VIN,tbl_contract.ContractID,tbl_contract.ContractNo,
+tbl_customer.CustomerFName,tbl_customer.CustomerLName,tbl_customer.PrimaryEmail,tbl_customer.PhoneHome,
+tbl_planmaster.PlanDescription,tbl_planmaster.PlanID,tbl_planmaster.PlanCode,tbl_planmaster.ValidityDays,tbl_planmaster.ValidityMileage,tbl_dealer.DealerID,tbl_dealer.DealerTitle,
+tbl_dealer.ContPersonPhone,tbl_dealer.CityName,tbl_dealer.StateID,
+tbl_dealer.DealerCountry,tbl_dealer.DealerAddress1,tbl_dealer.DealerAddress2,
+tbl_dealer.DealerZIP,tbl_dealer.ContPersonEmail,tbl_dealer.ContPerson,
+coupon_sum.CouponValue,
+coupons.Coupons
+"""
+
+_CONTEXT_JOINS = """FROM tbl_contract
+JOIN tbl_customer ON(tbl_customer.CustomerID=tbl_contract.CustomerID)
+JOIN tbl_planmaster ON(tbl_contract.PlanID=tbl_planmaster.PlanID)
+JOIN tbl_dealer ON(tbl_dealer.DealerID=tbl_contract.DealerID)
+"""
+
+_COUPONS_JSON = """JSON_ARRAYAGG(JSON_OBJECT(
+        'totalCoupon', g.totalCoupon, 'CouponTitle', g.CouponTitle,
+        'CouponValue', g.CouponValue, 'RepairOrderNo', g.RepairOrderNo,
+        'RecievedDate', g.RecievedDate, 'CheckNo', g.CheckNo,
+        'CouponMileage', g.CouponMileage, 'UserID', g.UserID,
+        'VariablePrice', g.VariablePrice, 'ServiceAmounts', g.ServiceAmounts,
+        'ServiceType', g.ServiceType, 'ServiceID', g.ServiceID,
+        'ModifiedDate', g.ModifiedDate
+    )) AS Coupons"""
+
+_REDEMPTION_CONTEXT_TEMPLATE = (
+    _CONTEXT_CONTRACT_COLUMNS.rstrip("\n")
+    + """
+{credentials_column}
+"""
+    + _CONTEXT_JOINS
+    + """{credentials_join}
+CROSS JOIN (
+    SELECT SUM(CouponValue) AS CouponValue
+    FROM tbl_contractcoupon
+    WHERE ContractID = :contract_id AND CouponID IN :coupon_ids
+) AS coupon_sum
+CROSS JOIN (
+    SELECT """
+    + _COUPONS_JSON
+    + """
+    FROM ("""
+    + COUPONS_DETAILS_SQL
+    + """) AS g
+) AS coupons
+WHERE tbl_contract.ContractID=:contract_id
+"""
+)
 
+REDEMPTION_CONTEXT_SQL = _REDEMPTION_CONTEXT_TEMPLATE.format(
+    credentials_column=""",
+IF(api.ID IS NULL, NULL, JSON_OBJECT(
+    'Notes', api.Notes, 'SandBoxUrl', api.SandBoxUrl, 'LiveUrl', api.LiveUrl,
+    'IsLive', api.IsLive, 'UserName', api.UserName, 'Password', api.Password,
+    'SandboxUserName', api.SandboxUserName, 'SandboxPassword', api.SandboxPassword,
+    'RequestType', api.RequestType
+)) AS ApiCredentials""",
+    credentials_join="LEFT JOIN tbl_api_dealerid AS api ON(api.ID=:ID)",
+)
 
-def get_api_credentials(ID: int = 1):
-    query = text(
-        """
+REDEMPTION_CONTEXT_CACHED_CREDENTIALS_SQL = _REDEMPTION_CONTEXT_TEMPLATE.format(
+    credentials_column="", credentials_join=""
+)
+
+# Micro-batched redemptions: contexts for several contracts with one
+# IN (...) query. Coupons are filtered by the union of the batch's coupon ids
+# and grouped per contract; credentials are loaded separately (see
+# get_api_credentials_many) since each contract may use a different ID.
+BATCH_COUPONS_DETAILS_SQL = """
+        SELECT ContractID,
+               COUNT(CouponID) AS totalCoupon,
+               CouponTitle,
+               IF(VariablePrice>0,VariablePrice,CouponValue) AS CouponValue,
+               RepairOrderNo,
+               DATE_FORMAT(FROM_UNIXTIME(RecievedDate),'%m/%d/%Y') AS RecievedDate,
+               CheckNo,
+               CouponMileage,
+               UserID,
+               VariablePrice,
+               ServiceAmounts,
+               ServiceType,
+               ServiceID,
+               ModifiedDate
+        FROM tbl_contractcoupon
+        WHERE ContractID IN :contract_ids
+          AND CouponID IN :coupon_ids
+        GROUP BY ContractID, CouponTitle, ServiceType, ServiceID
+"""
+
+BATCH_REDEMPTION_CONTEXT_SQL = (
+    _CONTEXT_CONTRACT_COLUMNS
+    + _CONTEXT_JOINS
+    + """LEFT JOIN (
+    SELECT ContractID, SUM(CouponValue) AS CouponValue
+    FROM tbl_contractcoupon
+    WHERE ContractID IN :contract_ids AND CouponID IN :coupon_ids
+    GROUP BY ContractID
+) AS coupon_sum ON(coupon_sum.ContractID=tbl_contract.ContractID)
+LEFT JOIN (
+    SELECT g.ContractID, """
+    + _COUPONS_JSON
+    + """
+    FROM ("""
+    + BATCH_COUPONS_DETAILS_SQL
+    + """) AS g
+    GROUP BY g.ContractID
+) AS coupons ON(coupons.ContractID=tbl_contract.ContractID)
+WHERE tbl_contract.ContractID IN :contract_ids
+"""
+)
+
+BATCH_API_CREDENTIALS_SQL = """
         SELECT 
+            ID,
             Notes,
             SandBoxUrl,
             LiveUrl,
@@ -98,20 +219,231 @@ def get_api_credentials(ID: int = 1):
             SandboxPassword,
             RequestType
         FROM tbl_api_dealerid 
-        WHERE ID = :ID
-    """
-    )
+        WHERE ID IN :IDs
+"""
+
+
+@dataclass
+class RedemptionContext:
+    """Everything a redemption needs from the database"""
+
+    contract: Optional[dict] = None
+    coupons: List[dict] = field(default_factory=list)
+    credentials: Optional[dict] = None
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.contract and self.coupons and self.credentials)
+
+
+def _load_json(value):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, str)):
+        # Keep numeric columns as Decimal like the standalone queries do
+        return json.loads(value, parse_float=Decimal)
+    return value
+
+
+def context_from_row(row) -> RedemptionContext:
+    if row is None:
+        return RedemptionContext()
+    contract = dict(row)
+    coupons = _load_json(contract.pop("Coupons", None)) or []
+    credentials = _load_json(contract.pop("ApiCredentials", None))
+    return RedemptionContext(contract, coupons, credentials)
+
+
+def reference_from_rows(rows) -> dict:
+    reference = {"state": {}, "country": {}}
+    for row in rows:
+        reference[row["kind"]][str(row["id"])] = row["value"]
+    return reference
+
+
+def apply_reference_data(contract: Optional[dict], reference: Optional[dict]):
+    """Replace StateID/DealerCountry with the State/Country titles"""
+    if not contract:
+        return contract
+    reference = reference or {"state": {}, "country": {}}
+    state_id = contract.pop("StateID", None)
+    country_id = contract.pop("DealerCountry", None)
+    contract["State"] = reference["state"].get(str(state_id))
+    contract["Country"] = reference["country"].get(str(country_id))
+    return contract
+
+
+def get_reference_data() -> dict:
+    def load():
+        with Session(engine) as session:
+            rows = session.execute(text(REFERENCE_DATA_SQL)).mappings().all()
+            return reference_from_rows(rows)
+
+    return reference_cache.get_or_load(REFERENCE_KEY, load)
+
+
+def invalidate_api_credentials(ID: Optional[int] = None):
+    """Drop one cached credential row, or all of them"""
+    credentials_cache.invalidate(None if ID is None else str(ID))
+
+
+def invalidate_reference_data():
+    reference_cache.invalidate()
+
+
+def cache_stats() -> List[dict]:
+    return [
+        credentials_cache.stats(),
+        reference_cache.stats(),
+        coverage_cache.stats(),
+        count_cache.stats(),
+    ]
+
+
+def rows_to_result(rows):
+    if not rows:
+        return None  # no record
+
+    if len(rows) == 1:
+        return dict(rows[0])  # single row → dict
+
+    return [dict(r) for r in rows]  # multiple rows → list of dicts
+
+
+# ✅ Function to run raw query
+def get_contract_details(contract_id: int):
+    print("===================get_contract_details contract_id: ", contract_id)
+    query = text(CONTRACT_DETAILS_SQL)
 
     with Session(engine) as session:
-        result = session.execute(query, {"ID": ID})
+        result = session.execute(query, {"contract_id": contract_id})
         rows = result.mappings().all()  # returns list of dict-like rows
-        if not rows:
-            return None  # no record
+        contract = rows_to_result(rows)
+
+    reference = get_reference_data()
+    if isinstance(contract, list):
+        return [apply_reference_data(c, reference) for c in contract]
+    return apply_reference_data(contract, reference)
+
+
+def get_coupons_details(contract_id: int, coupon_ids: List[int]):
+    # Convert list into tuple for SQL IN clause
+    coupon_ids_tuple = tuple(coupon_ids)
+
+    query = text(COUPONS_DETAILS_SQL)
+
+    with Session(engine) as session:
+        result = session.execute(
+            query, {"contract_id": contract_id, "coupon_ids": coupon_ids_tuple}
+        )
+        rows = result.fetchall()
+        return [dict(row._mapping) for row in rows]
+
+
+def get_api_credentials(ID: int = 1):
+    def load():
+        query = text(API_CREDENTIALS_SQL)
+
+        with Session(engine) as session:
+            result = session.execute(query, {"ID": ID})
+            rows = result.mappings().all()  # returns list of dict-like rows
+            return rows_to_result(rows)
+
+    return credentials_cache.get_or_load(str(ID), load)
+
+
+def redemption_context_query(ID: int):
+    """Pick the context statement depending on whether credentials are cached"""
+    credentials = credentials_cache.get(str(ID))
+    if credentials is None:
+        return REDEMPTION_CONTEXT_SQL, None
+    return REDEMPTION_CONTEXT_CACHED_CREDENTIALS_SQL, credentials
+
+
+def finish_context(
+    row, ID: int, cached_credentials: Optional[dict], reference: Optional[dict]
+) -> RedemptionContext:
+    context = context_from_row(row)
+    if cached_credentials is not None:
+        context.credentials = cached_credentials
+    else:
+        credentials_cache.set(str(ID), context.credentials)
+    apply_reference_data(context.contract, reference)
+    return context
+
+
+@timed("context")
+def get_redemption_context(
+    contract_id: int, coupon_ids: List[int], ID: int = 1
+) -> RedemptionContext:
+    """Contract, coupons and API credentials for one message in one query"""
+    sql, cached_credentials = redemption_context_query(ID)
+    with Session(engine) as session:
+        result = session.execute(
+            text(sql),
+            {"contract_id": contract_id, "coupon_ids": tuple(coupon_ids), "ID": ID},
+        )
+        row = result.mappings().first()
+    return finish_context(row, ID, cached_credentials, get_reference_data())
+
+
+def get_api_credentials_many(IDs: Iterable[int]) -> Dict[str, Optional[dict]]:
+    """Credentials per str(ID); cache misses are loaded with one IN query"""
+    credentials, missing = {}, []
+    for ID in dict.fromkeys(str(ID) for ID in IDs):
+        cached = credentials_cache.get(ID)
+        if cached is None:
+            missing.append(ID)
+        else:
+            credentials[ID] = cached
 
-        if len(rows) == 1:
-            return dict(rows[0])  # single row → dict
+    if missing:
+        with Session(engine) as session:
+            result = session.execute(
+                text(BATCH_API_CREDENTIALS_SQL), {"IDs": tuple(missing)}
+            )
+            loaded = {}
+            for row in result.mappings().all():
+                row = dict(row)
+                loaded[str(row.pop("ID"))] = row
+        for ID in missing:
+            credentials[ID] = loaded.get(ID)
+            credentials_cache.set(ID, credentials[ID])
+    return credentials
+
+
+@timed("context")
+def get_redemption_contexts(
+    requests: List[Tuple[int, List[int], int]]
+) -> Dict[str, RedemptionContext]:
+    """
+    Contexts for several (contract_id, coupon_ids, ID) redemptions with one
+    IN (...) query, keyed by str(contract_id). Coupons are matched per
+    contract, so each contract may only appear once per call.
+    """
+    if not requests:
+        return {}
+    contract_ids = tuple(dict.fromkeys(contract_id for contract_id, _, _ in requests))
+    coupon_ids = tuple(
+        dict.fromkeys(coupon for _, coupons, _ in requests for coupon in coupons)
+    )
+
+    with Session(engine) as session:
+        result = session.execute(
+            text(BATCH_REDEMPTION_CONTEXT_SQL),
+            {"contract_ids": contract_ids, "coupon_ids": coupon_ids},
+        )
+        rows = {str(row["ContractID"]): row for row in result.mappings().all()}
 
-        return [dict(r) for r in rows]  # multiple rows → list of dicts
+    credentials = get_api_credentials_many(ID for _, _, ID in requests)
+    reference = get_reference_data()
+    contexts = {}
+    for contract_id, _, ID in requests:
+        context = context_from_row(rows.get(str(contract_id)))
+        context.credentials = credentials.get(str(ID))
+        apply_reference_data(context.contract, reference)
+        contexts[str(contract_id)] = context
+    return contexts
 
 
 def export_contracts(dealer_id, VIN, LastName, Email):
@@ -148,66 +480,76 @@ def export_to_email(
     # LastName: str = "Procarma",
     # Email: str = "support@procarma.com",
     CoverageName: int = 1,
-):
+    export_format: Optional[str] = None,
+) -> Optional[bool]:
+    """
+    Build the dealer's coverage export and email the link. True once sent,
+    False if the email failed (so the export worker retries), None when
+    there is nothing to send.
+    """
     VIN = contractDetails.get("VIN")
     LastName = contractDetails.get("CustomerLName")
     Email = contractDetails.get("ContPersonEmail")
     DealerID = contractDetails.get("DealerID")
 
-    with Session(engine) as session:
+    if not Email:
+        print("No pending email exports.")
+        return
+
+    dealer_id = DealerID
+    pcp_user_id = 1
+    matching = 0
 
-        if not Email:
-            print("No pending email exports.")
-            return
+    # if matching == 2:  # reset VIN & LastName
+    #     vin, last_name = "", ""
 
-        dealer_id = DealerID
-        pcp_user_id = 1
-        matching = 0
+    # 2. Fetch Reports (streamed: row batches are written as they arrive)
+    if CoverageName:
+        report_data = export_batches(CoverageName)
+    else:
+        report_data = iter(export_contracts(dealer_id, VIN, LastName, Email))
 
-        # if matching == 2:  # reset VIN & LastName
-        #     vin, last_name = "", ""
+    # 3. Build the export file (xlsx/csv/csv.gz/parquet, see export_formats)
+    save_dir = "/var/www/html/testing/exports"
+    os.makedirs(save_dir, exist_ok=True)
 
-        # 2. Fetch Reports
+    file_stem = os.path.join(
+        save_dir,
+        f"{dealer_id}-{pcp_user_id}-export_{datetime.now().strftime('%d-%m-%Y_%H-%M-%S')}",
+    )
+    try:
+        fmt = resolve_format(dealer_id, export_format)
         if CoverageName:
-            report_data = export(CoverageName)
+            file_path = write_batches(report_data, file_stem, fmt)
         else:
-            report_data = export_contracts(dealer_id, VIN, LastName, Email)
-
-        if not report_data:
-            print("No contracts found.")
-            return
-
-        # 3. Build Excel file
-        wb = Workbook()
-        ws = wb.active
-        ws.append(list(report_data[0].keys()))  # header row
-        for c in report_data:
-            ws.append(list(c.values()))
-
-        save_dir = "/var/www/html/testing/exports"
-        os.makedirs(save_dir, exist_ok=True)
-
-        filename = f"{dealer_id}-{pcp_user_id}-export_{datetime.now().strftime('%d-%m-%Y_%H-%M-%S')}.xlsx"
-        file_path = os.path.join(save_dir, filename)
-        wb.save(file_path)
-
-        # Public URL (don’t include the local file path)
-        public_url = f"{BASE_URL}/testing/exports/{filename}"
-
-        # 4. Prepare email
-        subject = "Coverage Export File"
-        email_msg = f"""
-        Hi,<br><br>
-        Your data is available on this link
-        <a href="{public_url}" target="_blank">Download</a>.<br><br>
-        Please download from here. This will be retained on server for 7 days.<br><br>
-        Thanks.<br>
-        PROCARMA Team
-        """
+            file_path = write_export(report_data, file_stem, fmt)
+    finally:
+        if hasattr(report_data, "close"):
+            report_data.close()  # release the streaming cursor
+
+    if not file_path:
+        print("No contracts found.")
+        return
+    filename = os.path.basename(file_path)
+
+    # Public URL (don’t include the local file path)
+    public_url = f"{BASE_URL}/testing/exports/{filename}"
+
+    # 4. Prepare email
+    subject = "Coverage Export File"
+    email_msg = f"""
+    Hi,<br><br>
+    Your data is available on this link
+    <a href="{public_url}" target="_blank">Download</a>.<br><br>
+    Please download from here. This will be retained on server for 7 days.<br><br>
+    Thanks.<br>
+    PROCARMA Team
+    """
 
-        if send_email(Email, subject, email_msg):
-            print("✅ Email sent successfully")
-            # 5. Update record in DB
+    if send_email(Email, subject, email_msg):
+        print("✅ Email sent successfully")
+        # 5. Update record in DB
+        with Session(engine) as session:
             result = session.execute(
                 text(
                     """
@@ -227,5 +569,6 @@ def export_to_email(
             )  # check how many rows were updated
 
             session.commit()
-        else:
-            print("❌ Email not sent successfully")
+        return True
+    print("❌ Email not sent successfully")
+    return False
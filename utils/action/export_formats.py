@@ -0,0 +1,214 @@
+# Export file formats for export_to_email.
+# Every writer takes rows a batch at a time, so any of them can sit on top of
+# the streaming coverage cursor. Parquet needs pyarrow (optional dependency).
+
+import csv
+import gzip
+import os
+from itertools import islice
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from openpyxl import Workbook
+
+from config import EXPORT_CHUNK_SIZE, EXPORT_FORMAT, EXPORT_FORMAT_BY_DEALER
+
+
+class XlsxExportWriter:
+    extension = "xlsx"
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.wb = Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+
+    def write_header(self, columns: List[str]):
+        self.ws.append(columns)
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]):
+        for values in rows:
+            self.ws.append(values)
+
+    def close(self):
+        self.wb.save(self.file_path)
+
+
+class CsvExportWriter:
+    extension = "csv"
+    compress = False
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        if self.compress:
+            self.f = gzip.open(file_path, "wt", newline="", encoding="utf-8")
+        else:
+            self.f = open(file_path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.f)
+
+    def write_header(self, columns: List[str]):
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.f.close()
+
+
+class GzipCsvExportWriter(CsvExportWriter):
+    extension = "csv.gz"
+    compress = True
+
+
+class ParquetExportWriter:
+    extension = "parquet"
+
+    def __init__(self, file_path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise RuntimeError(
+                "Parquet export needs pyarrow: pip install pyarrow"
+            ) from e
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.file_path = file_path
+        self.columns: List[str] = []
+        self.buffer: List[Sequence[Any]] = []
+        self.schema = None
+        self.writer = None
+
+    def write_header(self, columns: List[str]):
+        self.columns = columns
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= EXPORT_CHUNK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        data = {
+            name: [row[i] for row in self.buffer] for i, name in enumerate(self.columns)
+        }
+        if self.schema is None:
+            # Infer from the first chunk; all-NULL columns become strings
+            inferred = self.pa.table(data).schema
+            self.schema = self.pa.schema(
+                [
+                    (f.name, self.pa.string()) if self.pa.types.is_null(f.type) else f
+                    for f in inferred
+                ]
+            )
+            self.writer = self.pq.ParquetWriter(self.file_path, self.schema)
+        for field in self.schema:
+            if self.pa.types.is_string(field.type):
+                data[field.name] = [
+                    None if v is None else str(v) for v in data[field.name]
+                ]
+        self.writer.write_table(self._table(data))
+        self.buffer = []
+
+    def _table(self, data: Dict[str, List[Any]]):
+        try:
+            return self.pa.table(data, schema=self.schema)
+        except (self.pa.ArrowInvalid, self.pa.ArrowTypeError):
+            # This chunk infers differently from the first one (e.g. int then
+            # Decimal, or another Decimal scale): convert it to the file schema
+            return self.pa.table(data).cast(self.schema, safe=False)
+
+    def close(self):
+        try:
+            self._flush()
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+
+
+EXPORT_FORMATS = {
+    writer.extension: writer
+    for writer in (
+        XlsxExportWriter,
+        CsvExportWriter,
+        GzipCsvExportWriter,
+        ParquetExportWriter,
+    )
+}
+
+
+def _dealer_formats() -> Dict[str, str]:
+    # EXPORT_FORMAT_BY_DEALER="2975:csv.gz,3012:parquet"
+    formats = {}
+    for item in (EXPORT_FORMAT_BY_DEALER or "").split(","):
+        if ":" in item:
+            dealer, fmt = item.split(":", 1)
+            formats[dealer.strip()] = fmt.strip().lower()
+    return formats
+
+
+DEALER_FORMATS = _dealer_formats()
+
+
+def resolve_format(DealerID: Any = None, requested: Optional[str] = None) -> str:
+    """Request override, then per-dealer setting, then EXPORT_FORMAT"""
+    for fmt in (requested, DEALER_FORMATS.get(str(DealerID)), EXPORT_FORMAT):
+        if fmt and fmt.lower() in EXPORT_FORMATS:
+            return fmt.lower()
+        if fmt:
+            print(f"⚠️ Unknown export format {fmt!r}, ignoring")
+    return "xlsx"
+
+
+def write_batches(
+    batches: Iterable[Any], file_stem: str, fmt: str = "xlsx"
+) -> Optional[str]:
+    """Write batches with .columns/.rows (RowBatch, CoverageBatch) to
+    <file_stem>.<ext>; returns the path, or None if no rows"""
+    batches = (batch for batch in batches if batch.rows)
+    first = next(batches, None)
+    if first is None:
+        return None
+
+    writer_cls = EXPORT_FORMATS[fmt]
+    file_path = f"{file_stem}.{writer_cls.extension}"
+    writer = writer_cls(file_path)
+    try:
+        writer.write_header(list(first.columns))
+        writer.write_rows(first.rows)
+        for batch in batches:
+            writer.write_rows(batch.rows)
+        writer.close()
+    except BaseException:
+        # Never leave a truncated export behind
+        try:
+            writer.close()
+        except Exception:
+            pass
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    return file_path
+
+
+class RowBatch(NamedTuple):
+    columns: List[str]
+    rows: List[List[Any]]
+
+
+def _dict_batches(
+    rows: Iterable[Dict[str, Any]], batch_size: int = EXPORT_CHUNK_SIZE
+) -> Iterable[RowBatch]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        yield RowBatch(list(chunk[0].keys()), [list(r.values()) for r in chunk])
+
+
+def write_export(
+    rows: Iterable[Dict[str, Any]], file_stem: str, fmt: str = "xlsx"
+) -> Optional[str]:
+    """Write dict rows to <file_stem>.<ext>; returns the path, or None if no rows"""
+    return write_batches(_dict_batches(rows), file_stem, fmt)
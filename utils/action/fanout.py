@@ -0,0 +1,174 @@
+# Fan-out stage: run the independent per-message submissions (AUTTO claim,
+# coverage export, SOAP claim) at the same time and collect one outcome.
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import FANOUT_WORKERS, PARTNER_CALL_TIMEOUT
+from utils import tracing
+from utils.partner_guard import PartnerGuard, guard_for
+
+# Shared by all consumer workers; sized for three calls per in-flight message
+_executor = ThreadPoolExecutor(
+    max_workers=max(3, FANOUT_WORKERS), thread_name_prefix="fanout"
+)
+
+
+@dataclass
+class CallResult:
+    name: str
+    status: str  # "ok" | "failed" | "timeout" | "error" | "shed" | "throttled"
+    result: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+
+
+@dataclass
+class RedemptionOutcome:
+    calls: Dict[str, CallResult] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return all(c.status == "ok" for c in self.calls.values())
+
+    def statuses(self) -> Dict[str, str]:
+        return {name: c.status for name, c in self.calls.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: asdict(c) for name, c in self.calls.items()}
+
+
+def _result(name: str, value: Any, started: float, allow_none: bool) -> CallResult:
+    # request_AUTTO / request_SOAP signal failure by returning None
+    status = "ok" if value is not None or allow_none else "failed"
+    return CallResult(name, status, value, duration=time.monotonic() - started)
+
+
+def _shed(name: str, status: str, reason: str) -> CallResult:
+    return CallResult(name, status, error=reason)
+
+
+def _guarded(guard: PartnerGuard, fn: Callable[[], Any], allow_none: bool):
+    """Report fn's health to guard once it finishes (even after the deadline)"""
+
+    def call():
+        started = time.monotonic()
+        ok = False
+        try:
+            value = fn()
+            ok = value is not None or allow_none
+            return value
+        finally:
+            guard.release(ok, time.monotonic() - started)
+
+    return call
+
+
+def _release_if_cancelled(guard: PartnerGuard, acquired_at: float, future):
+    if future.cancelled():
+        guard.cancel(acquired_at)
+
+
+def run_fanout(
+    calls: Dict[str, Callable[[], Any]],
+    timeout: float = PARTNER_CALL_TIMEOUT,
+    allow_none: tuple = ("export",),
+) -> RedemptionOutcome:
+    """Run blocking calls concurrently; each gets the same deadline.
+
+    A call still running at the deadline is reported as "timeout". Its thread
+    is not interrupted, so the calls themselves should carry their own
+    network timeouts. Partner calls that already started are waited for
+    instead (their HTTP timeouts bound them): they may still complete the
+    claim, and a retry would submit it twice. Partner calls rejected by their
+    PartnerGuard are not run and come back as "shed" or "throttled".
+    """
+    started = time.monotonic()
+    outcome = RedemptionOutcome()
+    futures = {}
+    for name, fn in calls.items():
+        guard = guard_for(name)
+        if guard is None:
+            futures[name] = _executor.submit(tracing.bind(fn))
+            continue
+        acquired_at = time.monotonic()
+        rejected = guard.acquire()
+        if rejected:
+            outcome.calls[name] = _shed(name, *rejected)
+            continue
+        futures[name] = _executor.submit(
+            tracing.bind(_guarded(guard, fn, name in allow_none))
+        )
+        futures[name].add_done_callback(
+            functools.partial(_release_if_cancelled, guard, acquired_at)
+        )
+    wait(futures.values(), timeout=timeout)
+    running = [
+        future
+        for name, future in futures.items()
+        if guard_for(name) is not None and not future.done() and not future.cancel()
+    ]
+    if running:
+        wait(running)
+
+    for name, future in futures.items():
+        if not future.done() or future.cancelled():
+            future.cancel()
+            outcome.calls[name] = CallResult(
+                name, "timeout", duration=time.monotonic() - started
+            )
+        elif future.exception() is not None:
+            outcome.calls[name] = CallResult(
+                name,
+                "error",
+                error=str(future.exception()),
+                duration=time.monotonic() - started,
+            )
+        else:
+            outcome.calls[name] = _result(
+                name, future.result(), started, name in allow_none
+            )
+    return RedemptionOutcome({name: outcome.calls[name] for name in calls})
+
+
+async def run_fanout_async(
+    calls: Dict[str, Callable[[], Awaitable[Any]]],
+    timeout: float = PARTNER_CALL_TIMEOUT,
+    allow_none: tuple = ("export",),
+) -> RedemptionOutcome:
+    """asyncio flavour of run_fanout; timed-out calls are cancelled.
+
+    As in run_fanout, partner calls are not cancelled at the deadline (their
+    aiohttp timeouts bound them), so a claim in progress is never retried.
+    """
+
+    async def guarded(name, factory):
+        guard = guard_for(name)
+        rejected = guard.acquire() if guard else None
+        if rejected:
+            return _shed(name, *rejected)
+
+        started = time.monotonic()
+        ok = False
+        try:
+            value = await asyncio.wait_for(factory(), None if guard else timeout)
+            ok = value is not None or name in allow_none
+        except asyncio.TimeoutError:
+            return CallResult(name, "timeout", duration=time.monotonic() - started)
+        except Exception as e:
+            return CallResult(
+                name, "error", error=str(e), duration=time.monotonic() - started
+            )
+        finally:
+            if guard:
+                guard.release(ok, time.monotonic() - started)
+        return _result(name, value, started, name in allow_none)
+
+    results = await asyncio.gather(
+        *(guarded(name, factory) for name, factory in calls.items())
+    )
+    return RedemptionOutcome({r.name: r for r in results})
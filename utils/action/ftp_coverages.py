@@ -3,27 +3,114 @@
 # Uses SQLModel/SQLAlchemy sessions + parameterized raw SQL
 # by: you 🫶
 
-from typing import Any, Dict, List, Optional, Union
-from sqlmodel import create_engine, Session, text
-from config import DATABASE_URL
+import base64
+import json
+import pickle
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
+from sqlalchemy.sql.elements import TextClause
+from sqlmodel import Session, text
+from config import (
+    COVERAGE_CACHE_MAX_BYTES,
+    COVERAGE_CACHE_MAX_ENTRIES,
+    COVERAGE_CACHE_TTL,
+    COVERAGE_COUNT_MODE,
+    COVERAGE_COUNT_REFRESH,
+    COVERAGE_SEARCH_TIMEOUT,
+    COVERAGE_SEARCH_WORKERS,
+    EXPORT_CHUNK_SIZE,
+)
+from utils.action.fanout import CallResult
+from utils import name_search, table_stamps
+from utils.cache import TTLCache
+from utils.db import get_read_engine
 from utils.helpers import Print
 
-# --- Engine ---
-engine = create_engine(DATABASE_URL, echo=True)
+# --- Engine --- (coverage queries are read-only: use the replica if configured)
+engine = get_read_engine()
 
 
 # --- Helpers -----------------------------------------------------------------
 
 
+Statement = Union[str, TextClause]
+
+
+def _statement(sql: Statement) -> TextClause:
+    # Coverage statements are built once per variant (see _coverage_statement)
+    return text(sql) if isinstance(sql, str) else sql
+
+
 def _fetch_all_dicts(
-    session: Session, sql: str, params: Dict[str, Any]
+    session: Session, sql: Statement, params: Dict[str, Any]
 ) -> List[Dict[str, Any]]:
-    result = session.execute(text(sql), params).mappings().all()
+    result = session.execute(_statement(sql), params).mappings().all()
     return [dict(r) for r in result]
 
 
-def _fetch_scalar(session: Session, sql: str, params: Dict[str, Any]) -> int:
-    row = session.exec(text(sql), params).first()
+def _stream_dicts(
+    session: Session,
+    sql: Statement,
+    params: Dict[str, Any],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    # Server-side (unbuffered) cursor: rows arrive chunk_size at a time
+    result = session.execute(
+        _statement(sql),
+        params,
+        execution_options={"stream_results": True, "yield_per": chunk_size},
+    )
+    for row in result.mappings():
+        yield dict(row)
+
+
+class CoverageBatch(NamedTuple):
+    columns: List[str]
+    rows: List[Tuple[Any, ...]]
+
+
+def _stream_batches(
+    session: Session,
+    sql: Statement,
+    params: Dict[str, Any],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[CoverageBatch]:
+    # Same server-side cursor as _stream_dicts, but rows stay plain tuples
+    # and are handed over one fetch (chunk_size rows) at a time
+    result = session.execute(
+        _statement(sql),
+        params,
+        execution_options={"stream_results": True, "yield_per": chunk_size},
+    )
+    columns = list(result.keys())
+    for partition in result.partitions(chunk_size):
+        yield CoverageBatch(columns, [tuple(row) for row in partition])
+
+
+def _rows(
+    session: Session, sql: Statement, params: Dict[str, Any], stream: bool = False
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    if stream:
+        return _stream_dicts(session, sql, params)
+    return _fetch_all_dicts(session, sql, params)
+
+
+def _fetch_scalar(session: Session, sql: Statement, params: Dict[str, Any]) -> int:
+    row = session.execute(_statement(sql), params).first()
     if row is None:
         return 0
     # row may be a scalar or Mapping
@@ -37,58 +124,53 @@ def _fetch_scalar(session: Session, sql: str, params: Dict[str, Any]) -> int:
         return int(row[0]) if isinstance(row, (list, tuple)) else 0
 
 
-def _maybe_limit_offset(limit: Union[int, str], offset: int) -> str:
+def _page_params(limit: Union[int, str], offset: int) -> Optional[Dict[str, int]]:
+    # LIMIT/OFFSET are bound, not interpolated, so each variant is one statement
     if isinstance(limit, str) and limit.lower() == "all":
-        return ""
+        return None
     if limit is None:
-        return ""
+        return None
     try:
         lim = int(limit)
     except Exception:
-        return ""
-    off = int(offset or 0)
-    return f" LIMIT {lim} OFFSET {off} "
+        return None
+    return {"limit": lim, "offset": int(offset or 0)}
 
 
-# --- NationGuard --------------------------------------------------------------
+def _query_params(*parts: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    for part in parts:
+        params.update(part or {})
+    return params
 
 
-def nationguard_coverage_solution(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
-            r.ContractStatus AS Status,
-            DATE_FORMAT((r.SaleDate),'%m/%d/%Y') AS SaleDate,
-            r.ContractNumber AS ContractNo,
-            r.LastName AS CustomerLName,
-            r.FirstName AS CUST_FIRST_NAME,
-            r.LastName AS CUST_LAST_NAME,
-            r.VIN,
-            r.ContractNumber AS PolicyNumber,
-            r.CoverageName AS COVERAGE_NAME,
-            r.ProductType AS COV_TYPE,
-            r.ContractStatus AS COV_STATUS,
-            r.SaleDate AS PurchaseDate,
-            r.SaleDate AS EFF_DATE,
-            r.TermMileage AS EFF_MILEAGE,
-            'N/A' AS EXP_DATE,
-            'N/A' AS EXP_MILEAGE,
-            r.DeductibleAmount AS DEDUCTIBLE
-        FROM mypcp_roadvant.tbl_nationgard AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
+def _filter_params(DealerID: int, VIN: str, LastName: str) -> Dict[str, Any]:
+    params = {"DealerID": int(DealerID)}
+    if VIN:
+        params["VIN"] = VIN
+    if LastName:
+        params["LastName"] = LastName
+    return params
 
-    sql = f"""
-    SELECT DISTINCT
+
+# --- Coverage SQL -------------------------------------------------------------
+# Every provider table is queried the same way; only the table, the selected
+# columns and the provider-side last-name predicate differ.
+
+
+@dataclass(frozen=True)
+class CoverageProvider:
+    name: str
+    table: str
+    raw_columns: str  # select list when no VIN/LastName filter is given
+    columns: str  # provider columns appended to the contract columns
+    raw_sort: Tuple[str, str]  # (sale date, contract no) of the raw table
+    last_name_column: Optional[str] = None  # provider-side last name column
+    last_name_filter: Optional[str] = None  # custom LastName predicate instead
+
+
+# Contract columns shared by every filtered (dealer) query
+_CONTRACT_COLUMNS = """
       CASE
         WHEN t.Status = 'I' THEN 'In-Active'
         WHEN t.Status = 'L' THEN 'Active'
@@ -100,85 +182,299 @@ def nationguard_coverage_solution(
       END AS Status,
       DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
       t.ContractNo,
-      c.CustomerLName,
-      r.FirstName AS CUST_FIRST_NAME,
-      r.LastName  AS CUST_LAST_NAME,
-      r.VIN,
-      r.ContractNumber AS PolicyNumber,
-      r.CoverageName AS COVERAGE_NAME,
-      r.ProductType AS COV_TYPE,
-      r.ContractStatus AS COV_STATUS,
-      r.SaleDate AS PurchaseDate,
-      r.SaleDate AS EFF_DATE,
-      r.TermMileage AS EFF_MILEAGE,
-      'N/A' AS EXP_DATE,
-      'N/A' AS EXP_MILEAGE,
-      r.DeductibleAmount AS DEDUCTIBLE
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_nationgard AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
+      c.CustomerLName"""
+
+
+# Keyset (seek) pagination of a raw provider table walks (SaleDate,
+# ContractNo) newest first, then the table's primary key so that every
+# position is unique
+_KEYSET_PREFIX = "_Keyset"
+
+
+def _keyset_aliases(count: int) -> List[str]:
+    return [f"{_KEYSET_PREFIX}{i}" for i in range(count)]
+
+
+def _seek_predicate(columns: Tuple[str, ...]) -> str:
+    """Rows strictly after (:after_0, :after_1, ...) in descending order"""
+    branches = []
+    for i, column in enumerate(columns):
+        equal = [f"{columns[j]} = :after_{j}" for j in range(i)]
+        branches.append(" AND ".join(equal + [f"{column} < :after_{i}"]))
+    return "(" + " OR ".join(f"({branch})" for branch in branches) + ")"
+
+
+def _name_match(alias: str, column: str, normalized: bool) -> str:
+    # Index-friendly lookup on the normalized column once it is in place
+    if normalized:
+        return f"{alias}.{name_search.norm_column(column)} = LOWER(TRIM(:LastName))"
+    return f"LOWER(TRIM({alias}.{column})) = LOWER(TRIM(:LastName))"
+
+
+def _last_name_clause(provider: CoverageProvider, normalized: Tuple[bool, bool]) -> str:
+    customer = _name_match("c", "CustomerLName", normalized[0])
+    if provider.last_name_filter:
+        return f"{customer} AND {provider.last_name_filter}"
+    provider_match = _name_match("r", provider.last_name_column, normalized[1])
+    return f"{customer} AND {provider_match}"
+
+
+def _is_filtered(VIN: str, LastName: str) -> bool:
+    return not (VIN == "" and LastName == "")
+
+
+class QueryVariant(NamedTuple):
+    """Everything that changes a provider's SQL text (not its bind values)"""
+
+    filtered: bool
+    vin: bool = False
+    last_name: bool = False
+    normalized: Tuple[bool, bool] = (False, False)  # customer, provider column
+
+
+def _variant(provider: CoverageProvider, VIN: str, LastName: str) -> QueryVariant:
+    if not _is_filtered(VIN, LastName):
+        return QueryVariant(False)
+    normalized = (False, False)
     if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+        normalized = (
+            name_search.available(
+                engine, "tbl_customer", "CustomerLName", NAME_SEARCH_COLUMNS
+            ),
+            bool(provider.last_name_column)
+            and name_search.available(
+                engine, provider.table, provider.last_name_column, NAME_SEARCH_COLUMNS
+            ),
+        )
+    return QueryVariant(True, bool(VIN), bool(LastName), normalized)
+
+
+@lru_cache(maxsize=None)
+def _coverage_statement(
+    provider: CoverageProvider,
+    variant: QueryVariant,
+    paged: bool = False,
+    keyset: bool = False,
+    after: bool = False,
+    select_all: bool = False,
+    tiebreak: Tuple[str, ...] = (),
+) -> TextClause:
+    """
+    Build (once per variant) the coverage query for one provider.
+    - paged: LIMIT :limit OFFSET :offset after ORDER BY.
+    - keyset: also select the raw sort key plus the tiebreak columns, order
+      by them and LIMIT :limit (seek pagination, unfiltered path only: extra
+      columns would change what SELECT DISTINCT collapses).
+    - after: only rows strictly after :after_0, :after_1, ... in keyset order.
+    - select_all: unfiltered path selects r.* (mirrors export()).
+    """
+    if keyset and variant.filtered:
+        raise ValueError("keyset pagination only covers the raw provider table")
+    if variant.filtered:
+        sort_date, sort_no = "t.SaleDate", "t.ContractNo"
+        select = f"SELECT DISTINCT{_CONTRACT_COLUMNS},{provider.columns}"
+        source = f"""FROM tbl_contract AS t
+    JOIN {provider.table} AS r ON t.VIN = r.VIN
+    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID"""
+        where = ["t.DealerID = :DealerID"]
+        if variant.vin:
+            where.append("t.VIN = :VIN")
+        if variant.last_name:
+            where.append(_last_name_clause(provider, variant.normalized))
+    else:
+        sort_date, sort_no = provider.raw_sort
+        if select_all:
+            select = "SELECT r.*"
+        else:
+            select = f"SELECT DISTINCT{provider.raw_columns}"
+        source = f"FROM {provider.table} AS r"
+        where = []
+
+    seek = (sort_date, sort_no) + tiebreak
+    if keyset:
+        aliases = _keyset_aliases(len(seek))
+        select += "".join(
+            f",\n      {column} AS {alias}" for column, alias in zip(seek, aliases)
+        )
+        order = "ORDER BY " + ", ".join(f"{alias} DESC" for alias in aliases)
+        tail = "LIMIT :limit"
+    else:
+        order = "ORDER BY SaleDate DESC"
+        tail = "LIMIT :limit OFFSET :offset" if paged else ""
+    if after:
+        where.append(_seek_predicate(seek))
+
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    sql = f"""
+    {select}
+    {source}
+    {where_sql}
+    {order}
+    {tail}
+    """
+    return text(sql)
 
 
-def nationguard_coverage_solution_count(
-    session: Session, DealerID: int, VIN: str = "", LastName: str = ""
-) -> int:
-    if VIN == "" and LastName == "":
-        sql = """
-        SELECT COUNT(*) AS cnt
-        FROM mypcp_roadvant.tbl_nationgard AS r
-        """
-        return _fetch_scalar(session, sql, {})
+@lru_cache(maxsize=None)
+def _table_statement(provider: CoverageProvider, paged: bool) -> TextClause:
+    # export() without filters: the raw provider table
+    tail = "LIMIT :limit OFFSET :offset" if paged else ""
+    return text(f"SELECT * FROM {provider.table} {tail}")
 
+
+@lru_cache(maxsize=None)
+def _count_statement(provider: CoverageProvider, variant: QueryVariant) -> TextClause:
+    if not variant.filtered:
+        return text(f"SELECT COUNT(*) AS cnt FROM {provider.table} AS r")
     sql = """
     SELECT COUNT(DISTINCT t.ContractNo) AS cnt
     FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_nationgard AS r ON t.VIN = r.VIN
+    JOIN {table} AS r ON t.VIN = r.VIN
     JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
     WHERE t.DealerID = :DealerID
       {vin_clause}
       {name_clause}
     """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
+        table=provider.table,
+        vin_clause="AND t.VIN = :VIN" if variant.vin else "",
         name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))"
-            if LastName
+            f"AND {_last_name_clause(provider, variant.normalized)}"
+            if variant.last_name
             else ""
         ),
     )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
+    return text(sql)
+
+
+def _coverage(
+    session: Session,
+    provider: CoverageProvider,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    limit: Union[int, str],
+    offset: int,
+    stream: bool,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    variant = _variant(provider, VIN, LastName)
+    page = _page_params(limit, offset)
+    statement = _coverage_statement(provider, variant, paged=page is not None)
+    filters = _filter_params(DealerID, VIN, LastName) if variant.filtered else {}
+    return _rows(session, statement, _query_params(filters, page), stream)
+
+
+# Unfiltered totals per (table, reload stamp), see COVERAGE_COUNT_MODE
+count_cache = TTLCache("coverage_counts", 64, COVERAGE_COUNT_REFRESH)
+
+_TABLE_ROWS_SQL = """
+SELECT TABLE_ROWS AS cnt
+FROM information_schema.TABLES
+WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE()) AND TABLE_NAME = :table
+"""
+
+
+def _estimated_count(session: Session, table: str) -> Optional[int]:
+    # InnoDB's row estimate: free to read, typically within a few percent
+    schema, _, name = table.rpartition(".")
+    row = session.execute(
+        text(_TABLE_ROWS_SQL), {"schema": schema or None, "table": name}
+    ).first()
+    if row is None or row[0] is None:
+        return None
+    return int(row[0])
+
+
+def _coverage_count(
+    session: Session,
+    provider: CoverageProvider,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    mode: Optional[str] = None,
+) -> int:
+    variant = _variant(provider, VIN, LastName)
+    sql = _count_statement(provider, variant)
+    mode = (mode or COVERAGE_COUNT_MODE).lower()
+    if not variant.filtered:
+        if mode == "approximate":
+            estimate = _estimated_count(session, provider.table)
+            if estimate is not None:
+                return estimate
+        elif mode == "cached":
+            key = (provider.table, table_stamps.stamp(provider.table))
+            return count_cache.get_or_load(key, lambda: _fetch_scalar(session, sql, {}))
+    params = _filter_params(DealerID, VIN, LastName) if variant.filtered else {}
     return _fetch_scalar(session, sql, params)
 
 
-# --- TWS ---------------------------------------------------------------------
+# --- NationGuard --------------------------------------------------------------
+
+NATIONGUARD = CoverageProvider(
+    name="nationguard",
+    table="mypcp_roadvant.tbl_nationgard",
+    raw_columns="""
+            r.ContractStatus AS Status,
+            DATE_FORMAT((r.SaleDate),'%m/%d/%Y') AS SaleDate,
+            r.ContractNumber AS ContractNo,
+            r.LastName AS CustomerLName,
+            r.FirstName AS CUST_FIRST_NAME,
+            r.LastName AS CUST_LAST_NAME,
+            r.VIN,
+            r.ContractNumber AS PolicyNumber,
+            r.CoverageName AS COVERAGE_NAME,
+            r.ProductType AS COV_TYPE,
+            r.ContractStatus AS COV_STATUS,
+            r.SaleDate AS PurchaseDate,
+            r.SaleDate AS EFF_DATE,
+            r.TermMileage AS EFF_MILEAGE,
+            'N/A' AS EXP_DATE,
+            'N/A' AS EXP_MILEAGE,
+            r.DeductibleAmount AS DEDUCTIBLE""",
+    columns="""
+      r.FirstName AS CUST_FIRST_NAME,
+      r.LastName  AS CUST_LAST_NAME,
+      r.VIN,
+      r.ContractNumber AS PolicyNumber,
+      r.CoverageName AS COVERAGE_NAME,
+      r.ProductType AS COV_TYPE,
+      r.ContractStatus AS COV_STATUS,
+      r.SaleDate AS PurchaseDate,
+      r.SaleDate AS EFF_DATE,
+      r.TermMileage AS EFF_MILEAGE,
+      'N/A' AS EXP_DATE,
+      'N/A' AS EXP_MILEAGE,
+      r.DeductibleAmount AS DEDUCTIBLE""",
+    raw_sort=("r.SaleDate", "r.ContractNumber"),
+    last_name_column="LastName",
+)
 
 
-def tws_coverage_solution(
+def nationguard_coverage_solution(
     session: Session,
     DealerID: int,
     VIN: str = "",
     LastName: str = "",
     limit: Union[int, str] = 100,
     offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(
+        session, NATIONGUARD, DealerID, VIN, LastName, limit, offset, stream
+    )
+
+
+def nationguard_coverage_solution_count(
+    session: Session, DealerID: int, VIN: str = "", LastName: str = ""
+) -> int:
+    return _coverage_count(session, NATIONGUARD, DealerID, VIN, LastName)
+
+
+# --- TWS ---------------------------------------------------------------------
+
+TWS = CoverageProvider(
+    name="tws",
+    table="mypcp_roadvant.tbl_tws",
+    raw_columns="""
           CASE
             WHEN r.ContractStatus = 'A' THEN 'Active'
             WHEN r.ContractStatus = 'E' THEN 'Matured'
@@ -200,27 +496,8 @@ def tws_coverage_solution(
           r.TermMileage AS EFF_MILEAGE,
           'N/A' AS EXP_DATE,
           'N/A' AS EXP_MILEAGE,
-          r.DeductibleAmount AS DEDUCTIBLE
-        FROM mypcp_roadvant.tbl_tws AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.DeductibleAmount AS DEDUCTIBLE""",
+    columns="""
       r.FirstName AS CUST_FIRST_NAME,
       r.LastName  AS CUST_LAST_NAME,
       r.VIN,
@@ -233,68 +510,36 @@ def tws_coverage_solution(
       r.TermMileage AS EFF_MILEAGE,
       'N/A' AS EXP_DATE,
       'N/A' AS EXP_MILEAGE,
-      r.DeductibleAmount AS DEDUCTIBLE
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_tws AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.DeductibleAmount AS DEDUCTIBLE""",
+    raw_sort=("r.SaleDate", "r.ContractNumber"),
+    last_name_column="LastName",
+)
+
+
+def tws_coverage_solution(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(session, TWS, DealerID, VIN, LastName, limit, offset, stream)
 
 
 def tws_coverage_solution_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
-    if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM mypcp_roadvant.tbl_tws AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_tws AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))"
-            if LastName
-            else ""
-        ),
-    )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return _coverage_count(session, TWS, DealerID, VIN, LastName)
 
 
 # --- Assurant ----------------------------------------------------------------
 
-
-def assurant_coverage_solution(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+ASSURANT = CoverageProvider(
+    name="assurant",
+    table="mypcp_roadvant.tbl_assurant",
+    raw_columns="""
           r.ContractStatus AS Status,
           DATE_FORMAT((r.SaleDate),'%m/%d/%Y') AS SaleDate,
           r.ContractNumber AS ContractNo,
@@ -311,28 +556,8 @@ def assurant_coverage_solution(
           r.TermMileage AS EFF_MILEAGE,
           'N/A' AS EXP_DATE,
           'N/A' AS EXP_MILEAGE,
-          r.DeductibleAmount AS DEDUCTIBLE
-        FROM mypcp_roadvant.tbl_assurant AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-
-    # Note: CI version only joins tbl_customer when filters present — we follow that.
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.DeductibleAmount AS DEDUCTIBLE""",
+    columns="""
       r.FirstName AS CUST_FIRST_NAME,
       r.LastName  AS CUST_LAST_NAME,
       r.VIN,
@@ -345,68 +570,36 @@ def assurant_coverage_solution(
       r.TermMileage AS EFF_MILEAGE,
       'N/A' AS EXP_DATE,
       'N/A' AS EXP_MILEAGE,
-      r.DeductibleAmount AS DEDUCTIBLE
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_assurant AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.DeductibleAmount AS DEDUCTIBLE""",
+    raw_sort=("r.SaleDate", "r.ContractNumber"),
+    last_name_column="LastName",
+)
+
+
+def assurant_coverage_solution(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(session, ASSURANT, DealerID, VIN, LastName, limit, offset, stream)
 
 
 def assurant_coverage_solution_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
-    if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM mypcp_roadvant.tbl_assurant AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_assurant AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))"
-            if LastName
-            else ""
-        ),
-    )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return _coverage_count(session, ASSURANT, DealerID, VIN, LastName)
 
 
 # --- CareGuard ----------------------------------------------------------------
 
-
-def careguard_coverage_solution(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+CAREGUARD = CoverageProvider(
+    name="careguard",
+    table="mypcp_roadvant.tbl_careguard",
+    raw_columns="""
           CASE
             WHEN r.ContractStatus = 'A' THEN 'Active'
             WHEN r.ContractStatus = 'E' THEN 'Matured'
@@ -428,27 +621,8 @@ def careguard_coverage_solution(
           r.TermMileage AS EFF_MILEAGE,
           'N/A' AS EXP_DATE,
           'N/A' AS EXP_MILEAGE,
-          r.DeductibleAmount AS DEDUCTIBLE
-        FROM mypcp_roadvant.tbl_careguard AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.DeductibleAmount AS DEDUCTIBLE""",
+    columns="""
       r.FirstName AS CUST_FIRST_NAME,
       r.LastName  AS CUST_LAST_NAME,
       r.VIN,
@@ -461,70 +635,36 @@ def careguard_coverage_solution(
       r.TermMileage AS EFF_MILEAGE,
       'N/A' AS EXP_DATE,
       'N/A' AS EXP_MILEAGE,
-      r.DeductibleAmount AS DEDUCTIBLE
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_careguard AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.DeductibleAmount AS DEDUCTIBLE""",
+    raw_sort=("r.SaleDate", "r.ContractNumber"),
+    last_name_column="LastName",
+)
+
+
+def careguard_coverage_solution(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(session, CAREGUARD, DealerID, VIN, LastName, limit, offset, stream)
 
 
 def careguard_coverage_solution_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
-    if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM mypcp_roadvant.tbl_careguard AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN mycp_risk.mypcp_roadvant.tbl_careguard AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.LastName)) = LOWER(TRIM(:LastName))"
-            if LastName
-            else ""
-        ),
-    )
-    # Note: The original had the same schema; I’ve kept to mypcp_roadvant.* — fix schema if different.
-    sql = sql.replace("mycp_risk.", "")  # safety in case of copy typo
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return _coverage_count(session, CAREGUARD, DealerID, VIN, LastName)
 
 
 # --- CARS --------------------------------------------------------------------
 
-
-def cars_coverage_solution(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+CARS = CoverageProvider(
+    name="cars",
+    table="mypcp_roadvant.tbl_cars_coverage",
+    raw_columns="""
           CASE
             WHEN r.CoverageStatus = 'A' THEN 'Active'
             WHEN r.CoverageStatus = 'E' THEN 'Matured'
@@ -547,27 +687,8 @@ def cars_coverage_solution(
           r.ProductMileage AS EFF_MILEAGE,
           'N/A' AS EXP_DATE,
           'N/A' AS EXP_MILEAGE,
-          r.Deductible AS DEDUCTIBLE
-        FROM mypcp_roadvant.tbl_cars_coverage AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.Deductible AS DEDUCTIBLE""",
+    columns="""
       r.CustomerFName AS CUST_FIRST_NAME,
       r.CoverageDescription,
       r.CustomerLName AS CUST_LAST_NAME,
@@ -581,68 +702,36 @@ def cars_coverage_solution(
       r.ProductMileage AS EFF_MILEAGE,
       'N/A' AS EXP_DATE,
       'N/A' AS EXP_MILEAGE,
-      r.Deductible AS DEDUCTIBLE
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_cars_coverage AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.CustomerLName)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.Deductible AS DEDUCTIBLE""",
+    raw_sort=("r.PurchaseDate", "r.PolicyNumber"),
+    last_name_column="CustomerLName",
+)
+
+
+def cars_coverage_solution(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(session, CARS, DealerID, VIN, LastName, limit, offset, stream)
 
 
 def cars_coverage_solution_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
-    if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM mypcp_roadvant.tbl_cars_coverage AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_cars_coverage AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.CustomerLName)) = LOWER(TRIM(:LastName))"
-            if LastName
-            else ""
-        ),
-    )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return _coverage_count(session, CARS, DealerID, VIN, LastName)
 
 
 # --- Amynta Warranty Solution -------------------------------------------------
 
-
-def amynta_warranty_solution(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+AMYNTA = CoverageProvider(
+    name="amynta",
+    table="mypcp_roadvant.tbl_amynta_warranty_solution",
+    raw_columns="""
           r.COV_STATUS AS Status,
           DATE_FORMAT(FROM_UNIXTIME(r.PURCHASE_DATE),'%m/%d/%Y') AS SaleDate,
           r.CONTRACT_NUM AS ContractNo,
@@ -659,27 +748,8 @@ def amynta_warranty_solution(
           r.EFF_MILEAGE,
           r.EXP_DATE,
           r.EXP_MILEAGE,
-          r.DEDUCTIBLE
-        FROM mypcp_roadvant.tbl_amynta_warranty_solution AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.DEDUCTIBLE""",
+    columns="""
       r.CUST_FIRST_NAME,
       r.CUST_LAST_NAME,
       r.VIN,
@@ -692,68 +762,36 @@ def amynta_warranty_solution(
       r.EFF_MILEAGE,
       r.EXP_DATE,
       r.EXP_MILEAGE,
-      r.DEDUCTIBLE
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_amynta_warranty_solution AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.CUST_LAST_NAME)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.DEDUCTIBLE""",
+    raw_sort=("r.PURCHASE_DATE", "r.CONTRACT_NUM"),
+    last_name_column="CUST_LAST_NAME",
+)
+
+
+def amynta_warranty_solution(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(session, AMYNTA, DealerID, VIN, LastName, limit, offset, stream)
 
 
 def amynta_warranty_solution_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
-    if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM mypcp_roadvant.tbl_amynta_warranty_solution AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_amynta_warranty_solution AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.CUST_LAST_NAME)) = LOWER(TRIM(:LastName))"
-            if LastName
-            else ""
-        ),
-    )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return _coverage_count(session, AMYNTA, DealerID, VIN, LastName)
 
 
 # --- Smart AutoCare -----------------------------------------------------------
 
-
-def smart_autocare(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+SMART_AUTOCARE = CoverageProvider(
+    name="smartautocare",
+    table="smartautocare.tbl_smart_autocare",
+    raw_columns="""
           r.ContractStatus AS Status,
           DATE_FORMAT(FROM_UNIXTIME(r.EfectiveDate),'%m/%d/%Y') AS SaleDate,
           r.PolicyNumber AS ContractNo,
@@ -770,27 +808,8 @@ def smart_autocare(
           r.CancelDate,
           r.ContractPaidDate,
           r.DealerName,
-          r.DealerNumber
-        FROM smartautocare.tbl_smart_autocare AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.DealerNumber""",
+    columns="""
       r.VIN,
       r.CustomerName,
       r.ProductLineType,
@@ -803,68 +822,42 @@ def smart_autocare(
       r.CancelDate,
       r.ContractPaidDate,
       r.DealerName,
-      r.DealerNumber
-    FROM tbl_contract AS t
-    JOIN smartautocare.tbl_smart_autocare AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.CustomerName)) LIKE LOWER(CONCAT('%', TRIM(:LastName), '%'))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.DealerNumber""",
+    raw_sort=("r.EfectiveDate", "r.PolicyNumber"),
+    # Smart AutoCare only stores the full name: match the last name inside it
+    # (a substring match, so no normalized column/index can serve it)
+    last_name_filter=(
+        "LOWER(TRIM(r.CustomerName)) LIKE LOWER(CONCAT('%', TRIM(:LastName), '%'))"
+    ),
+)
+
+
+def smart_autocare(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(
+        session, SMART_AUTOCARE, DealerID, VIN, LastName, limit, offset, stream
+    )
 
 
 def smart_autocare_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
-    if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM smartautocare.tbl_smart_autocare AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN smartautocare.tbl_smart_autocare AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.CustomerName)) LIKE LOWER(CONCAT('%', TRIM(:LastName), '%'))"
-            if LastName
-            else ""
-        ),
-    )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return _coverage_count(session, SMART_AUTOCARE, DealerID, VIN, LastName)
 
 
 # --- RoadVant -----------------------------------------------------------------
 
-
-def roadvant(
-    session: Session,
-    DealerID: int,
-    VIN: str = "",
-    LastName: str = "",
-    limit: Union[int, str] = 100,
-    offset: int = 0,
-) -> List[Dict[str, Any]]:
-    if VIN == "" and LastName == "":
-        sql = f"""
-        SELECT DISTINCT
+ROADVANT = CoverageProvider(
+    name="roadvant",
+    table="mypcp_roadvant.tbl_roadvant",
+    raw_columns="""
           r.coverage_type AS Status,
           DATE_FORMAT(FROM_UNIXTIME(r.purchase_date),'%m/%d/%Y') AS SaleDate,
           r.contract_number AS ContractNo,
@@ -880,26 +873,8 @@ def roadvant(
           r.product_milage,
           r.expiration_milage,
           r.expiration_date,
-          r.dealer_name, r.dealer_number
-        FROM mypcp_roadvant.tbl_roadvant AS r
-        ORDER BY SaleDate DESC
-        { _maybe_limit_offset(limit, offset) }
-        """
-        return _fetch_all_dicts(session, sql, {})
-    sql = f"""
-    SELECT DISTINCT
-      CASE
-        WHEN t.Status = 'I' THEN 'In-Active'
-        WHEN t.Status = 'L' THEN 'Active'
-        WHEN t.Status = 'M' THEN 'Matured'
-        WHEN t.Status = 'C' THEN 'Cancelled'
-        WHEN t.Status = 'S' THEN 'Perpetual'
-        WHEN t.Status = 'P' THEN 'Pending Matured'
-        ELSE 'In-Active'
-      END AS Status,
-      DATE_FORMAT(FROM_UNIXTIME(t.SaleDate),'%m/%d/%Y') AS SaleDate,
-      t.ContractNo,
-      c.CustomerLName,
+          r.dealer_name, r.dealer_number""",
+    columns="""
       r.id,
       r.dealer_number,
       r.dealer_name,
@@ -913,55 +888,184 @@ def roadvant(
       r.product_term,
       r.product_milage,
       r.expiration_milage,
-      r.expiration_date
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_roadvant AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-    { "AND t.VIN = :VIN" if VIN else "" }
-    { "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.last_name)) = LOWER(TRIM(:LastName))" if LastName else "" }
-    ORDER BY SaleDate DESC
-    { _maybe_limit_offset(limit, offset) }
-    """
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_all_dicts(session, sql, params)
+      r.expiration_date""",
+    raw_sort=("r.purchase_date", "r.contract_number"),
+    last_name_column="last_name",
+)
+
+
+def roadvant(
+    session: Session,
+    DealerID: int,
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    stream: bool = False,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    return _coverage(session, ROADVANT, DealerID, VIN, LastName, limit, offset, stream)
 
 
 def roadvant_count(
     session: Session, DealerID: int, VIN: str = "", LastName: str = ""
 ) -> int:
+    return _coverage_count(session, ROADVANT, DealerID, VIN, LastName)
+
+
+# --- Export Router (mirrors PHP export()) ------------------------------------
+
+# CoverageName -> provider
+PROVIDERS: Dict[int, CoverageProvider] = {
+    1: ROADVANT,
+    2: SMART_AUTOCARE,
+    3: AMYNTA,
+    4: CARS,
+    5: CAREGUARD,
+    6: NATIONGUARD,
+    7: TWS,
+    8: ASSURANT,
+}
+
+# Name columns matched against LastName (normalized by utils/name_search.py)
+NAME_SEARCH_COLUMNS = [("tbl_customer", "CustomerLName")] + [
+    (p.table, p.last_name_column) for p in PROVIDERS.values() if p.last_name_column
+]
+
+
+def _provider(CoverageName: int) -> Optional[CoverageProvider]:
+    try:
+        return PROVIDERS.get(int(CoverageName))
+    except (TypeError, ValueError):
+        return None
+
+
+def _route_query(
+    CoverageName: int,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    limit: Union[int, str],
+    offset: int,
+) -> Optional[Tuple[TextClause, Dict[str, Any]]]:
+    """
+    Mirrors the PHP:
+    - If no VIN and no LastName:
+        return raw table rows (no dealer filter), optionally limited.
+    - Else:
+        route to the corresponding coverage_* query with DealerID and filters.
+    CoverageName mapping:
+        1 = roadvant
+        2 = smartautocare
+        3 = amynta_warranty_solution
+        4 = cars_coverage_solution
+        5 = careguard
+        6 = nationguard
+        7 = tws
+        8 = assurant
+    Returns (statement, params), or None for an unknown CoverageName.
+    """
+    provider = _provider(CoverageName)
+    if provider is None:
+        return None
+
+    page = _page_params(limit, offset)
     if VIN == "" and LastName == "":
-        sql = "SELECT COUNT(*) AS cnt FROM mypcp_roadvant.tbl_roadvant AS r"
-        return _fetch_scalar(session, sql, {})
-    sql = """
-    SELECT COUNT(DISTINCT t.ContractNo) AS cnt
-    FROM tbl_contract AS t
-    JOIN mypcp_roadvant.tbl_roadvant AS r ON t.VIN = r.VIN
-    JOIN tbl_customer AS c ON c.CustomerID = t.CustomerID
-    WHERE t.DealerID = :DealerID
-      {vin_clause}
-      {name_clause}
-    """.format(
-        vin_clause="AND t.VIN = :VIN" if VIN else "",
-        name_clause=(
-            "AND LOWER(TRIM(c.CustomerLName)) = LOWER(TRIM(:LastName)) AND LOWER(TRIM(r.last_name)) = LOWER(TRIM(:LastName))"
-            if LastName
-            else ""
-        ),
+        return _table_statement(provider, page is not None), _query_params(page)
+
+    # With filters: the provider's dealer query
+    statement = _coverage_statement(
+        provider, _variant(provider, VIN, LastName), paged=page is not None
     )
-    params = {"DealerID": int(DealerID)}
-    if VIN:
-        params["VIN"] = VIN
-    if LastName:
-        params["LastName"] = LastName
-    return _fetch_scalar(session, sql, params)
+    return statement, _query_params(_filter_params(DealerID, VIN, LastName), page)
 
 
-# --- Export Router (mirrors PHP export()) ------------------------------------
+def _route(
+    session: Session,
+    CoverageName: int,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    limit: Union[int, str],
+    offset: int,
+    stream: bool,
+) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+    query = _route_query(CoverageName, DealerID, VIN, LastName, limit, offset)
+    if query is None:
+        return []
+    return _rows(session, *query, stream)
+
+
+# --- Result cache ---------------------------------------------------------------
+
+
+def _rows_size(rows: List[Dict[str, Any]]) -> int:
+    return len(pickle.dumps(rows, pickle.HIGHEST_PROTOCOL))
+
+
+coverage_cache = TTLCache(
+    "coverage_results",
+    COVERAGE_CACHE_MAX_ENTRIES,
+    COVERAGE_CACHE_TTL,
+    max_bytes=COVERAGE_CACHE_MAX_BYTES,
+    sizeof=_rows_size,
+)
+
+# Filtered queries also read the dealer's contracts and customers
+_DEALER_TABLES = ("tbl_contract", "tbl_customer")
+
+
+def _cache_key(
+    provider: CoverageProvider,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    limit: Union[int, str],
+    offset: int,
+) -> tuple:
+    filtered = _is_filtered(VIN, LastName)
+    tables = (provider.table,) + (_DEALER_TABLES if filtered else ())
+    return (
+        provider.table,
+        str(DealerID) if filtered else "",  # raw table rows are not per dealer
+        VIN,
+        LastName.strip(" ").lower(),  # the SQL compares LOWER(TRIM(...))
+        tuple(sorted((_page_params(limit, offset) or {}).items())),
+        # A reload stamp newer than the entry changes the key: stale entries
+        # are never hit again and age out of the LRU
+        table_stamps.stamps(tables),
+    )
+
+
+def _cached_rows(
+    CoverageName: int,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    limit: Union[int, str],
+    offset: int,
+    load: Callable[[], List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    provider = _provider(CoverageName)
+    if provider is None or COVERAGE_CACHE_TTL <= 0:
+        return load()
+    key = _cache_key(provider, DealerID, VIN, LastName, limit, offset)
+    rows = coverage_cache.get(key)
+    if rows is None:
+        rows = load()
+        coverage_cache.set(key, rows)
+    # Callers may tag or edit rows: never hand out the cached dicts
+    return [dict(row) for row in rows]
+
+
+def invalidate_coverage_cache(table: Optional[str] = None) -> int:
+    """In-process hook: drop cached results of one provider table, or all.
+
+    Other processes pick up a reload through table_stamps.touch(table).
+    """
+    if table is None:
+        coverage_cache.invalidate()
+        return 0
+    return coverage_cache.invalidate_where(lambda key: key[0] == table)
 
 
 def export(
@@ -972,77 +1076,308 @@ def export(
     limit: Union[int, str] = 100,
     offset: int = 0,
 ) -> List[Dict[str, Any]]:
-    with Session(engine) as session:
-        """
-        Mirrors the PHP:
-        - If no VIN and no LastName:
-            return raw table rows (no dealer filter), optionally limited.
-        - Else:
-            route to the corresponding coverage_* function with DealerID and filters.
-        CoverageName mapping:
-            1 = roadvant
-            2 = smartautocare
-            3 = amynta_warranty_solution
-            4 = cars_coverage_solution
-            5 = careguard
-            6 = nationguard
-            7 = tws
-            8 = assurant
-        """
-        if VIN == "" and LastName == "":
-            lo = _maybe_limit_offset(limit, offset)
-            print("lo", lo)
-            table_sql = {
-                1: f"SELECT * FROM mypcp_roadvant.tbl_roadvant {lo}",
-                2: f"SELECT * FROM smartautocare.tbl_smart_autocare {lo}",
-                3: f"SELECT * FROM mypcp_roadvant.tbl_amynta_warranty_solution {lo}",
-                4: f"SELECT * FROM mypcp_roadvant.tbl_cars_coverage {lo}",
-                5: f"SELECT * FROM mypcp_roadvant.tbl_careguard {lo}",
-                6: f"SELECT * FROM mycp_risk.mypcp_roadvant.tbl_nationgard {lo}".replace(
-                    "mycp_risk.", ""
-                ),
-                7: f"SELECT * FROM mypcp_roadvant.tbl_tws {lo}",
-                8: f"SELECT * FROM mypcp_roadvant.tbl_assurant {lo}",
-            }
-            sql = table_sql.get(int(CoverageName))
-            if not sql:
-                return []
-            return _fetch_all_dicts(session, sql, {})
-
-        # With filters: route
-        data = None
-
-        if CoverageName == 1:
-            return roadvant(session, DealerID, VIN, LastName, limit, offset)
-
-        elif CoverageName == 2:
-            return smart_autocare(session, DealerID, VIN, LastName, limit, offset)
-        elif CoverageName == 3:
-            return amynta_warranty_solution(
-                session, DealerID, VIN, LastName, limit, offset
+    def load():
+        with Session(engine) as session:
+            return _route(
+                session, CoverageName, DealerID, VIN, LastName, limit, offset, False
             )
-        elif CoverageName == 4:
-            return cars_coverage_solution(
-                session, DealerID, VIN, LastName, limit, offset
-            )
-        elif CoverageName == 5:
-            return careguard_coverage_solution(
-                session, DealerID, VIN, LastName, limit, offset
-            )
-        elif CoverageName == 6:
-            return nationguard_coverage_solution(
-                session, DealerID, VIN, LastName, limit, offset
-            )
-        elif CoverageName == 7:
-            return tws_coverage_solution(
-                session, DealerID, VIN, LastName, limit, offset
+
+    return _cached_rows(CoverageName, DealerID, VIN, LastName, limit, offset, load)
+
+
+def iter_export(
+    CoverageName: int = 1,
+    DealerID: int = "2975",
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+) -> Iterator[Dict[str, Any]]:
+    """Same as export(), but rows are streamed from a server-side cursor.
+
+    The session stays open until the generator is exhausted or closed.
+    """
+    with Session(engine) as session:
+        yield from _route(
+            session, CoverageName, DealerID, VIN, LastName, limit, offset, True
+        )
+
+
+def export_batches(
+    CoverageName: int = 1,
+    DealerID: int = "2975",
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    offset: int = 0,
+    batch_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[CoverageBatch]:
+    """Same query as export(), yielded as CoverageBatch(columns, rows) chunks.
+
+    Rows are plain tuples straight off a server-side cursor (no per-row
+    dict), at most batch_size per batch; use limit="all" for a full export.
+    The session stays open until the generator is exhausted or closed.
+    """
+    query = _route_query(CoverageName, DealerID, VIN, LastName, limit, offset)
+    if query is None:
+        return
+    with Session(engine) as session:
+        yield from _stream_batches(session, *query, batch_size)
+
+
+def export_count(
+    CoverageName: int = 1,
+    DealerID: int = "2975",
+    VIN: str = "",
+    LastName: str = "",
+    mode: Optional[str] = None,
+) -> int:
+    """
+    Row total for export() pagination. Filtered counts are always exact;
+    unfiltered totals follow mode (default COVERAGE_COUNT_MODE):
+    "exact", "approximate" (table statistics) or "cached" (exact, refreshed
+    every COVERAGE_COUNT_REFRESH seconds or when the table is stamped).
+    """
+    provider = _provider(CoverageName)
+    if provider is None:
+        return 0
+    with Session(engine) as session:
+        return _coverage_count(session, provider, DealerID, VIN, LastName, mode)
+
+
+# --- Multi-provider search ---------------------------------------------------
+
+# One thread (and one pooled connection) per provider query
+_search_executor = ThreadPoolExecutor(
+    max_workers=max(1, COVERAGE_SEARCH_WORKERS), thread_name_prefix="coverage-search"
+)
+
+
+@dataclass
+class CoverageSearchResult:
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    providers: Dict[str, CallResult] = field(default_factory=dict)
+
+    @property
+    def complete(self) -> bool:
+        return all(c.status == "ok" for c in self.providers.values())
+
+    def statuses(self) -> Dict[str, str]:
+        return {name: c.status for name, c in self.providers.items()}
+
+
+@lru_cache(maxsize=256)
+def _hinted(sql: str, timeout_ms: int) -> TextClause:
+    hint = f"SELECT /*+ MAX_EXECUTION_TIME({timeout_ms}) */"
+    return text(re.sub(r"^\s*SELECT", hint, sql, count=1))
+
+
+def _with_time_limit(statement: TextClause, timeout: float) -> TextClause:
+    # MySQL aborts the SELECT itself once the provider's budget is spent,
+    # so a timed-out search does not keep its connection busy
+    return _hinted(statement.text, int(timeout * 1000))
+
+
+def _search_provider(
+    CoverageName: int,
+    DealerID: int,
+    VIN: str,
+    LastName: str,
+    limit: Union[int, str],
+    timeout: float,
+) -> Tuple[List[Dict[str, Any]], float]:
+    started = time.monotonic()
+    provider = PROVIDERS[CoverageName]
+
+    def load():
+        sql, params = _route_query(CoverageName, DealerID, VIN, LastName, limit, 0)
+        with Session(engine) as session:
+            return _fetch_all_dicts(session, _with_time_limit(sql, timeout), params)
+
+    rows = _cached_rows(CoverageName, DealerID, VIN, LastName, limit, 0, load)
+    for row in rows:
+        row["Provider"] = provider.name
+    return rows, time.monotonic() - started
+
+
+def search_coverages(
+    DealerID: int = "2975",
+    VIN: str = "",
+    LastName: str = "",
+    limit: Union[int, str] = 100,
+    CoverageNames: Optional[List[int]] = None,
+    timeout: float = COVERAGE_SEARCH_TIMEOUT,
+) -> CoverageSearchResult:
+    """
+    Run export() for every provider (or just CoverageNames) concurrently and
+    merge the rows, each tagged with a "Provider" key.
+
+    Each provider query runs on its own pooled connection and gets `timeout`
+    seconds; a provider that errors or runs out of time is reported in
+    .providers and contributes no rows, the others are still returned.
+    Total latency is roughly that of the slowest provider, not the sum.
+    """
+    names = [int(c) for c in (CoverageNames or PROVIDERS) if _provider(c)]
+    started = time.monotonic()
+    futures = {
+        c: _search_executor.submit(
+            _search_provider, c, DealerID, VIN, LastName, limit, timeout
+        )
+        for c in names
+    }
+    wait(futures.values(), timeout=timeout)
+
+    result = CoverageSearchResult()
+    for c, future in futures.items():
+        name = PROVIDERS[c].name
+        elapsed = time.monotonic() - started
+        if not future.done():
+            future.cancel()
+            result.providers[name] = CallResult(name, "timeout", duration=elapsed)
+        elif future.exception() is not None:
+            print(f"⚠️ Coverage search failed for {name}: {future.exception()}")
+            result.providers[name] = CallResult(
+                name, "error", error=str(future.exception()), duration=elapsed
             )
-        elif CoverageName == 8:
-            return assurant_coverage_solution(
-                session, DealerID, VIN, LastName, limit, offset
+        else:
+            rows, duration = future.result()
+            result.rows.extend(rows)
+            result.providers[name] = CallResult(
+                name, "ok", len(rows), duration=duration
             )
+    return result
+
+
+# --- Keyset pagination --------------------------------------------------------
+
 
-    return []
+_PRIMARY_KEY_SQL = """
+SELECT COLUMN_NAME
+FROM information_schema.KEY_COLUMN_USAGE
+WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE())
+  AND TABLE_NAME = :table
+  AND CONSTRAINT_NAME = 'PRIMARY'
+ORDER BY ORDINAL_POSITION
+"""
+
+
+@lru_cache(maxsize=None)
+def _primary_key(table: str) -> Tuple[str, ...]:
+    schema, _, name = table.rpartition(".")
+    with Session(engine) as session:
+        rows = session.execute(
+            text(_PRIMARY_KEY_SQL), {"schema": schema or None, "table": name}
+        ).all()
+    if not rows:
+        raise ValueError(f"{table} has no primary key, coverage_page can't seek it")
+    return tuple(row[0] for row in rows)
+
+
+def _tiebreak(provider: CoverageProvider) -> Tuple[str, ...]:
+    # (SaleDate, ContractNo) repeats: a contract has several provider rows
+    return tuple(f"r.`{c}`" for c in _primary_key(provider.table))
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps(list(values), default=str)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, size: Optional[int] = None) -> Tuple[Any, ...]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor))
+    except Exception as e:
+        raise ValueError(f"Invalid coverage cursor: {cursor!r}") from e
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        raise ValueError(f"Invalid coverage cursor: {cursor!r}")
+    return tuple(values)
+
+
+def coverage_page(
+    CoverageName: int = 1,
+    DealerID: int = "2975",
+    VIN: str = "",
+    LastName: str = "",
+    page_size: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Cursor-paginated export(): one page of rows plus the cursor of the next
+    page (None on the last page).
+
+    Without VIN/LastName (the raw provider table) rows are ordered newest
+    first on the raw (SaleDate, ContractNo) key, then on the table's primary
+    key, and the cursor resumes strictly after the last row returned. An
+    index on the table's (sale date, contract no) columns serves that seek
+    (InnoDB appends the primary key to it), so every page costs the same
+    range scan instead of skipping OFFSET rows. Rows with a NULL sale date or
+    contract number cannot be seeked past and are not returned.
+
+    A dealer's filtered coverage is the SELECT DISTINCT of export() and joins
+    three tables, which no single index can seek; its cursor carries an
+    OFFSET into export()'s paged query, so both return the same rows.
+    """
+    provider = _provider(CoverageName)
+    if provider is None:
+        return [], None
+
+    variant = _variant(provider, VIN, LastName)
+    params = {"limit": int(page_size)}
+    if variant.filtered:
+        params.update(_filter_params(DealerID, VIN, LastName))
+        params["offset"] = int(decode_cursor(cursor, 1)[0]) if cursor else 0
+        sql = _coverage_statement(provider, variant, paged=True)
+        with Session(engine) as session:
+            rows = _fetch_all_dicts(session, sql, params)
+        next_cursor = None
+        if rows and len(rows) == int(page_size):
+            next_cursor = encode_cursor(params["offset"] + len(rows))
+        return rows, next_cursor
+
+    tiebreak = _tiebreak(provider)
+    aliases = _keyset_aliases(2 + len(tiebreak))
+    if cursor:
+        for i, value in enumerate(decode_cursor(cursor, len(aliases))):
+            params[f"after_{i}"] = value
+
+    sql = _coverage_statement(
+        provider,
+        variant,
+        keyset=True,
+        after=bool(cursor),
+        select_all=True,
+        tiebreak=tiebreak,
+    )
+    with Session(engine) as session:
+        rows = _fetch_all_dicts(session, sql, params)
+
+    next_cursor = None
+    if rows and len(rows) == int(page_size):
+        last = rows[-1]
+        next_cursor = encode_cursor(*(last[k] for k in aliases))
+    for row in rows:
+        for k in aliases:
+            row.pop(k, None)
+    return rows, next_cursor
+
+
+def iter_coverage_pages(
+    CoverageName: int = 1,
+    DealerID: int = "2975",
+    VIN: str = "",
+    LastName: str = "",
+    page_size: int = 100,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Walk every page of coverage_page(); linear in the total row count."""
+    cursor = None
+    while True:
+        rows, cursor = coverage_page(
+            CoverageName, DealerID, VIN, LastName, page_size, cursor
+        )
+        if rows:
+            yield rows
+        if cursor is None:
+            return
 
 
 # --- Example usage (optional) -------------------------------------------------
@@ -0,0 +1,107 @@
+from collections import OrderedDict
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe in-process cache with an LRU size bound and a TTL.
+
+    ``None`` is never cached, so a missing row is looked up again next time.
+    With ``sizeof`` and ``max_bytes`` the cache is also bounded by the summed
+    size of its values; a single value larger than ``max_bytes`` is not
+    cached. ``bytes_saved`` adds up the size of every value served from cache.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 1024,
+        ttl: float = 300,
+        max_bytes: int = 0,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.max_bytes = max_bytes  # 0 = no byte bound
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self.bytes_saved = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += entry[2]
+            return entry[1]
+
+    def _drop(self, key: Hashable):
+        self.bytes -= self._data.pop(key)[2]
+
+    def set(self, key: Hashable, value: Any):
+        if value is None:
+            return
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, size)
+            self.bytes += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes and self.bytes > self.max_bytes
+            ):
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Optional[Any]:
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything when no key is given"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+                self.bytes = 0
+            elif key in self._data:
+                self._drop(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every key matching predicate; returns how many were dropped"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "bytes": self.bytes,
+                "bytes_saved": self.bytes_saved,
+            }
@@ -2,42 +2,41 @@ from datetime import datetime, timezone
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import json
-import os
 import smtplib
+import threading
 
 from config import DEFAULT_FROM_EMAIL, SENDGRID_PASS, SENDGRID_SMTP, SENDGRID_USER
+from utils.journal import append_record
+from utils.metrics import timed
+
+# Worker threads share the same log files; keep each record's lines whole.
+_save_lock = threading.Lock()
 
 
 # =============================
-# data save in log files "transactions.log" and "processed_messages.json"
+# data save in log files "transactions.log" and the "processed_messages.jsonl"
+# journal (see utils/journal.py for the JSON array view)
 # =============================
+@timed("save_message")
 def save_message(
     message_data: dict, event_type: str, processed_file: str, transaction_log_file: str
 ):
     # Use consistent UTC ISO timestamp
     utc_date = datetime.now(timezone.utc).isoformat()
 
-    # --- Save into processed_file as JSON array ---
-    existing_data = []
-    if os.path.exists(processed_file):
-        with open(processed_file, "r") as f:
-            try:
-                existing_data = json.load(f)
-            except json.JSONDecodeError:
-                existing_data = []
-
     # Add UTC date to message
     message_data["date"] = utc_date
-    existing_data.append(message_data)
 
-    with open(processed_file, "w") as f:
-        json.dump(existing_data, f, indent=2)
+    with _save_lock:
+        # --- Append to the processed_file journal (one JSON object per line) ---
+        append_record(processed_file, message_data)
 
-    # --- Save into transaction_log_file with UTC time ---
-    with open(transaction_log_file, "a") as f:
-        f.write(f"{utc_date} - {event_type} - {json.dumps(message_data)}\n")
+        # --- Save into transaction_log_file with UTC time ---
+        with open(transaction_log_file, "a") as f:
+            f.write(f"{utc_date} - {event_type} - {json.dumps(message_data)}\n")
 
 
+@timed("email")
 def send_email(to_email: str, subject: str, html_content: str) -> bool:
     # print(f"{to_email} | Following Message Sent By Customer:\n{html_content}")
     """Send email via SendGrid SMTP"""
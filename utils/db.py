@@ -0,0 +1,130 @@
+# Shared SQLAlchemy engines.
+# One pooled engine per database URL for the whole process, SQL echo off
+# unless DB_ECHO=true, and pool statistics for monitoring.
+
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine
+
+from config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_READ_URL,
+    DATABASE_URL,
+    DB_ECHO,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+
+_lock = threading.Lock()
+_engines: Dict[str, Any] = {}
+_async_engine = None
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def recreate(self):
+        # Keep counters across pool resets (e.g. after a disconnect)
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.wait_seconds_total = self.wait_seconds_total
+        pool.wait_seconds_max = self.wait_seconds_max
+        pool.timeouts = self.timeouts
+        return pool
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _engine_for(url: str, name: str):
+    with _lock:
+        if name not in _engines:
+            _engines[name] = create_engine(
+                url, echo=DB_ECHO, poolclass=TimedQueuePool, **_pool_kwargs()
+            )
+        return _engines[name]
+
+
+def get_engine():
+    """Primary (read/write) engine"""
+    return _engine_for(DATABASE_URL, "primary")
+
+
+def get_read_engine():
+    """Read-replica engine for reporting queries; the primary if none is set"""
+    if not DATABASE_READ_URL:
+        return get_engine()
+    return _engine_for(DATABASE_READ_URL, "replica")
+
+
+def get_async_engine():
+    """asyncio engine (aiomysql) with the same pool settings"""
+    global _async_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    with _lock:
+        if _async_engine is None:
+            url = ASYNC_DATABASE_URL or make_url(DATABASE_URL).set(
+                drivername="mysql+aiomysql"
+            )
+            _async_engine = create_async_engine(url, echo=DB_ECHO, **_pool_kwargs())
+        return _async_engine
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Pool usage per engine: size, checked out, overflow, checkouts, waits"""
+    stats = {}
+    engines = dict(_engines)
+    if _async_engine is not None:
+        engines["async"] = _async_engine.sync_engine
+    for name, engine in engines.items():
+        pool = engine.pool
+        entry = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checked_in": pool.checkedin(),
+        }
+        if isinstance(pool, TimedQueuePool):
+            entry.update(
+                checkouts=pool.checkouts,
+                timeouts=pool.timeouts,
+                wait_seconds_total=round(pool.wait_seconds_total, 6),
+                wait_seconds_max=round(pool.wait_seconds_max, 6),
+            )
+        stats[name] = entry
+    return stats
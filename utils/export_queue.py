@@ -0,0 +1,177 @@
+# Coverage export jobs on their own RabbitMQ queue.
+# The redemption consumer publishes a small job; export_worker.py runs
+# export_to_email for it with its own concurrency, priority and retries.
+# A failed job waits in a delay queue (one per backoff step) and is
+# dead-lettered back onto the export queue.
+
+import json
+import threading
+from typing import Any, List, Optional, Tuple
+
+import pika
+
+from config import (
+    EXPORT_DEFAULT_PRIORITY,
+    EXPORT_MAX_ATTEMPTS,
+    EXPORT_MODE,
+    EXPORT_RETRY_DELAY,
+    RABBITMQ_HOST,
+    RABBITMQ_PASSWORD,
+    RABBITMQ_PORT,
+    RABBITMQ_USERNAME,
+    RABBITMQ_VHOST,
+)
+from utils.action.db_query_call import export_to_email
+from utils.metrics import timed
+from utils.retry_queue import retry_queue_name
+
+EXPORT_QUEUE = "coverage_export_queue"
+EXPORT_ROUTING_KEY = "coverage.export"
+EXPORT_MAX_PRIORITY = 10
+ATTEMPT_HEADER = "x-export-attempt"
+
+# Only what export_to_email reads from the contract
+JOB_CONTRACT_FIELDS = ("VIN", "CustomerLName", "ContPersonEmail", "DealerID")
+
+
+def declare_export_queue(channel):
+    channel.exchange_declare(
+        exchange="dealership_exchange", exchange_type="direct", durable=True
+    )
+    channel.queue_declare(
+        queue=EXPORT_QUEUE,
+        durable=True,
+        arguments={"x-max-priority": EXPORT_MAX_PRIORITY},
+    )
+    channel.queue_bind(
+        exchange="dealership_exchange",
+        queue=EXPORT_QUEUE,
+        routing_key=EXPORT_ROUTING_KEY,
+    )
+
+
+def export_retry_delay(attempt: int) -> float:
+    """Backoff (seconds) before retry number attempt + 1"""
+    return EXPORT_RETRY_DELAY * (2**attempt)
+
+
+def export_retry_queues() -> List[Tuple[str, dict]]:
+    """(name, arguments) of the delay queue for every retry"""
+    arguments = {
+        "x-dead-letter-exchange": "dealership_exchange",
+        "x-dead-letter-routing-key": EXPORT_ROUTING_KEY,
+    }
+    names = dict.fromkeys(
+        retry_queue_name(EXPORT_QUEUE, export_retry_delay(attempt))
+        for attempt in range(max(0, EXPORT_MAX_ATTEMPTS - 1))
+    )
+    return [(name, arguments) for name in names]
+
+
+def declare_export_retry_queues(channel):
+    for name, arguments in export_retry_queues():
+        channel.queue_declare(queue=name, durable=True, arguments=arguments)
+
+
+def build_export_job(
+    contractDetails: dict,
+    ID: Any,
+    CoverageName: int = 1,
+    export_format: Optional[str] = None,
+) -> dict:
+    return {
+        "contract": {k: contractDetails.get(k) for k in JOB_CONTRACT_FIELDS},
+        "ID": ID,
+        "CoverageName": CoverageName,
+        "ExportFormat": export_format,
+    }
+
+
+def export_properties(priority: Optional[int] = None, attempt: int = 0):
+    if priority is None:
+        priority = EXPORT_DEFAULT_PRIORITY
+    return pika.BasicProperties(
+        delivery_mode=2,  # Make message persistent
+        content_type="application/json",
+        priority=max(0, min(EXPORT_MAX_PRIORITY, int(priority))),
+        headers={ATTEMPT_HEADER: attempt},
+    )
+
+
+class ExportJobPublisher:
+    """Publishes export jobs on a dedicated connection.
+
+    pika connections are not thread-safe, so publishes from the fan-out
+    threads are serialised with a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connection = None
+        self._channel = None
+
+    def _connect(self):
+        credentials = pika.PlainCredentials(RABBITMQ_USERNAME, RABBITMQ_PASSWORD)
+        parameters = pika.ConnectionParameters(
+            host=RABBITMQ_HOST,
+            port=int(RABBITMQ_PORT),
+            virtual_host=RABBITMQ_VHOST,
+            credentials=credentials,
+            heartbeat=600,
+            blocked_connection_timeout=300,
+        )
+        self._connection = pika.BlockingConnection(parameters)
+        self._channel = self._connection.channel()
+        declare_export_queue(self._channel)
+
+    def publish(self, job: dict, priority: Optional[int] = None):
+        body = json.dumps(job, default=str)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._connection is None or self._connection.is_closed:
+                        self._connect()
+                    self._channel.basic_publish(
+                        exchange="dealership_exchange",
+                        routing_key=EXPORT_ROUTING_KEY,
+                        body=body,
+                        properties=export_properties(priority),
+                    )
+                    return
+                except pika.exceptions.AMQPError:
+                    # Stale connection (e.g. missed heartbeats): reconnect once
+                    self._connection = None
+                    if attempt:
+                        raise
+
+    def close(self):
+        with self._lock:
+            if self._connection and not self._connection.is_closed:
+                self._connection.close()
+            self._connection = None
+
+
+_publisher = ExportJobPublisher()
+
+
+@timed("export")
+def submit_export(
+    contractDetails: dict,
+    ID: Any,
+    CoverageName: int = 1,
+    export_format: Optional[str] = None,
+    priority: Optional[int] = None,
+):
+    """Run the export inline or hand it to the export queue (EXPORT_MODE)"""
+    if EXPORT_MODE != "queue":
+        return export_to_email(
+            contractDetails, ID, CoverageName, export_format=export_format
+        )
+
+    if not contractDetails.get("ContPersonEmail"):
+        print("No pending email exports.")
+        return None
+
+    job = build_export_job(contractDetails, ID, CoverageName, export_format)
+    _publisher.publish(job, priority)
+    return {"queued": EXPORT_QUEUE}
@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+import time
+from typing import Any, Iterable, List, Set
+
+from config import IDEMPOTENCY_RETENTION_SECONDS
+
+# Expired keys are purged at most this often (seconds)
+PURGE_INTERVAL = 3600
+
+
+class IdempotencyStore:
+    """Local SQLite index of redemptions that were already submitted.
+
+    Keys are (ContractID, sorted CouponIDs, ID). ``begin`` also tracks keys
+    currently being processed, so two deliveries of the same redemption
+    handled by different workers don't both go through. The partner calls
+    that succeeded for a key are recorded too (``finish(..., calls)``), so a
+    redelivery of a partly failed redemption only repeats the failed calls,
+    whatever its x-redemption-done header says.
+    """
+
+    def __init__(
+        self, path: str, retention_seconds: float = IDEMPOTENCY_RETENTION_SECONDS
+    ):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._in_flight: Set[str] = set()
+        self._last_purge = 0.0
+
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " key TEXT PRIMARY KEY,"
+            " processed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS processed_at_idx ON processed (processed_at)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            " key TEXT NOT NULL,"
+            " call TEXT NOT NULL,"
+            " processed_at REAL NOT NULL,"
+            " PRIMARY KEY (key, call))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS calls_processed_at_idx ON calls (processed_at)"
+        )
+
+    @staticmethod
+    def key_for(contract_id: Any, coupon_ids: Any, ID: Any) -> str:
+        if coupon_ids is None:
+            coupon_ids = []
+        elif isinstance(coupon_ids, (str, int)):
+            coupon_ids = [coupon_ids]
+        coupons = ",".join(sorted(str(c) for c in coupon_ids))
+        return f"{contract_id}|{coupons}|{ID}"
+
+    def _seen(self, key: str) -> bool:
+        # Callers hold _lock
+        cutoff = time.time() - self.retention_seconds
+        row = self._conn.execute(
+            "SELECT 1 FROM processed WHERE key = ? AND processed_at >= ?",
+            (key, cutoff),
+        ).fetchone()
+        return row is not None
+
+    def seen(self, key: str) -> bool:
+        with self._lock:
+            return self._seen(key)
+
+    def begin(self, key: str) -> bool:
+        """Claim a key; False if it was already processed or is in flight"""
+        # One lock hold: finish() records the key and releases the claim
+        # under the same lock, so a second worker sees one or the other
+        with self._lock:
+            if key in self._in_flight or self._seen(key):
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def done_calls(self, key: str) -> List[str]:
+        """Partner calls that already succeeded for key"""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT call FROM calls WHERE key = ? AND processed_at >= ?",
+                (key, cutoff),
+            ).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def finish(self, key: str, success: bool, calls: Iterable[str] = ()):
+        """Release a claimed key, recording it when processing succeeded and
+        the partner calls that succeeded either way"""
+        now = time.time()
+        calls = list(calls)
+        with self._lock:
+            try:
+                if calls:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO calls (key, call, processed_at)"
+                        " VALUES (?, ?, ?)",
+                        [(key, call, now) for call in calls],
+                    )
+                if success:
+                    self._insert(key, now)
+            finally:
+                # A failed insert must not leave the key claimed forever
+                self._in_flight.discard(key)
+        if success and now - self._last_purge > PURGE_INTERVAL:
+            self.purge()
+
+    def _insert(self, key: str, now: float):
+        # Callers hold _lock
+        self._conn.execute(
+            "INSERT OR REPLACE INTO processed (key, processed_at) VALUES (?, ?)",
+            (key, now),
+        )
+
+    def mark(self, key: str):
+        now = time.time()
+        with self._lock:
+            self._insert(key, now)
+        if now - self._last_purge > PURGE_INTERVAL:
+            self.purge()
+
+    def purge(self) -> int:
+        """Drop keys older than the retention window"""
+        now = time.time()
+        with self._lock:
+            self._last_purge = now
+            cutoff = now - self.retention_seconds
+            self._conn.execute("DELETE FROM calls WHERE processed_at < ?", (cutoff,))
+            cursor = self._conn.execute(
+                "DELETE FROM processed WHERE processed_at < ?", (cutoff,)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
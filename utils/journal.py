@@ -0,0 +1,155 @@
+"""
+Append-only, line-delimited journal for processed messages.
+
+The active segment is ``<path>`` (one JSON object per line); once it grows
+past JOURNAL_SEGMENT_MAX_BYTES it is renamed to ``<path>.<UTC timestamp>``
+and a fresh segment is started.
+
+Reader / compaction tool:
+
+    python -m utils.journal export processed_messages.jsonl processed_messages.json
+    python -m utils.journal compact processed_messages.jsonl
+
+``export`` writes the old ``processed_messages.json`` array view (optionally
+prefixed with a legacy array file via ``--legacy``); ``compact`` merges the
+rotated segments into a single one.
+"""
+
+import argparse
+from datetime import datetime, timezone
+import glob
+import json
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import JOURNAL_SEGMENT_MAX_BYTES
+
+
+def append_record(
+    journal_path: str,
+    record: Dict[str, Any],
+    max_bytes: int = JOURNAL_SEGMENT_MAX_BYTES,
+):
+    """Append one record; callers serialise concurrent writers"""
+    line = json.dumps(record, default=str) + "\n"
+    with open(journal_path, "a") as f:
+        f.write(line)
+        size = f.tell()
+
+    if max_bytes and size >= max_bytes:
+        rotate(journal_path)
+
+
+def rotate(journal_path: str) -> Optional[str]:
+    if not os.path.exists(journal_path):
+        return None
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    rotated = f"{journal_path}.{stamp}"
+    os.replace(journal_path, rotated)
+    return rotated
+
+
+COMPACT_SUFFIX = ".compact"
+
+
+def segments(journal_path: str) -> List[str]:
+    """Rotated segments oldest first, then the active one"""
+    rotated = sorted(
+        path
+        for path in glob.glob(glob.escape(journal_path) + ".*")
+        if not path.endswith(COMPACT_SUFFIX)  # leftover of an interrupted compact
+    )
+    active = [journal_path] if os.path.exists(journal_path) else []
+    return rotated + active
+
+
+def _iter_segment(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from a crash; skip it
+                continue
+
+
+def iter_records(
+    journal_path: str, legacy_file: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    if legacy_file and os.path.exists(legacy_file):
+        with open(legacy_file, "r") as f:
+            try:
+                yield from json.load(f)
+            except json.JSONDecodeError:
+                pass
+
+    for path in segments(journal_path):
+        yield from _iter_segment(path)
+
+
+def export_json_array(
+    journal_path: str, output_path: str, legacy_file: Optional[str] = None
+) -> int:
+    """Write the journal as a JSON array, one record at a time"""
+    count = 0
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as out:
+        out.write("[")
+        for record in iter_records(journal_path, legacy_file):
+            out.write(",\n  " if count else "\n  ")
+            out.write(json.dumps(record, default=str))
+            count += 1
+        out.write("\n]\n" if count else "]\n")
+    os.replace(tmp_path, output_path)
+    return count
+
+
+def compact(journal_path: str) -> Optional[str]:
+    """
+    Merge all rotated segments into the newest one; the active segment is
+    untouched. The merged file replaces the newest segment before the older
+    ones are removed, so a crash part-way can repeat records but never lose
+    them.
+    """
+    rotated = [p for p in segments(journal_path) if p != journal_path]
+    if len(rotated) < 2:
+        return rotated[0] if rotated else None
+
+    target = rotated[-1]
+    tmp_path = target + COMPACT_SUFFIX
+    with open(tmp_path, "w") as out:
+        for path in rotated:
+            for record in _iter_segment(path):
+                out.write(json.dumps(record, default=str) + "\n")
+    os.replace(tmp_path, target)
+    for path in rotated[:-1]:
+        os.remove(path)
+    return target
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="processed messages journal")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="write the JSON array view")
+    export_cmd.add_argument("journal")
+    export_cmd.add_argument("output")
+    export_cmd.add_argument("--legacy", help="old processed_messages.json to prepend")
+
+    compact_cmd = sub.add_parser("compact", help="merge rotated segments")
+    compact_cmd.add_argument("journal")
+
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        count = export_json_array(args.journal, args.output, args.legacy)
+        print(f"✅ Wrote {count} records to {args.output}")
+    else:
+        target = compact(args.journal)
+        print(f"✅ Compacted into {target}" if target else "Nothing to compact")
+
+
+if __name__ == "__main__":
+    main()
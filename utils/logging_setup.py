@@ -0,0 +1,193 @@
+# Consumer logging.
+# Records go through a QueueHandler to a QueueListener thread that formats
+# them and writes the log file and stdout, so the processing threads (and the
+# asyncio loop) never wait on formatting or I/O. LOG_FORMAT=json writes one
+# JSON object per line, stamped with the current trace/span id.
+# Large payload dumps (message body, JWT claims, DB context, partner requests)
+# go through log_payload(): they are serialized on the writer thread and only
+# for a LOG_PAYLOAD_SAMPLE_RATE fraction of messages. Credentials (keys or
+# XML elements named like a password, secret, token or apikey) are masked.
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from config import LOG_ASYNC, LOG_FORMAT, LOG_LEVEL, LOG_PAYLOAD_SAMPLE_RATE
+from utils import tracing
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+payload_logger = logging.getLogger("payload")
+
+# Payload keys / XML elements whose values are never logged, matched without
+# case, "_" or "-" (api_key, API-Key and apiKey all match apikey)
+SECRET_NAMES = ("password", "secret", "token", "apikey")
+REDACTED = "***"
+_SECRET_ELEMENT = re.compile(
+    r"(<([\w.:-]*(?:%s)[\w.:-]*)>).*?(</\2>)"
+    % "|".join("[_-]?".join(name) for name in SECRET_NAMES),
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Per-message payload sampling decision (inherited by fan-out threads)
+_payloads_sampled: contextvars.ContextVar[Optional[bool]] = contextvars.ContextVar(
+    "payloads_sampled", default=None
+)
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured = False
+
+
+def _dump(payload: Any) -> str:
+    if isinstance(payload, bytes):
+        return payload.decode("utf-8", "replace")
+    if isinstance(payload, str):
+        return payload
+    return json.dumps(payload, indent=2, default=str)
+
+
+def _is_secret(key: Any) -> bool:
+    key = re.sub(r"[_-]", "", str(key).lower())
+    return any(name in key for name in SECRET_NAMES)
+
+
+def redact(payload: Any) -> Any:
+    """Copy of payload with credential values masked"""
+    if isinstance(payload, dict):
+        return {
+            key: REDACTED if _is_secret(key) and value else redact(value)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, (list, tuple)):
+        return [redact(value) for value in payload]
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8", "replace")
+    if isinstance(payload, str):
+        return _SECRET_ELEMENT.sub(rf"\1{REDACTED}\3", payload)
+    return payload
+
+
+class TextFormatter(logging.Formatter):
+    """The classic consumer.log line, with log_payload() dumps below it"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        if hasattr(record, "payload"):
+            line = f"{line}\n{_dump(record.payload)}"
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for field in ("trace_id", "span_id"):
+            if getattr(record, field, None):
+                entry[field] = getattr(record, field)
+        if hasattr(record, "payload"):
+            entry["payload"] = record.payload
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamp records with the caller's trace/span id (before the queue hop)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = tracing.current()
+        if span is not None and span.sampled:
+            record.trace_id = span.trace_id
+            record.span_id = span.span_id
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Merges args and renders the traceback, but leaves formatting to the
+    writer thread (so JSON lines keep exc_info apart from the message)"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(log_file: str):
+    """Root logging for the consumer processes (once per process)"""
+    global _listener, _configured
+    if _configured:
+        return
+    _configured = True
+
+    formatter = JSONFormatter() if LOG_FORMAT == "json" else TextFormatter(TEXT_FORMAT)
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler(sys.stdout)]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if not LOG_ASYNC:
+        for handler in handlers:
+            handler.addFilter(TraceContextFilter())
+            root.addHandler(handler)
+        return
+
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = _QueueHandler(records)
+    queue_handler.addFilter(TraceContextFilter())
+    root.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(
+        records, *handlers, respect_handler_level=True
+    )
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def sample_payloads() -> bool:
+    """Decide whether this message's payloads are logged; call once per message"""
+    sampled = LOG_PAYLOAD_SAMPLE_RATE >= 1 or random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    _payloads_sampled.set(sampled)
+    return sampled
+
+
+def log_payload(title: str, payload: Any, level: int = logging.INFO):
+    """Log a large structure; serialized later, on the writer thread"""
+    if not payload_logger.isEnabledFor(level):
+        return
+    sampled = _payloads_sampled.get()
+    if sampled is None:
+        sampled = random.random() < LOG_PAYLOAD_SAMPLE_RATE
+    if not sampled:
+        return
+    # Also a copy: the caller may keep adding keys while it waits in the queue
+    payload_logger.log(level, title, extra={"payload": redact(payload)})
@@ -0,0 +1,286 @@
+# Prometheus-style metrics for the consumer processes.
+# A minimal in-process registry (counters, gauges, histograms with labels)
+# served in the Prometheus text format on METRICS_PORT. Recording is a lock
+# and a couple of additions, so it is cheap enough for every message.
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import METRICS_PORT
+from utils import tracing
+
+# Seconds; partner calls and exports run up to a minute
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = Tuple[str, ...]
+
+_metrics: List["Metric"] = []
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def lines(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.kind}",
+        ] + self.lines()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Gauge(Metric):
+    """Set directly, or computed at scrape time by a callback"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception as e:
+                print(f"⚠️ Metric {self.name} callback failed: {e}")
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [per-bucket counts (last one is +Inf), sum, count]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            values = {key: (list(e[0]), e[1], e[2]) for key, e in self._values.items()}
+        lines = []
+        label_names = self.labels + ("le",)
+        for key, (counts, total, count) in values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(label_names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in list(_metrics):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# =============================
+# Consumer metrics
+# =============================
+MESSAGES = Counter(
+    "redemption_messages_total",
+    "Deliveries by outcome (consumed, acked, nacked, retried, parked)",
+    ("queue", "event"),
+)
+JWT_FAILURES = Counter(
+    "redemption_jwt_failures_total", "Rejected message tokens", ("reason",)
+)
+STAGE_SECONDS = Histogram(
+    "redemption_stage_seconds", "Time spent per processing stage", ("stage",)
+)
+PARTNER_RESPONSES = Counter(
+    "partner_http_responses_total",
+    "Partner HTTP responses by status code (error = no response)",
+    ("host", "code"),
+)
+QUEUE_DEPTH = Gauge(
+    "rabbitmq_queue_messages", "Ready messages per queue (polled)", ("queue",)
+)
+
+
+def _db_pool_values() -> Dict[LabelValues, float]:
+    from utils.db import pool_stats
+
+    values = {}
+    for engine, stats in pool_stats().items():
+        for field in ("size", "checked_out", "overflow", "checked_in"):
+            values[(engine, field)] = stats[field]
+    return values
+
+
+DB_POOL = Gauge(
+    "db_pool_connections",
+    "SQLAlchemy pool usage per engine",
+    ("engine", "state"),
+    callback=_db_pool_values,
+)
+
+
+@contextmanager
+def stage(name: str, **attributes):
+    """Time a block into redemption_stage_seconds{stage=name} and a trace span"""
+    started = time.perf_counter()
+    try:
+        with tracing.span(name, **attributes):
+            yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=name)
+
+
+def timed(name: str):
+    """Decorator form of stage() for plain and async functions"""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+# =============================
+# HTTP endpoint
+# =============================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes would flood consumer.log
+
+
+def start_server(port: int = METRICS_PORT) -> bool:
+    """Serve /metrics on a daemon thread (once per process); False if off"""
+    global _server
+    if not port:
+        return False
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError as e:
+                print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+                return False
+            _server.daemon_threads = True
+            threading.Thread(
+                target=_server.serve_forever, name="metrics", daemon=True
+            ).start()
+            print(f"📈 Metrics on http://0.0.0.0:{port}/metrics")
+    return True
@@ -0,0 +1,273 @@
+"""
+Normalized last-name columns for index-friendly coverage searches.
+
+Coverage filters match ``LOWER(TRIM(<last name>)) = LOWER(TRIM(:LastName))``,
+which no index can serve. For every searched name column this adds an
+invisible ``<column>_norm`` column holding ``LOWER(TRIM(<column>))``, kept
+current by insert/update triggers, and an index on it. The norm column gets
+the source column's type (read from information_schema), so a long name can
+never make the trigger fail an insert with "Data too long":
+
+    python -m utils.name_search migrate            # print the DDL
+    python -m utils.name_search migrate --apply    # run it
+    python -m utils.name_search backfill           # fill existing rows
+    python -m utils.name_search index --apply      # create the indexes
+    python -m utils.name_search status
+
+The columns are plain INVISIBLE columns (MySQL 8.0.23+) rather than
+generated ones: they are added instantly, ``SELECT *`` exports and the
+positional FTP bulk loads do not see them, and the backfill runs in small
+committed batches instead of one table rebuild.
+
+With NORMALIZED_NAME_SEARCH=auto (default) ftp_coverages uses a normalized
+column only once its index exists, so run ``index`` after ``backfill``.
+``on`` forces the normalized predicates, ``off`` never uses them.
+"""
+
+import argparse
+import threading
+import time
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+from config import NAME_BACKFILL_BATCH, NORMALIZED_NAME_SEARCH
+
+NameColumn = Tuple[str, str]  # (table, column), table may be schema-qualified
+
+_available: Optional[Set[NameColumn]] = None
+_lock = threading.Lock()
+
+
+def norm_column(column: str) -> str:
+    return f"{column}_norm"
+
+
+def _split(table: str) -> Tuple[Optional[str], str]:
+    schema, _, name = table.rpartition(".")
+    return (schema or None), name
+
+
+def _trigger_name(table: str, column: str, event: str) -> str:
+    return f"{_split(table)[1]}_{norm_column(column)}_{event}"[:64]
+
+
+def _index_name(column: str) -> str:
+    return f"idx_{norm_column(column)}"
+
+
+_COLUMN_TYPE_SQL = """
+SELECT COLUMN_TYPE, CHARACTER_SET_NAME, COLLATION_NAME
+FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = COALESCE(:schema, DATABASE())
+  AND TABLE_NAME = :table AND COLUMN_NAME = :column
+"""
+
+
+def column_type(conn, table: str, column: str) -> str:
+    """The source column's type (with charset/collation), for its norm column"""
+    schema, name = _split(table)
+    row = conn.execute(
+        text(_COLUMN_TYPE_SQL), {"schema": schema, "table": name, "column": column}
+    ).first()
+    if row is None:
+        raise ValueError(f"{table}.{column} does not exist")
+    sql_type, charset, collation = row
+    if charset:
+        sql_type += f" CHARACTER SET {charset}"
+    if collation:
+        sql_type += f" COLLATE {collation}"
+    return sql_type
+
+
+def migration_sql(table: str, column: str, sql_type: str) -> List[str]:
+    """
+    Column plus triggers; safe to run while the table is in use. sql_type is
+    the source column's type (column_type()), so the trigger never truncates.
+    """
+    norm = norm_column(column)
+    statements = [
+        f"ALTER TABLE {table} ADD COLUMN {norm} {sql_type} NULL INVISIBLE, "
+        "ALGORITHM=INSTANT"
+    ]
+    for event, when in (("bi", "INSERT"), ("bu", "UPDATE")):
+        schema, _ = _split(table)
+        trigger = _trigger_name(table, column, event)
+        if schema:
+            trigger = f"{schema}.{trigger}"
+        statements.append(
+            f"CREATE TRIGGER {trigger} BEFORE {when} ON {table} "
+            f"FOR EACH ROW SET NEW.{norm} = LOWER(TRIM(NEW.{column}))"
+        )
+    return statements
+
+
+def index_sql(table: str, column: str) -> str:
+    return (
+        f"CREATE INDEX {_index_name(column)} ON {table} ({norm_column(column)}) "
+        "ALGORITHM=INPLACE LOCK=NONE"
+    )
+
+
+def _primary_key(conn, table: str) -> Optional[str]:
+    keys = conn.execute(text(f"SHOW KEYS FROM {table} WHERE Key_name = 'PRIMARY'"))
+    columns = [row._mapping["Column_name"] for row in keys]
+    return columns[0] if len(columns) == 1 else None
+
+
+def backfill(
+    engine,
+    table: str,
+    column: str,
+    batch_size: int = NAME_BACKFILL_BATCH,
+    pause: float = 0.0,
+) -> int:
+    """
+    Fill <column>_norm for existing rows, committing every batch_size rows.
+    Walks a single-column integer primary key when there is one, otherwise
+    repeats a LIMITed update until nothing is left. Returns rows updated.
+    """
+    norm = norm_column(column)
+    assign = f"UPDATE {table} SET {norm} = LOWER(TRIM({column}))"
+    pending = f"{norm} IS NULL AND {column} IS NOT NULL"
+    updated = 0
+
+    with engine.connect() as conn:
+        pk = _primary_key(conn, table)
+        bounds = None
+        if pk:
+            bounds = conn.execute(text(f"SELECT MIN({pk}), MAX({pk}) FROM {table}"))
+            bounds = bounds.first()
+        conn.rollback()
+
+        if bounds and isinstance(bounds[0], int):
+            low, high = bounds
+            while low <= high:
+                result = conn.execute(
+                    text(f"{assign} WHERE {pk} >= :low AND {pk} < :high AND {pending}"),
+                    {"low": low, "high": low + batch_size},
+                )
+                conn.commit()
+                updated += result.rowcount
+                low += batch_size
+                if pause:
+                    time.sleep(pause)
+        else:
+            while True:
+                result = conn.execute(
+                    text(f"{assign} WHERE {pending} LIMIT :batch"),
+                    {"batch": batch_size},
+                )
+                conn.commit()
+                updated += result.rowcount
+                if result.rowcount < batch_size:
+                    break
+                if pause:
+                    time.sleep(pause)
+    return updated
+
+
+def indexed_columns(engine, targets: Iterable[NameColumn]) -> Set[NameColumn]:
+    """Targets whose <column>_norm column is the leading column of an index"""
+    targets = list(targets)
+    if not targets:
+        return set()
+    clauses, params = [], {}
+    for i, (table, column) in enumerate(targets):
+        schema, name = _split(table)
+        clauses.append(
+            f"(TABLE_SCHEMA = COALESCE(:s{i}, DATABASE())"
+            f" AND TABLE_NAME = :t{i} AND COLUMN_NAME = :c{i})"
+        )
+        params.update({f"s{i}": schema, f"t{i}": name, f"c{i}": norm_column(column)})
+    sql = f"""
+    SELECT DISTINCT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME
+    FROM information_schema.STATISTICS
+    WHERE SEQ_IN_INDEX = 1 AND ({' OR '.join(clauses)})
+    """
+    with engine.connect() as conn:
+        found = {(r[1], r[2]) for r in conn.execute(text(sql), params)}
+    return {
+        (table, column)
+        for table, column in targets
+        if (_split(table)[1], norm_column(column)) in found
+    }
+
+
+def available(engine, table: str, column: str, targets: Iterable[NameColumn]) -> bool:
+    """Whether queries may use <column>_norm (see NORMALIZED_NAME_SEARCH)"""
+    global _available
+    if NORMALIZED_NAME_SEARCH == "on":
+        return True
+    if NORMALIZED_NAME_SEARCH != "auto":
+        return False
+    if _available is None:
+        with _lock:
+            if _available is None:
+                try:
+                    _available = indexed_columns(engine, targets)
+                except Exception as e:
+                    print(f"⚠️ Normalized name detection failed, not using it: {e}")
+                    _available = set()
+                if _available:
+                    print(f"✅ Normalized name search on: {sorted(_available)}")
+    return (table, column) in _available
+
+
+def refresh():
+    """Re-detect normalized columns on next use (e.g. after running index)"""
+    global _available
+    with _lock:
+        _available = None
+
+
+def main(argv: Optional[List[str]] = None):
+    # Lazy: ftp_coverages owns the list of searched name columns
+    from utils.action.ftp_coverages import NAME_SEARCH_COLUMNS
+    from utils.db import get_engine
+
+    parser = argparse.ArgumentParser(description="normalized last-name columns")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("migrate", "add the columns and triggers"),
+        ("index", "create the indexes (after backfill)"),
+    ):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--apply", action="store_true", help="run instead of print")
+    backfill_cmd = sub.add_parser("backfill", help="fill existing rows in batches")
+    backfill_cmd.add_argument("--batch-size", type=int, default=NAME_BACKFILL_BATCH)
+    backfill_cmd.add_argument("--pause", type=float, default=0.0)
+    sub.add_parser("status", help="show which columns are indexed")
+    args = parser.parse_args(argv)
+
+    engine = get_engine()
+    if args.command in ("migrate", "index"):
+        statements = []
+        with engine.connect() as conn:
+            for table, column in NAME_SEARCH_COLUMNS:
+                if args.command == "migrate":
+                    sql_type = column_type(conn, table, column)
+                    statements.extend(migration_sql(table, column, sql_type))
+                else:
+                    statements.append(index_sql(table, column))
+        if not args.apply:
+            print(";\n".join(statements) + ";")
+            return
+        with engine.connect() as conn:
+            for statement in statements:
+                print(f"▶️ {statement}")
+                conn.execute(text(statement))
+                conn.commit()
+    elif args.command == "backfill":
+        for table, column in NAME_SEARCH_COLUMNS:
+            count = backfill(engine, table, column, args.batch_size, args.pause)
+            print(f"✅ {table}.{norm_column(column)}: {count} rows backfilled")
+    else:
+        ready = indexed_columns(engine, NAME_SEARCH_COLUMNS)
+        for target in NAME_SEARCH_COLUMNS:
+            state = "indexed" if target in ready else "not indexed"
+            print(f"{target[0]}.{norm_column(target[1])}: {state}")
+
+
+if __name__ == "__main__":
+    main()
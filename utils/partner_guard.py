@@ -0,0 +1,201 @@
+# Load shedding for the partner APIs.
+# Each partner call (AUTTO, SOAP) passes a circuit breaker, which stops
+# calling a partner whose recent calls mostly fail or crawl, and an AIMD
+# concurrency limit, which shrinks when the partner slows down and grows back
+# while it is healthy. A rejected call is not made: it is reported as "shed"
+# (circuit open) or "throttled" (at the limit) and goes down the retry path
+# instead of waiting on the partner; throttled calls don't use up an attempt.
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    PARTNER_BREAKER_FAILURE_RATE,
+    PARTNER_BREAKER_MIN_CALLS,
+    PARTNER_BREAKER_OPEN_SECONDS,
+    PARTNER_BREAKER_SLOW_RATE,
+    PARTNER_BREAKER_SLOW_SECONDS,
+    PARTNER_BREAKER_WINDOW,
+    PARTNER_LIMIT_BACKOFF,
+    PARTNER_LIMIT_INITIAL,
+    PARTNER_LIMIT_MAX,
+    PARTNER_LIMIT_MIN,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Fan-out call names that reach an external partner
+GUARDED_CALLS = ("autto", "soap")
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = PARTNER_BREAKER_WINDOW,
+        min_calls: int = PARTNER_BREAKER_MIN_CALLS,
+        failure_rate: float = PARTNER_BREAKER_FAILURE_RATE,
+        slow_seconds: float = PARTNER_BREAKER_SLOW_SECONDS,
+        slow_rate: float = PARTNER_BREAKER_SLOW_RATE,
+        open_seconds: float = PARTNER_BREAKER_OPEN_SECONDS,
+    ):
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self._calls = deque(maxlen=max(self.min_calls, window))  # (ok, slow)
+        self._probing = False
+        # Last state change; results of calls started before it are stale
+        self._since = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self._since = time.monotonic()
+                self._probing = False
+            if self.state == HALF_OPEN:
+                # One probe at a time decides whether the partner is back
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def cancel(self, allowed_at: float):
+        """A call allowed by allow() at allowed_at (monotonic) never ran"""
+        with self._lock:
+            if self.state == HALF_OPEN and allowed_at >= self._since:
+                self._probing = False
+
+    def record(self, ok: bool, seconds: float):
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            if self.state == OPEN or time.monotonic() - seconds < self._since:
+                # Started before the last state change (e.g. before the
+                # circuit opened): only the probe may settle HALF_OPEN
+                return
+            if self.state == HALF_OPEN:
+                if ok and not slow:
+                    self.state = CLOSED
+                    self._since = time.monotonic()
+                    self._calls.clear()
+                else:
+                    self._trip()
+                return
+
+            self._calls.append((ok, slow))
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failures = sum(1 for call_ok, _ in self._calls if not call_ok)
+            slows = sum(1 for _, call_slow in self._calls if call_slow)
+            if (
+                failures / total >= self.failure_rate
+                or slows / total >= self.slow_rate
+            ):
+                self._trip()
+
+    def _trip(self):
+        # Callers hold _lock
+        self.state = OPEN
+        self.opened_at = self._since = time.monotonic()
+        self.trips += 1
+        self._probing = False
+        self._calls.clear()
+
+
+class AIMDLimiter:
+    """Concurrency limit: additive increase, multiplicative decrease"""
+
+    def __init__(
+        self,
+        initial: int = PARTNER_LIMIT_INITIAL,
+        minimum: int = PARTNER_LIMIT_MIN,
+        maximum: int = PARTNER_LIMIT_MAX,
+        backoff: float = PARTNER_LIMIT_BACKOFF,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.backoff = backoff
+        self.limit = float(min(self.maximum, max(self.minimum, initial)))
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, ok: Optional[bool] = None):
+        """Free a slot; ok=None leaves the limit alone (call never ran)"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if ok is None:
+                return
+            if ok:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            else:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+
+
+class PartnerGuard:
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.limiter = AIMDLimiter()
+        self.shed_open = 0
+        self.shed_limit = 0
+
+    def acquire(self) -> Optional[Tuple[str, str]]:
+        """None if the call may go ahead, otherwise (status, reason)"""
+        if not self.limiter.try_acquire():
+            self.shed_limit += 1
+            return "throttled", f"{self.name} concurrency limit reached"
+        if not self.breaker.allow():
+            self.limiter.release()
+            self.shed_open += 1
+            return "shed", f"{self.name} circuit open"
+        return None
+
+    def release(self, ok: bool, seconds: float):
+        """A call finished after running for seconds"""
+        self.breaker.record(ok, seconds)
+        self.limiter.release(ok and seconds < self.breaker.slow_seconds)
+
+    def cancel(self, acquired_at: float):
+        """A call acquired at acquired_at (monotonic) never ran"""
+        self.breaker.cancel(acquired_at)
+        self.limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "trips": self.breaker.trips,
+            "limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "shed_open": self.shed_open,
+            "shed_limit": self.shed_limit,
+        }
+
+
+_guards = {name: PartnerGuard(name) for name in GUARDED_CALLS}
+
+
+def guard_for(name: str) -> Optional[PartnerGuard]:
+    return _guards.get(name)
+
+
+def guard_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: guard.stats() for name, guard in _guards.items()}
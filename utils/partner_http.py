@@ -0,0 +1,141 @@
+# Shared HTTP sessions for the partner APIs (AUTTO, SOAP).
+# One keep-alive connection pool per host for the whole process, default
+# connect/read timeouts, and per-host counters showing how often a request
+# had to open a new connection instead of reusing a pooled one.
+
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from config import PARTNER_CONNECT_TIMEOUT, PARTNER_POOL_MAXSIZE, PARTNER_READ_TIMEOUT
+from utils.metrics import PARTNER_RESPONSES
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_stats: Dict[str, "HostStats"] = {}
+
+
+@dataclass
+class HostStats:
+    requests: int = 0
+    connections: int = 0  # new TCP (+TLS) connections opened
+    errors: int = 0
+    seconds_total: float = 0.0
+    seconds_max: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        entry = asdict(self)
+        entry["reused"] = max(0, self.requests - self.connections)
+        entry["seconds_total"] = round(self.seconds_total, 6)
+        entry["seconds_max"] = round(self.seconds_max, 6)
+        return entry
+
+
+def default_timeout() -> Tuple[float, float]:
+    return (PARTNER_CONNECT_TIMEOUT, PARTNER_READ_TIMEOUT)
+
+
+def _host_stats(host: str) -> HostStats:
+    # Callers hold _lock
+    if host not in _stats:
+        _stats[host] = HostStats()
+    return _stats[host]
+
+
+def record_connection(host: str):
+    with _lock:
+        _host_stats(host).connections += 1
+
+
+def record_request(
+    host: str, seconds: float, failed: bool = False, status: Optional[int] = None
+):
+    PARTNER_RESPONSES.inc(host=host, code=status or "error")
+    with _lock:
+        entry = _host_stats(host)
+        entry.requests += 1
+        entry.errors += int(failed)
+        entry.seconds_total += seconds
+        entry.seconds_max = max(entry.seconds_max, seconds)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        record_connection(self.host)
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        record_connection(self.host)
+        return super()._new_conn()
+
+
+class PartnerAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout and per-host request counters"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = default_timeout()
+        started = time.perf_counter()
+        failed, status = True, None
+        try:
+            response = super().send(request, timeout=timeout, **kwargs)
+            status = response.status_code
+            failed = status >= 500
+            return response
+        finally:
+            host = urlsplit(request.url).hostname or ""
+            record_request(host, time.perf_counter() - started, failed, status)
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = PartnerAdapter(
+        pool_connections=1, pool_maxsize=max(1, PARTNER_POOL_MAXSIZE)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """The shared session for url's scheme and host"""
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _lock:
+        if key not in _sessions:
+            _sessions[key] = _new_session()
+        return _sessions[key]
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """requests.post over the pooled session for url's host"""
+    return get_session(url).post(url, **kwargs)
+
+
+def close_sessions():
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+
+def http_stats() -> Dict[str, Dict[str, Any]]:
+    """Per host: requests, new connections, reused, errors, time spent"""
+    with _lock:
+        return {host: entry.to_dict() for host, entry in _stats.items()}
@@ -0,0 +1,124 @@
+# Delayed retries for redemptions.
+# A failed delivery is republished (through the default exchange) to a delay
+# queue for its tier; the message expires after the tier's delay and is
+# dead-lettered back into dealership_exchange with the consumer's routing
+# key. After REDEMPTION_MAX_RETRIES it goes to the parking-lot queue instead,
+# where it stays until an operator shovels it back.
+
+import copy
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pika
+
+from config import REDEMPTION_MAX_RETRIES, REDEMPTION_RETRY_DELAYS
+
+ATTEMPT_HEADER = "x-redemption-attempt"
+# Partner calls that already succeeded, skipped on the next attempt
+DONE_HEADER = "x-redemption-done"
+REASON_HEADER = "x-retry-reason"
+
+# Call statuses (see fanout.CallResult) worth another attempt; "shed" and
+# "throttled" calls were never made because the partner's circuit was open
+# or at its concurrency limit
+RETRY_STATUSES = ("failed", "timeout", "error", "shed", "throttled")
+
+
+def retry_queue_name(queue: str, delay: float) -> str:
+    return f"{queue}.retry.{delay:g}s"
+
+
+def parking_queue_name(queue: str) -> str:
+    return f"{queue}.parking"
+
+
+def retry_queues(queue: str, routing_key: str) -> List[Tuple[str, Optional[dict]]]:
+    """(name, arguments) of every delay queue plus the parking lot"""
+    arguments = {
+        "x-dead-letter-exchange": "dealership_exchange",
+        "x-dead-letter-routing-key": routing_key,
+    }
+    queues = [
+        (retry_queue_name(queue, delay), arguments)
+        for delay in dict.fromkeys(REDEMPTION_RETRY_DELAYS)
+    ]
+    queues.append((parking_queue_name(queue), None))
+    return queues
+
+
+def declare_retry_queues(channel, queue: str, routing_key: str):
+    for name, arguments in retry_queues(queue, routing_key):
+        channel.queue_declare(queue=name, durable=True, arguments=arguments)
+
+
+def retry_target(queue: str, attempt: int) -> Tuple[str, Optional[float]]:
+    """Queue and delay for retry number attempt + 1; no delay means park it"""
+    if attempt >= REDEMPTION_MAX_RETRIES or not REDEMPTION_RETRY_DELAYS:
+        return parking_queue_name(queue), None
+    delay = REDEMPTION_RETRY_DELAYS[min(attempt, len(REDEMPTION_RETRY_DELAYS) - 1)]
+    return retry_queue_name(queue, delay), delay
+
+
+def attempt_of(headers: Optional[dict]) -> int:
+    return int((headers or {}).get(ATTEMPT_HEADER, 0))
+
+
+def done_of(headers: Optional[dict]) -> List[str]:
+    done = (headers or {}).get(DONE_HEADER) or ""
+    if isinstance(done, bytes):
+        done = done.decode()
+    return [name for name in done.split(",") if name]
+
+
+def retry_headers(
+    headers: Optional[dict],
+    attempt: int,
+    done: Iterable[str],
+    reason: Any,
+    counted: bool = True,
+) -> Dict[str, Any]:
+    headers = dict(headers or {})
+    headers[ATTEMPT_HEADER] = attempt + 1 if counted else attempt
+    headers[DONE_HEADER] = ",".join(sorted(set(done)))
+    headers[REASON_HEADER] = str(reason)[:255]
+    return headers
+
+
+def is_retryable(message_data: Optional[dict]) -> bool:
+    """Partner calls failed or timed out (no outcome = nothing to retry)"""
+    outcome = (message_data or {}).get("outcome") or {}
+    return any(status in RETRY_STATUSES for status in outcome.values())
+
+
+def counts_as_attempt(message_data: Optional[dict]) -> bool:
+    """False when the only calls to retry were throttled by our own limit"""
+    outcome = (message_data or {}).get("outcome") or {}
+    statuses = {status for status in outcome.values() if status in RETRY_STATUSES}
+    return statuses != {"throttled"}
+
+
+def completed_calls(message_data: Optional[dict]) -> List[str]:
+    outcome = (message_data or {}).get("outcome") or {}
+    return [name for name, status in outcome.items() if status in ("ok", "skipped")]
+
+
+def retry_reason(message_data: Optional[dict]) -> str:
+    outcome = (message_data or {}).get("outcome") or {}
+    return ", ".join(
+        f"{name}={status}"
+        for name, status in outcome.items()
+        if status in RETRY_STATUSES
+    )
+
+
+def retry_properties(
+    properties: Optional[pika.BasicProperties], headers: dict, delay: Optional[float]
+) -> pika.BasicProperties:
+    """The delivery's own properties (message_id, correlation_id, timestamp,
+    priority, ...) with the retry headers and the delay queue's expiration"""
+    retried = copy.copy(properties) if properties else pika.BasicProperties()
+    retried.delivery_mode = 2  # Make message persistent
+    retried.headers = headers
+    retried.expiration = None if delay is None else str(int(delay * 1000))
+    # The broker rejects a user_id other than the publishing connection's
+    retried.user_id = None
+    return retried
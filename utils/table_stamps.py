@@ -0,0 +1,55 @@
+"""
+Cross-process "table reloaded" markers.
+
+Whoever reloads a provider table (the FTP import jobs) touches its stamp
+file; coverage result caches in every process key their entries by the
+stamps of the tables they read, so a reload turns all older entries into
+misses without any messaging:
+
+    python -m utils.table_stamps mypcp_roadvant.tbl_tws mypcp_roadvant.tbl_roadvant
+"""
+
+import argparse
+import os
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from config import COVERAGE_STAMP_DIR
+
+
+def _stamp_path(table: str) -> str:
+    return os.path.join(COVERAGE_STAMP_DIR, table)
+
+
+def touch(table: str):
+    os.makedirs(COVERAGE_STAMP_DIR, exist_ok=True)
+    path = _stamp_path(table)
+    with open(path, "a"):
+        pass
+    now = time.time()
+    os.utime(path, (now, now))
+
+
+def stamp(table: str) -> float:
+    """Last reload time of table (0.0 when it was never stamped)"""
+    try:
+        return os.stat(_stamp_path(table)).st_mtime
+    except OSError:
+        return 0.0
+
+
+def stamps(tables: Iterable[str]) -> Tuple[float, ...]:
+    return tuple(stamp(table) for table in tables)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="mark tables as reloaded")
+    parser.add_argument("tables", nargs="+", help="e.g. mypcp_roadvant.tbl_tws")
+    args = parser.parse_args(argv)
+    for table in args.tables:
+        touch(table)
+        print(f"✅ Stamped {table}")
+
+
+if __name__ == "__main__":
+    main()
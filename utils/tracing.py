@@ -0,0 +1,382 @@
+"""
+Per-message tracing spans.
+
+Every redemption gets a trace: the root span covers the whole message and
+child spans cover each stage (decode, JWT, DB context, AUTTO, export, SOAP,
+save, ack). ``metrics.stage()`` opens a span, so every timed stage is traced.
+The current span lives in a context variable: asyncio tasks inherit it, and
+thread pools get it through ``bind()``.
+
+Finished spans are queued and written by a background thread, either as JSON
+lines (TRACE_EXPORTER=file) or as OTLP/HTTP JSON (TRACE_EXPORTER=otlp). For
+local work there is a collector stub that accepts OTLP/HTTP JSON and writes
+the same JSON lines, plus a per-stage latency summary:
+
+    python -m utils.tracing collect --port 4318 --out spans.jsonl
+    python -m utils.tracing stages spans.jsonl
+"""
+
+import argparse
+import atexit
+import contextvars
+import functools
+import json
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from config import (
+    TRACE_EXPORTER,
+    TRACE_FILE,
+    TRACE_OTLP_ENDPOINT,
+    TRACE_SAMPLE_RATE,
+    TRACE_SERVICE_NAME,
+)
+
+ENABLED = TRACE_EXPORTER in ("file", "otlp")
+
+# Spans waiting for the exporter thread; beyond this they are dropped
+QUEUE_SIZE = 10000
+BATCH_SIZE = 512
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+        "sampled",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+        sampled: bool = True,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+        self.sampled = sampled
+
+    def set(self, **attributes):
+        if self.sampled:
+            self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+# Stands in for every span of a trace that was not sampled
+_UNSAMPLED = Span("unsampled", "0" * 32, sampled=False)
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child of the current span, or the root of a new trace"""
+    if not ENABLED:
+        yield None
+        return
+
+    parent = _current.get()
+    if parent is None:
+        if random.random() >= TRACE_SAMPLE_RATE:
+            current = _UNSAMPLED
+        else:
+            current = Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+    elif not parent.sampled:
+        current = _UNSAMPLED
+    else:
+        current = Span(name, parent.trace_id, parent.span_id, attributes)
+
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        if current.sampled:
+            current.end_ns = time.time_ns()
+            _exporter.submit(current)
+
+
+def annotate(**attributes):
+    """Add attributes (ContractID, DealerID, ...) to the current span"""
+    if ENABLED:
+        current = _current.get()
+        if current is not None:
+            current.set(**attributes)
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def bind(fn: Callable) -> Callable:
+    """fn running in the caller's context (trace, log sampling), e.g. on a pool"""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+# =============================
+# Exporters
+# =============================
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    entry = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)}
+            for key, value in span.attributes.items()
+            if value is not None
+        ],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        entry["parentSpanId"] = span.parent_id
+    return entry
+
+
+def otlp_payload(spans: List[Span]) -> Dict[str, Any]:
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [
+                        {
+                            "key": "service.name",
+                            "value": {"stringValue": TRACE_SERVICE_NAME},
+                        }
+                    ]
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "utils.tracing"},
+                        "spans": [_otlp_span(span) for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """Writes finished spans from a background thread, in batches"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(QUEUE_SIZE)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="span-exporter", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    span = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if span is None:
+                    self._write(batch)
+                    return
+                batch.append(span)
+            self._write(batch)
+
+    def _write(self, spans: List[Span]):
+        try:
+            if self.mode == "otlp":
+                requests.post(
+                    TRACE_OTLP_ENDPOINT, json=otlp_payload(spans), timeout=5
+                ).raise_for_status()
+            else:
+                with open(TRACE_FILE, "a") as f:
+                    for span in spans:
+                        f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        except Exception as e:
+            self.dropped += len(spans)
+            print(f"⚠️ Dropped {len(spans)} spans: {e}")
+
+    def close(self, timeout: float = 2.0):
+        """Flush what is queued (best effort, at exit)"""
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+
+_exporter = SpanExporter(TRACE_EXPORTER)
+
+
+# =============================
+# Collector stub / summary
+# =============================
+def _plain_value(value: Dict[str, Any]) -> Any:
+    kind, plain = next(iter(value.items()), (None, None))
+    return int(plain) if kind == "intValue" else plain
+
+
+def spans_from_otlp(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten an OTLP/HTTP JSON export into Span.to_dict() records"""
+    records = []
+    for resource in payload.get("resourceSpans", []):
+        for scope in resource.get("scopeSpans", []):
+            for entry in scope.get("spans", []):
+                start = int(entry["startTimeUnixNano"])
+                end = int(entry["endTimeUnixNano"])
+                attributes = {
+                    a["key"]: _plain_value(a["value"])
+                    for a in entry.get("attributes", [])
+                }
+                status = entry.get("status") or {}
+                failed = status.get("code") == 2
+                records.append(
+                    {
+                        "trace_id": entry["traceId"],
+                        "span_id": entry["spanId"],
+                        "parent_id": entry.get("parentSpanId"),
+                        "name": entry["name"],
+                        "start": start / 1e9,
+                        "duration_ms": round((end - start) / 1e6, 3),
+                        "attributes": attributes,
+                        "error": status.get("message") if failed else None,
+                    }
+                )
+    return records
+
+
+def collect(port: int, out: str):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                records = spans_from_otlp(json.loads(self.rfile.read(length)))
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+            with lock, open(out, "a") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"📥 Collecting OTLP/HTTP JSON spans on :{port}, writing {out}")
+    ThreadingHTTPServer(("0.0.0.0", port), Handler).serve_forever()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def stages(path: str):
+    """p50/p95/p99/max duration per span name"""
+    durations: Dict[str, List[float]] = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                durations.setdefault(record["name"], []).append(record["duration_ms"])
+    print(f"{'stage':<16}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, values in sorted(durations.items()):
+        values.sort()
+        print(
+            f"{name:<16}{len(values):>8}"
+            f"{_percentile(values, 0.5):>10.1f}{_percentile(values, 0.95):>10.1f}"
+            f"{_percentile(values, 0.99):>10.1f}{values[-1]:>10.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="redemption trace tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    collect_cmd = sub.add_parser("collect", help="OTLP/HTTP JSON collector stub")
+    collect_cmd.add_argument("--port", type=int, default=4318)
+    collect_cmd.add_argument("--out", default=TRACE_FILE)
+    stages_cmd = sub.add_parser("stages", help="latency percentiles per stage (ms)")
+    stages_cmd.add_argument("path", nargs="?", default=TRACE_FILE)
+    args = parser.parse_args(argv)
+
+    if args.command == "collect":
+        collect(args.port, args.out)
+    else:
+        stages(args.path)
+
+
+if __name__ == "__main__":
+    main()